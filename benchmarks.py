@@ -0,0 +1,421 @@
+'''
+Micro-benchmarks for the classical search code. Run with: python3 benchmarks.py <benchmark-name>
+(run it without arguments to see the available benchmarks). The data files are read from new_data/.
+'''
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from search import *
+from sudoku import SudokuBoard, BitboardSudokuBoard, PropagatingSudokuBoard
+from twenty_four import TwentyFourState
+from graph_search import Graph_State
+from parallel_dfs import report_speedup
+from exact_cover import solve_sudoku, count_sudoku_solutions
+from sudoku_validation import boards_to_array, validate_boards
+from puzzle_io import iter_lines, scan_board, write_sudoku_binary, open_sudoku_binary, iter_sudoku_binary
+from sudoku_generator import DIFFICULTIES, iter_generate_puzzles
+from solve_cache import SolveCache
+
+DATA_DIR = Path(__file__).parent / 'new_data'
+
+def sudoku_9x9_puzzles():
+    return SudokuBoard.parse_file(DATA_DIR / 'easy_sudoku_puzzles_9x9_100.txt')
+
+def sudoku_4x4_puzzles():
+    return SudokuBoard.parse_file(DATA_DIR / 'sudoku_4x4_puzzles_100.txt')
+
+def sudoku_16x16_puzzles(difficulty):
+    # The bundled 16x16 puzzles, made with sudoku_generator.py ('easy' or 'hard'):
+    return SudokuBoard.parse_file(DATA_DIR / (difficulty + '_sudoku_puzzles_16x16_100.txt'))
+
+def twenty_four_puzzles():
+    return TwentyFourState.parse_file(DATA_DIR / 'puzzles_24_100.txt',is_csv_file=False)
+
+def measure(initial_states,algorithm,params):
+    '''
+    Run the given algorithm on every initial state and return a dictionary with the number of solved instances, the
+    number of expansions, the wall-clock seconds, the number of State objects created, and the peak memory traced
+    by tracemalloc. Time is measured in a separate run, since tracing slows everything down.
+    '''
+    params = {**State.default_params, **params, 'max_states_to_show':0, 'return_stats':True}
+    start_time = time.perf_counter()
+    solved, expanded = 0, 0
+    for s in initial_states:
+        (solutions,_,stats) = State.collect(s.iter_solutions(algorithm,params),params)
+        solved += bool(solutions)
+        expanded += stats.expanded
+    seconds = time.perf_counter() - start_time
+    # Count State constructions by temporarily wrapping State.__init__:
+    created = [0]
+    original_init = State.__init__
+    def counting_init(self):
+        created[0] += 1
+        original_init(self)
+    State.__init__ = counting_init
+    tracemalloc.start()
+    try:
+        for s in initial_states:
+            State.collect(s.iter_solutions(algorithm,params),params)
+        (_,peak) = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        State.__init__ = original_init
+    return {'solved': solved, 'expanded': expanded, 'seconds': seconds, 'states_created': created[0], 'peak': peak}
+
+def report(name,results):
+    print(name + ": solved " + str(results['solved']) + ", expansions: " + str(results['expanded']) +
+          ", time: " + "%.3f" % results['seconds'] + " s (" + "%.2f" % (1e6 * results['seconds'] / max(1,results['expanded'])) +
+          " us per expansion), states created: " + str(results['states_created']) +
+          ", peak traced memory: " + "%.1f" % (results['peak'] / 1024) + " KiB")
+
+def compare_algorithms(initial_states,configurations):
+    for (name,algorithm,params) in configurations:
+        report(name,measure(initial_states,algorithm,params))
+
+def bench_in_place_dfs():
+    '''
+    Compare dfs (a new state per child) against dfs_in_place (one state mutated via apply/undo).
+    '''
+    print("==== 9x9 Sudoku (100 easy puzzles):")
+    compare_algorithms(sudoku_9x9_puzzles(),[('dfs','dfs',{'max_iterations':800}),
+                                             ('dfs_in_place','dfs_in_place',{'max_iterations':800})])
+    print("==== Game of 24 (100 puzzles, all solutions):")
+    compare_algorithms(twenty_four_puzzles(),[('dfs','dfs',{'max_iterations':100000,'max_solutions':None}),
+                                              ('dfs_in_place','dfs_in_place',{'max_iterations':100000,'max_solutions':None})])
+
+def bench_parallel_dfs():
+    '''
+    Speedup of the work-stealing parallel dfs over the serial dfs, on all cores, for a game of 24 with five numbers
+    (all solutions) and for a 9x9 Sudoku board with most of its clues removed.
+    '''
+    all_solutions = {'max_iterations':10**7,'max_solutions':None}
+    print("==== Game of 24 with the numbers 1, 3, 4, 6, 7 (all solutions):")
+    report_speedup(TwentyFourState([1,3,4,6,7]),all_solutions)
+    print("==== Sparse 9x9 Sudoku (first puzzle, keeping only its first 22 clues):")
+    rows = sudoku_9x9_puzzles()[0].rows
+    clues = [(r,c) for r in range(9) for c in range(9) if rows[r][c] != '*'][:22]
+    sparse_board = SudokuBoard([[rows[r][c] if (r,c) in clues else '*' for c in range(9)] for r in range(9)])
+    report_speedup(sparse_board,{'max_iterations':10**7})
+
+def time_per_call(f,states,repeat=20):
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        for s in states:
+            f(s)
+    return 1e6 * (time.perf_counter() - start_time) / (repeat * len(states))
+
+def bench_sudoku_bitboard():
+    '''
+    Compare the list-of-strings SudokuBoard against BitboardSudokuBoard: first the cost of single operations on the
+    100 easy 9x9 puzzles, then whole searches (which explore exactly the same trees). 
+    '''
+    string_boards, bit_boards = sudoku_9x9_puzzles(), BitboardSudokuBoard.parse_file(DATA_DIR / 'easy_sudoku_puzzles_9x9_100.txt')
+    operations = [('is_valid',lambda s: s.is_valid()),
+                  ('is_solution',lambda s: s.is_solution()),
+                  ('cands',lambda s: s.cands(4,4)),
+                  ('expand',lambda s: s.expand())]
+    print("==== Single operations on 9x9 boards (microseconds per call):")
+    for (name,f) in operations:
+        (string_time,bit_time) = (time_per_call(f,string_boards),time_per_call(f,bit_boards))
+        print(name + ": strings " + "%.2f" % string_time + ", bitboard " + "%.2f" % bit_time + " (" + "%.1f" % (string_time / bit_time) + "x)")
+    for (name,file_name) in [('9x9','easy_sudoku_puzzles_9x9_100.txt'),('4x4','sudoku_4x4_puzzles_100.txt')]:
+        print("==== " + name + " Sudoku (100 puzzles), dfs:")
+        report('strings',measure(SudokuBoard.parse_file(DATA_DIR / file_name),'dfs',{'max_iterations':800}))
+        report('bitboard',measure(BitboardSudokuBoard.parse_file(DATA_DIR / file_name),'dfs',{'max_iterations':800}))
+
+# A hard 9x9 puzzle (with a single solution) that plain dfs doesn't solve within a million iterations:
+HARD_9X9 = "[[8,_,_,_,_,_,_,_,_],[_,_,3,6,_,_,_,_,_],[_,7,_,_,9,_,2,_,_],[_,5,_,_,_,7,_,_,_],[_,_,_,_,4,5,7,_,_],[_,_,_,1,_,_,_,3,_],[_,_,1,_,_,_,_,6,8],[_,_,8,5,_,_,_,1,_],[_,9,_,_,_,_,4,_,_]]"
+
+def bench_sudoku_propagation():
+    '''
+    Depth-first search with constraint propagation in every node (PropagatingSudokuBoard, at the 'singles' and 'pairs'
+    levels) against plain depth-first search (BitboardSudokuBoard). 
+    '''
+    class SinglesSudokuBoard(PropagatingSudokuBoard):
+        propagation_level = 'singles'
+    board_classes = [('no propagation',BitboardSudokuBoard),('singles',SinglesSudokuBoard),('singles and pairs',PropagatingSudokuBoard)]
+    for (name,file_name) in [('9x9','easy_sudoku_puzzles_9x9_100.txt'),('4x4','sudoku_4x4_puzzles_100.txt')]:
+        print("==== " + name + " Sudoku (100 puzzles), dfs:")
+        for (board_name,cls) in board_classes:
+            # Propagation at the root happens when the boards are built, so that is timed too:
+            start_time = time.perf_counter()
+            boards = cls.parse_file(DATA_DIR / file_name)
+            print("(" + board_name + ": building the boards took " + "%.3f" % (time.perf_counter() - start_time) + " s)")
+            report(board_name,measure(boards,'dfs',{'max_iterations':800}))
+    print("==== Hard 9x9 Sudoku, dfs with all solutions (up to 200000 iterations):")
+    for (board_name,cls) in board_classes:
+        report(board_name,measure([cls.from_line(HARD_9X9)],'dfs',{'max_iterations':200000,'max_solutions':None}))
+
+BRANCHING_POLICIES = [('first blank','first','descending'),
+                      ('MRV','mrv','descending'),
+                      ('MRV + degree','mrv-degree','descending'),
+                      ('MRV + degree + LCV','mrv-degree','lcv')]
+
+def with_policy(cls,branching,value_order):
+    return type(cls.__name__ + '_' + branching + '_' + value_order,(cls,),{'branching':branching,'value_order':value_order})
+
+def bench_sudoku_branching():
+    '''
+    Depth-first search under each branching policy of the Sudoku boards (see SudokuBoard.branching): the easy 9x9 and
+    4x4 puzzles on BitboardSudokuBoard (first solution only), and the hard 9x9 puzzle (all solutions) on both
+    BitboardSudokuBoard and PropagatingSudokuBoard. 
+    '''
+    for (name,file_name) in [('9x9','easy_sudoku_puzzles_9x9_100.txt'),('4x4','sudoku_4x4_puzzles_100.txt')]:
+        print("==== " + name + " Sudoku (100 puzzles), dfs on bitboards:")
+        for (policy_name,branching,value_order) in BRANCHING_POLICIES:
+            boards = with_policy(BitboardSudokuBoard,branching,value_order).parse_file(DATA_DIR / file_name)
+            report(policy_name,measure(boards,'dfs',{'max_iterations':800}))
+    for cls in [BitboardSudokuBoard,PropagatingSudokuBoard]:
+        print("==== Hard 9x9 Sudoku, dfs with all solutions (up to 200000 iterations) on " + cls.__name__ + ":")
+        for (policy_name,branching,value_order) in BRANCHING_POLICIES:
+            board = with_policy(cls,branching,value_order).from_line(HARD_9X9)
+            report(policy_name,measure([board],'dfs',{'max_iterations':200000,'max_solutions':None}))
+
+def transformed_puzzles(boards,count,seed=0):
+    '''
+    Return count puzzles made from the given ones by random relabelings of the values, optionally followed by a
+    transposition (both of which preserve the rules and the number of solutions). 
+    '''
+    rng = random.Random(seed)
+    puzzles = []
+    for k in range(count):
+        board = boards[k % len(boards)]
+        N = board.N
+        labels = list(range(1,N + 1))
+        rng.shuffle(labels)
+        values = [labels[v - 1] if v else 0 for v in board.values()]
+        if rng.random() < 0.5:
+            values = [values[c*N + r] for r in range(N) for c in range(N)]
+        puzzles.append(type(board).from_values(values))
+    return puzzles
+
+def bench_sudoku_exact_cover():
+    '''
+    Throughput of the exact-cover backend (exact_cover.py) against dfs with MRV branching and with propagation, on the
+    easy 9x9 puzzles and on 2000 puzzles derived from them, plus uniqueness checks (stopping after 2 solutions). 
+    '''
+    easy = sudoku_9x9_puzzles()
+    for (name,boards) in [('100 easy 9x9 puzzles',easy),('2000 transformed easy 9x9 puzzles',transformed_puzzles(easy,2000))]:
+        print("==== " + name + ":")
+        start_time = time.perf_counter()
+        solved = sum(len(solve_sudoku(b,1)) for b in boards)
+        seconds = time.perf_counter() - start_time
+        print("exact cover: solved " + str(solved) + " in " + "%.3f" % seconds + " s (" + "%.0f" % (len(boards) / seconds) + " puzzles per second)")
+        start_time = time.perf_counter()
+        unique = sum(len(solve_sudoku(b,2)) == 1 for b in boards)
+        seconds = time.perf_counter() - start_time
+        print("exact cover, stopping after 2 solutions: " + str(unique) + " unique in " + "%.3f" % seconds + " s (" + "%.0f" % (len(boards) / seconds) + " puzzles per second)")
+        params = {**State.default_params, 'max_states_to_show':0, 'max_iterations':800}
+        for (board_name,cls) in [('dfs, MRV bitboard',with_policy(BitboardSudokuBoard,'mrv','descending')),('dfs, propagation',PropagatingSudokuBoard)]:
+            # (Building the boards is timed too, since that is where PropagatingSudokuBoard propagates the givens.)
+            start_time = time.perf_counter()
+            solved = sum(bool(cls(b.rows).dfs(params)[0]) for b in boards)
+            seconds = time.perf_counter() - start_time
+            print(board_name + ": solved " + str(solved) + " in " + "%.3f" % seconds + " s (" + "%.0f" % (len(boards) / seconds) + " puzzles per second)")
+    print("==== Hard 9x9 Sudoku, all solutions:")
+    start_time = time.perf_counter()
+    solutions = solve_sudoku(SudokuBoard.from_line(HARD_9X9),None)
+    print("exact cover: " + str(len(solutions)) + " solution(s) in " + "%.3f" % (time.perf_counter() - start_time) + " s")
+
+def bench_sudoku_validation():
+    '''
+    Check 10000 answers (solutions of the easy 9x9 puzzles with a few random cells changed) against their puzzles,
+    board by board (is_valid, blank_cells, and extends) and with one validate_boards call. 
+    '''
+    rng = random.Random(0)
+    puzzles = sudoku_9x9_puzzles()
+    solutions = [solve_sudoku(p)[0] for p in puzzles]
+    answers, givens = [], []
+    for k in range(10000):
+        rows = [row[:] for row in solutions[k % len(solutions)].rows]
+        for _ in range(rng.randint(0,2)):
+            rows[rng.randrange(9)][rng.randrange(9)] = rng.choice(['*','1','5','9'])
+        answers.append(SudokuBoard(rows))
+        givens.append(puzzles[k % len(puzzles)])
+    print("==== 10000 9x9 answers:")
+    start_time = time.perf_counter()
+    loop_solved = sum(a.is_valid() and a.blank_cells() == 0 and a.extends(g) for (a,g) in zip(answers,givens))
+    loop_seconds = time.perf_counter() - start_time
+    print("board by board: " + str(loop_solved) + " solutions in " + "%.3f" % loop_seconds + " s")
+    start_time = time.perf_counter()
+    results = validate_boards(answers,givens)
+    seconds = time.perf_counter() - start_time
+    print("validate_boards: " + str(int(results['solved'].sum())) + " solutions in " + "%.3f" % seconds + " s (" + "%.1f" % (loop_seconds / seconds) + "x)")
+    (answer_array,_), (given_array,_) = boards_to_array(answers), boards_to_array(givens)
+    start_time = time.perf_counter()
+    validate_boards(answer_array,given_array)
+    print("validate_boards on arrays (without the conversion): " + "%.3f" % (time.perf_counter() - start_time) + " s")
+
+def bench_puzzle_io(count=100000):
+    '''
+    Read a corpus of count 9x9 puzzles (the easy puzzles, repeated) as text, all at once and streamed, and in the
+    binary format of puzzle_io.py, memory-mapped. Peak memory is traced on a corpus of count / 10 puzzles, since
+    tracing slows everything down. 
+    '''
+    directory = tempfile.mkdtemp(prefix='puzzle-io-')
+    lines = [line for line in iter_lines(DATA_DIR / 'easy_sudoku_puzzles_9x9_100.txt')]
+    files = {}
+    for size in [count,count // 10]:
+        files[size] = (os.path.join(directory,str(size) + '.txt'),os.path.join(directory,str(size) + '.bin'))
+        with open(files[size][0],'w') as f:
+            for k in range(size):
+                f.write(lines[k % len(lines)] + '\n')
+        write_sudoku_binary(SudokuBoard.iter_file(files[size][0]),files[size][1])
+    print("==== " + str(count) + " 9x9 puzzles (text: " + "%.1f" % (os.path.getsize(files[count][0]) / 2**20) + " MiB, binary: " + 
+          "%.1f" % (os.path.getsize(files[count][1]) / 2**20) + " MiB):")
+    readers = [("parse_file (a list of all the boards)",lambda text_file,binary_file: len(SudokuBoard.parse_file(text_file))),
+               ("iter_file (one board at a time)",lambda text_file,binary_file: sum(1 for _ in SudokuBoard.iter_file(text_file))),
+               ("scan_board on every line (no boards)",lambda text_file,binary_file: sum(1 for line in iter_lines(text_file) if scan_board(line))),
+               ("iter_sudoku_binary (one board at a time)",lambda text_file,binary_file: sum(1 for _ in iter_sudoku_binary(binary_file,SudokuBoard))),
+               ("open_sudoku_binary + validate_boards",lambda text_file,binary_file: int(validate_boards(open_sudoku_binary(binary_file))['valid'].sum()))]
+    for (name,read) in readers:
+        start_time = time.perf_counter()
+        result = read(*files[count])
+        seconds = time.perf_counter() - start_time
+        tracemalloc.start()
+        read(*files[count // 10])
+        (_,peak) = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(name + ": " + str(result) + " puzzles in " + "%.3f" % seconds + " s, peak traced memory for " + str(count // 10) + 
+              " puzzles: " + "%.2f" % (peak / 2**20) + " MiB")
+    for (text_file,binary_file) in files.values():
+        os.remove(text_file)
+        os.remove(binary_file)
+    os.rmdir(directory)
+
+def bench_sudoku_generator(count=200):
+    '''
+    Generate count puzzles of every difficulty (9x9, and easy 4x4) with sudoku_generator.py, on one worker and on all
+    cores, check that every puzzle has a unique solution and that the puzzles don't depend on the number of workers,
+    and extrapolate the time it takes to generate 100000 puzzles. 
+    '''
+    workers = os.cpu_count()
+    for (N,difficulty) in [(4,'easy')] + [(9,difficulty) for difficulty in DIFFICULTIES]:
+        print("==== " + str(count) + " " + difficulty + " " + str(N) + "x" + str(N) + " puzzles:")
+        runs = {}
+        for w in sorted(set([1,workers])):
+            start_time = time.perf_counter()
+            runs[w] = [board.values() for board in iter_generate_puzzles(count,N,difficulty,seed=0,workers=w)]
+            seconds = time.perf_counter() - start_time
+            print(str(w) + " worker(s): " + "%.3f" % seconds + " s (" + "%.1f" % (count / seconds) + " puzzles per second, " + 
+                  "%.1f" % (100000 * seconds / count / 60) + " minutes per 100000 puzzles)")
+        puzzles = runs[1]
+        unique = sum(count_sudoku_solutions(SudokuBoard.from_values(values)) == 1 for values in puzzles)
+        givens = sum(sum(1 for v in values if v) for values in puzzles) / count
+        print("unique solutions: " + str(unique) + " out of " + str(count) + ", average givens: " + "%.1f" % givens + 
+              ", same puzzles on every number of workers: " + str(all(run == puzzles for run in runs.values())))
+
+def bench_sudoku_large(iterations=2000):
+    '''
+    The Sudoku solvers beyond 9x9: on the bundled easy and hard 16x16 puzzles, and on a few generated easy 25x25
+    puzzles, exact cover, dfs with propagation and MRV + degree branching, and dfs with MRV on bitboards (up to the
+    given number of iterations per puzzle), plus validate_boards on all the solutions. 
+    '''
+    start_time = time.perf_counter()
+    puzzles_25x25 = list(iter_generate_puzzles(5,25,'easy',seed=0,workers=1))
+    print("(generating 5 easy 25x25 puzzles took " + "%.1f" % (time.perf_counter() - start_time) + " s)")
+    for (name,boards) in [('easy 16x16',sudoku_16x16_puzzles('easy')),('hard 16x16',sudoku_16x16_puzzles('hard')),('easy 25x25',puzzles_25x25)]:
+        print("==== " + str(len(boards)) + " " + name + " puzzles:")
+        start_time = time.perf_counter()
+        solutions = [board.solve_exact_cover()[0] for board in boards]
+        seconds = time.perf_counter() - start_time
+        print("exact cover: solved " + str(len(solutions)) + " in " + "%.3f" % seconds + " s (" + "%.1f" % (len(boards) / seconds) + " puzzles per second)")
+        for (board_name,cls) in [('dfs, propagation, MRV + degree',with_policy(PropagatingSudokuBoard,'mrv-degree','descending')),
+                                 ('dfs, MRV bitboard',with_policy(BitboardSudokuBoard,'mrv','descending'))]:
+            report(board_name,measure([cls(board.rows) for board in boards],'dfs',{'max_iterations':iterations}))
+        start_time = time.perf_counter()
+        solved = validate_boards(solutions,boards)['solved']
+        print("validate_boards: " + str(int(solved.sum())) + " solutions in " + "%.4f" % (time.perf_counter() - start_time) + " s")
+
+def bench_solve_cache(count=2000):
+    '''
+    The solve cache of solve_cache.py, on the easy 9x9 and hard 16x16 puzzles: a first pass solves them (by exact
+    cover) and fills a fresh cache, a second pass finds them all in it, and a third pass looks up count puzzles
+    derived from them (see transformed_puzzles), which hit the cache through their canonical forms. 
+    '''
+    directory = tempfile.mkdtemp(prefix='solve-cache-')
+    file_name = os.path.join(directory,'cache.db')
+    for (name,boards) in [('easy 9x9',sudoku_9x9_puzzles()),('hard 16x16',sudoku_16x16_puzzles('hard'))]:
+        print("==== " + str(len(boards)) + " " + name + " puzzles:")
+        for (pass_name,puzzles) in [('first pass',boards),('second pass',boards),(str(count) + ' transformed',transformed_puzzles(boards,count))]:
+            cache = SolveCache(file_name)
+            start_time = time.perf_counter()
+            solutions = []
+            for board in puzzles:
+                found = cache.lookup(board)
+                if found is None:
+                    found = board.solve_exact_cover()
+                    cache.store(board,found)
+                solutions.append(found[0])
+            cache.flush()
+            seconds = time.perf_counter() - start_time
+            solved = int(validate_boards(solutions,puzzles)['solved'].sum())
+            print(pass_name + ": " + str(solved) + " solved in " + "%.3f" % seconds + " s (" + "%.0f" % (len(puzzles) / seconds) + 
+                  " puzzles per second), " + str(cache.hits) + " hits, " + str(cache.misses) + " misses")
+            cache.close()
+    os.remove(file_name)
+    os.rmdir(directory)
+
+def random_graph_class(seed,node_count=30):
+    '''
+    A Graph_State class over a random directed graph with the given number of nodes (0 through node_count - 1), each
+    with up to 4 edges of random costs between 1 and 20, whose goal is the last node. 
+    '''
+    rng = random.Random(seed)
+    edges = {i: [{'node': j, 'cost': rng.randint(1,20)} for j in rng.sample(range(node_count),rng.randint(1,4)) if j != i]
+             for i in range(node_count)}
+    class RandomGraph(Graph_State):
+        graph_definition = {'nodes': set(range(node_count)), 'edges': edges}
+        def is_solution(self):
+            return self.node == node_count - 1
+    return RandomGraph
+
+def bench_sma_star(seeds=60,max_iterations=200000):
+    '''
+    A regression check of memory-bounded best-first search (iter_sma_star): on random graphs, in graph and tree mode,
+    the cost of its solution must match that of plain A* when the budget is the optimal path plus one child per state
+    along it. 
+    '''
+    (checked, mismatches, iterations) = (0, 0, 0)
+    start_time = time.perf_counter()
+    for seed in range(seeds):
+        cls = random_graph_class(seed)
+        for tree_space in [False,True]:
+            params = {'max_states_to_show':0,'tree_space':tree_space,'max_iterations':max_iterations}
+            (solutions,_) = cls.create(0).best_first_search(params)
+            if not(solutions):
+                continue
+            depth = solutions[0].depth
+            (bounded,its) = cls.create(0).best_first_search({**params,'max_stored_states':2 * depth + 1})
+            checked += 1
+            iterations += its
+            if not(bounded) or bounded[0].get_cost() != solutions[0].get_cost():
+                mismatches += 1
+                print("Mismatch on seed " + str(seed) + (" (tree mode)" if tree_space else " (graph mode)") + ": A* cost " +
+                      str(solutions[0].get_cost()) + ", memory-bounded: " + (str(bounded[0].get_cost()) if bounded else "no solution") +
+                      " after " + str(its) + " iterations")
+    print("sma_star matched A* on " + str(checked - mismatches) + " of " + str(checked) + " random graph searches (" + 
+          str(iterations) + " iterations in " + "%.2f" % (time.perf_counter() - start_time) + " s)")
+
+BENCHMARKS = {'in-place-dfs': bench_in_place_dfs,
+              'parallel-dfs': bench_parallel_dfs,
+              'sudoku-bitboard': bench_sudoku_bitboard,
+              'sudoku-propagation': bench_sudoku_propagation,
+              'sudoku-branching': bench_sudoku_branching,
+              'sudoku-exact-cover': bench_sudoku_exact_cover,
+              'sudoku-validation': bench_sudoku_validation,
+              'puzzle-io': bench_puzzle_io,
+              'sudoku-generator': bench_sudoku_generator,
+              'sudoku-large': bench_sudoku_large,
+              'solve-cache': bench_solve_cache,
+              'sma-star': bench_sma_star}
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in BENCHMARKS:
+        print("Usage: python3 benchmarks.py <benchmark>, where <benchmark> is one of: " + ', '.join(BENCHMARKS.keys()))
+        exit(1)
+    BENCHMARKS[sys.argv[1]]()
@@ -0,0 +1,164 @@
+'''
+Checkpointing for State.iter_search (and hence dfs, bfs, best-first search, A*, and beam search). When the
+'checkpoint_file' param is set, the search periodically writes its whole progress to that file: the open
+frontier, the frontier and visited tables (in graph mode), the solutions found so far, and its SearchStats.
+If the file already exists when the search starts, the search resumes from it instead of starting over.
+
+States are not pickled as object graphs. Every state that is still needed (because it is on the frontier, in a
+table, a solution, or an ancestor of one of those) is stored once, as a record (compact data, parent index,
+depth), where the compact data comes from State.to_compact and is turned back into a state by the class method
+from_compact, and the parent index points to an earlier record. Shared ancestors are therefore stored once, and
+parent chains cost one integer per state. The exception are the segment files of a SpillingFifoFrontier, whose states
+stay on disk: they are kept, as they are, in a directory next to the checkpoint (its name with '.segments' appended),
+and the checkpoint only refers to them, so checkpointing a wide breadth-first search does not read its spilled states
+back into memory. Files are written atomically: the snapshot goes to a temporary file in
+the same directory, which is then renamed over the old checkpoint, so a crash mid-write never leaves a corrupt file.
+
+Every checkpoint records a fingerprint of the search that wrote it (see search_fingerprint): the class and state key
+of its initial state, the kind of frontier (which tells the algorithms apart), and the params that shape the search
+space. A checkpoint is only resumed by a search with the same fingerprint; load_checkpoint refuses any other, so a
+stale file is never mistaken for the progress of a different search. The budgets (max_iterations, time_budget, and
+so on) are not part of the fingerprint, so that a search can be resumed with larger ones.
+'''
+import os
+import pickle
+import itertools
+import shutil
+import tempfile
+from frontier import Frontier, PriorityFrontier, SpillingFifoFrontier, index_states, unpack_states, link_or_copy
+
+CHECKPOINT_VERSION = 3
+
+# The params that are part of a search's fingerprint:
+FINGERPRINT_PARAMS = ['max_depth', 'beam_width', 'tree_space', 'cost_bound', 'weight', 'transposition_size']
+
+def search_fingerprint(initial_state, open_states, params):
+    return (type(initial_state).__qualname__, initial_state.state_key(), type(open_states).__name__,
+            tuple(params[k] for k in FINGERPRINT_PARAMS))
+
+def frontier_states(open_states):
+    '''
+    Return all states held by a frontier (a Frontier, or a plain list used as a stack).
+    '''
+    if isinstance(open_states, PriorityFrontier):
+        return [entry[2] for entry in open_states.heap]
+    if isinstance(open_states, SpillingFifoFrontier):
+        # (Only the ones in memory; see save_segments.)
+        return list(open_states.head) + list(open_states.tail)
+    return list(open_states)
+
+def segments_directory(file_name):
+    return str(file_name) + '.segments'
+
+def save_segments(file_name, open_states):
+    '''
+    Keep the segment files of a SpillingFifoFrontier in the segments directory of the checkpoint file_name (linking or
+    copying the ones that are not there yet), and return their names there, with their numbers of states.
+    '''
+    directory = segments_directory(file_name)
+    os.makedirs(directory, exist_ok=True)
+    segments = []
+    for (segment_file, count) in open_states.segments:
+        # Segment names are only unique within a spill directory, whose name is unique: 
+        name = os.path.basename(open_states.spill_directory) + '-' + os.path.basename(segment_file)
+        if not os.path.exists(os.path.join(directory, name)):
+            link_or_copy(segment_file, os.path.join(directory, name))
+        segments.append((name, count))
+    return segments
+
+def prune_segments(file_name, segments):
+    # Remove the kept segment files that the checkpoint no longer refers to: 
+    directory = segments_directory(file_name)
+    if os.path.isdir(directory):
+        names = set(name for (name, _) in segments)
+        for name in os.listdir(directory):
+            if name not in names:
+                os.remove(os.path.join(directory, name))
+
+def save_checkpoint(file_name, fingerprint, open_states, frontier_table, visited_table, solutions, stats):
+    '''
+    Atomically write a checkpoint. solutions is a list of pairs (solution state, iteration at which it was found).
+    '''
+    frontier_list = frontier_states(open_states)
+    (ordered, index_of) = index_states(frontier_list + list(frontier_table.values()) + list(visited_table.values()) + [s for (s, _) in solutions])
+    records = [(s.to_compact(), -1 if s.parent is None else index_of[id(s.parent)], s.depth) for s in ordered]
+    if isinstance(open_states, PriorityFrontier):
+        # Keep the priorities and tie-breakers, and where the tie-breaking counter had got to:
+        frontier = ('priority', [(key, tie, index_of[id(s)]) for (key, tie, s) in open_states.heap],
+                    -min([tie for (_, tie, _) in open_states.heap], default=0) + 1)
+    elif isinstance(open_states, SpillingFifoFrontier):
+        frontier = ('spilling', ([index_of[id(s)] for s in open_states.head], save_segments(file_name, open_states),
+                                 [index_of[id(s)] for s in open_states.tail]), None)
+    elif isinstance(open_states, Frontier):
+        # Any other frontier is saved in the order in which it would be popped:
+        frontier = ('ordered', [index_of[id(s)] for s in frontier_list], None)
+    else:
+        frontier = ('stack', [index_of[id(s)] for s in frontier_list], None)
+    snapshot = {'version': CHECKPOINT_VERSION,
+                'fingerprint': fingerprint,
+                'records': records,
+                'frontier': frontier,
+                'frontier_table': [index_of[id(s)] for s in frontier_table.values()],
+                'visited_table': [index_of[id(s)] for s in visited_table.values()],
+                'solutions': [(index_of[id(s)], iteration) for (s, iteration) in solutions],
+                'stats': {k: v for (k, v) in vars(stats).items() if k != 'best_open_state'}}
+    directory = os.path.dirname(os.path.abspath(file_name))
+    (fd, temp_name) = tempfile.mkstemp(dir=directory, prefix='.checkpoint-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_name, file_name)
+    except BaseException:
+        if os.path.exists(temp_name):
+            os.remove(temp_name)
+        raise
+    # (Only once the new checkpoint is in place, so that the old one stays whole until then.)
+    prune_segments(file_name, frontier[1][1] if frontier[0] == 'spilling' else [])
+
+def load_checkpoint(file_name, fingerprint, initial_state, open_states, frontier_table, visited_table, stats):
+    '''
+    Restore a checkpoint written by save_checkpoint into the given (freshly made) frontier, tables, and stats,
+    rebuilding states with the from_compact class method of initial_state's class. Return the list of pairs
+    (solution state, iteration at which it was found). Raise ValueError if the checkpoint was written by a search
+    with another fingerprint.
+    '''
+    with open(file_name, 'rb') as f:
+        snapshot = pickle.load(f)
+    if snapshot.get('version') != CHECKPOINT_VERSION:
+        raise ValueError("Unsupported checkpoint version in " + str(file_name))
+    if snapshot['fingerprint'] != fingerprint:
+        raise ValueError(str(file_name) + " is a checkpoint of another search (another initial state, algorithm, or params)")
+    states = unpack_states(type(initial_state), snapshot['records'])
+    (kind, items, next_tie) = snapshot['frontier']
+    if kind == 'priority':
+        open_states.heap = [(key, tie, states[i]) for (key, tie, i) in items]
+        open_states.counter = itertools.count(next_tie)
+    elif kind == 'ordered':
+        open_states.clear()
+        open_states.push_items([states[i] for i in items])
+    elif kind == 'spilling':
+        (head, segments, tail) = items
+        open_states.clear()
+        open_states.head.extend([states[i] for i in head])
+        for (name, count) in segments:
+            open_states.add_segment(os.path.join(segments_directory(file_name), name), count, type(initial_state))
+        open_states.tail.extend([states[i] for i in tail])
+    else:
+        open_states[:] = [states[i] for i in items]
+    frontier_table.clear()
+    for i in snapshot['frontier_table']:
+        frontier_table[states[i]] = states[i]
+    visited_table.clear()
+    for i in snapshot['visited_table']:
+        visited_table[states[i]] = states[i]
+    for (k, v) in snapshot['stats'].items():
+        setattr(stats, k, v)
+    return [(states[i], iteration) for (i, iteration) in snapshot['solutions']]
+
+def remove_checkpoint(file_name):
+    # Called when a search completes, so that the file is not resumed by a later search:
+    if os.path.exists(file_name):
+        os.remove(file_name)
+    shutil.rmtree(segments_directory(file_name), ignore_errors=True)
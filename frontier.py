@@ -0,0 +1,405 @@
+'''
+Frontier containers used by State.search. A frontier holds the open (generated but not yet expanded) states, and
+every frontier implements the Frontier interface: push and push_items add states, pop removes the state that is to
+be expanded next, peek returns it without removing it, and iterating over a frontier yields its states in the order
+in which they would be popped (which is only meant for reporting). State.iter_search works with any Frontier, so a
+new search strategy only needs a new frontier class.
+
+StackFrontier (LIFO) is used by depth-first search. push_items pushes a batch of children from right to left, so
+that the leftmost child is expanded first.
+
+FifoFrontier is used by breadth-first search. (It used to be the Queue class of a top-level queue.py, which
+shadowed the standard-library queue module and broke multiprocessing and concurrent.futures. Queue remains as
+an alias.)
+
+PriorityFrontier is a binary-heap frontier used by best-first search and A*. The priority of a state (its f-score,
+get_cost() + distance() by default) is computed exactly once, when the state is pushed, and stored alongside it in
+the heap, so states are never re-scored during comparisons. Ties are broken deterministically: among states with
+equal f-scores, the most recently pushed one comes out first (which is also how the old sorted-list frontier
+behaved, so search results are unchanged). BeamFrontier is a PriorityFrontier that keeps only its beam_width best
+states after every batch of pushes, as beam search requires.
+
+For graph search (tree_space=False) the frontiers support lazy deletion: when a cheaper path to a state that is
+already on the frontier is found, the new instance is simply pushed, and State.search discards the stale
+instance when it is eventually popped (see State.search). Each heap push and pop is O(log n).
+
+SpillingFifoFrontier is a FIFO for very wide breadth-first searches: once it holds more than max_in_memory states,
+it writes the most recently pushed ones out to a segment file on disk, and reads segments back, oldest first, when
+the states in memory run out, so memory stays bounded no matter how wide the search gets. States are written in
+the compact form of State.to_compact (every segment stores the ancestors of its states once, as records with parent
+indices; see pack_states) and rebuilt with from_compact, so the states that come back are equal copies of the ones
+that went out, with their paths intact. Segment files are deleted as soon as they are read back, and the whole
+spill directory when the frontier is closed (or garbage-collected). Segment files are never changed once written, so
+a checkpoint can keep them as they are (see checkpoint.py) rather than reading them back in.
+'''
+import heapq
+import itertools
+import os
+import pickle
+import shutil
+import tempfile
+import weakref
+from abc import ABC, abstractmethod
+from collections import deque
+
+class Frontier(ABC):
+
+    @abstractmethod
+    def push(self, item):
+        pass
+
+    def push_items(self, items):
+        for item in items:
+            self.push(item)
+
+    @abstractmethod
+    def pop(self):
+        pass
+
+    @abstractmethod
+    def peek(self):
+        pass
+
+    @abstractmethod
+    def clear(self):
+        pass
+
+    def is_empty(self):
+        return len(self) == 0
+
+    def close(self):
+        '''
+        Release any resources held by the frontier (such as spill files). The default does nothing.
+        '''
+        pass
+
+    @abstractmethod
+    def __iter__(self):
+        pass
+
+    @abstractmethod
+    def __len__(self):
+        pass
+
+class StackFrontier(Frontier):
+
+    def __init__(self, first_item=None):
+        self.items = []
+        if first_item is not None:
+            self.items.append(first_item)
+
+    def push(self, item):
+        self.items.append(item)
+
+    def push_items(self, items):
+        # Children come in their natural left-to-right order, so they are pushed from right to left:
+        self.items.extend(reversed(items))
+
+    def pop(self):
+        if not self.is_empty():
+            return self.items.pop()
+        else:
+            raise IndexError("pop from empty stack")
+
+    def peek(self):
+        if not self.is_empty():
+            return self.items[-1]
+        else:
+            raise IndexError("peek from empty stack")
+
+    def clear(self):
+        self.items.clear()
+
+    def __iter__(self):
+        return reversed(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+class FifoFrontier(Frontier):
+    def __init__(self,first_item=None):
+        self.items = deque()
+        if first_item is not None:
+            self.items.append(first_item)
+
+    def push(self, item):
+        self.items.append(item)
+
+    def push_items(self, items):
+        self.items.extend(items)
+
+    def pop(self):
+        if not self.is_empty():
+            return self.items.popleft()
+        else:
+            raise IndexError("dequeue from empty queue")
+
+    def peek(self):
+        if not self.is_empty():
+            return self.items[0]
+        else:
+            raise IndexError("peek from empty queue")
+
+    def clear(self):
+        self.items.clear()
+
+    # The names of the old Queue class:
+    enqueue = push
+    enqueue_items = push_items
+    dequeue = pop
+
+    def __reversed__(self):
+        return reversed(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+Queue = FifoFrontier
+
+class PriorityFrontier(Frontier):
+
+    def __init__(self, first_item=None, get_key=lambda s: s.get_cost() + s.distance(), get_keys=None):
+        self.get_key = get_key
+        # Optionally, a function that scores a whole list of items at once (see State.distance_batch):
+        self.get_keys = get_keys
+        self.heap = []
+        self.counter = itertools.count()
+        if first_item is not None:
+            self.push(first_item)
+
+    def push(self, item):
+        self.push_with_key(item, self.get_key(item))
+
+    def push_with_key(self, item, key):
+        # Negating the counter makes the most recently pushed item win ties:
+        heapq.heappush(self.heap, (key, -next(self.counter), item))
+
+    def push_items(self, items):
+        if self.get_keys is not None and items:
+            for (item, key) in zip(items, self.get_keys(items)):
+                self.push_with_key(item, key)
+        else:
+            for item in items:
+                self.push(item)
+
+    def pop(self):
+        if not self.is_empty():
+            return heapq.heappop(self.heap)[2]
+        else:
+            raise IndexError("pop from empty frontier")
+
+    def peek(self):
+        if not self.is_empty():
+            return self.heap[0][2]
+        else:
+            raise IndexError("peek from empty frontier")
+
+    def peek_key(self):
+        '''
+        Return the priority (f-score) of the best item on the frontier.
+        '''
+        if not self.is_empty():
+            return self.heap[0][0]
+        else:
+            raise IndexError("peek from empty frontier")
+
+    def keep_best(self, k):
+        '''
+        Prune the frontier down to its k best items (used by beam search).
+        '''
+        if len(self.heap) > k:
+            self.heap = heapq.nsmallest(k, self.heap)
+            # A sorted list is already a valid heap.
+
+    def clear(self):
+        self.heap = []
+
+    def __iter__(self):
+        # Iterate in priority order (which is only meant for reporting), lazily: a walk down the heap that keeps the
+        # children of the entries yielded so far in a small heap of its own, so the first k items cost O(k log k)
+        # rather than a sort of the whole heap (State.show_states only looks at the first few, on every iteration).
+        heap = self.heap
+        candidates = [(heap[0], 0)] if heap else []
+        while candidates:
+            (entry, i) = heapq.heappop(candidates)
+            yield entry[2]
+            for j in (2 * i + 1, 2 * i + 2):
+                if j < len(heap):
+                    heapq.heappush(candidates, (heap[j], j))
+
+    def __len__(self):
+        return len(self.heap)
+
+class BeamFrontier(PriorityFrontier):
+
+    def __init__(self, first_item=None, beam_width=4, get_key=lambda s: s.get_cost() + s.distance(), get_keys=None):
+        super().__init__(first_item, get_key, get_keys)
+        self.beam_width = beam_width
+
+    def push_items(self, items):
+        super().push_items(items)
+        if self.beam_width:
+            self.keep_best(self.beam_width)
+
+def index_states(states):
+    '''
+    Number the given states and all of their ancestors so that every parent gets a smaller index than its children.
+    Return the list of states in index order and a dictionary from id(state) to index.
+    '''
+    ordered, index_of = [], {}
+    for s in states:
+        chain = []
+        while s is not None and id(s) not in index_of:
+            chain.append(s)
+            s = s.parent
+        for t in reversed(chain):
+            index_of[id(t)] = len(ordered)
+            ordered.append(t)
+    return ordered, index_of
+
+def pack_states(states):
+    '''
+    Return a compact, picklable form of the given states and their ancestors: a pair (records, indices), where records
+    holds a triple (s.to_compact(), parent index or -1, depth) for every state s, parents first, and indices gives the
+    index of each of the given states.
+    '''
+    (ordered, index_of) = index_states(states)
+    records = [(s.to_compact(), -1 if s.parent is None else index_of[id(s.parent)], s.depth) for s in ordered]
+    return (records, [index_of[id(s)] for s in states])
+
+def unpack_states(cls, records):
+    '''
+    Rebuild the states of the given records (see pack_states) with the from_compact class method of cls.
+    '''
+    states = []
+    for (data, parent_index, depth) in records:
+        s = cls.from_compact(data)
+        if parent_index >= 0:
+            s.set_parent(states[parent_index])
+        s.depth = depth
+        states.append(s)
+    return states
+
+def link_or_copy(source, target):
+    # Hard links are free, but do not work across file systems:
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+class SpillingFifoFrontier(Frontier):
+
+    def __init__(self, first_item=None, max_in_memory=100000, directory=None):
+        self.max_in_memory = max_in_memory
+        self.directory = directory
+        # Items flow from tail (newest, in memory) through the segment files (on disk) to head (oldest, in memory):
+        self.head, self.tail = deque(), deque()
+        self.segments = deque()         # pairs (file name, number of items), oldest first
+        self.spilled = 0                # the number of items in the segment files
+        self.segment_numbers = itertools.count()
+        self.item_class = None
+        self.spill_directory = None
+        self.finalizer = None
+        if first_item is not None:
+            self.push(first_item)
+
+    def push(self, item):
+        self.tail.append(item)
+        self.spill_if_full()
+
+    def push_items(self, items):
+        self.tail.extend(items)
+        self.spill_if_full()
+
+    def spill_if_full(self):
+        # Segments hold at least half of max_in_memory items, so that memory stays within about max_in_memory items
+        # (plus one batch of pushes) without writing lots of tiny files:
+        if len(self.head) + len(self.tail) > self.max_in_memory and len(self.tail) >= max(1, self.max_in_memory // 2):
+            self.spill()
+
+    def new_segment_file(self):
+        if self.spill_directory is None:
+            self.spill_directory = tempfile.mkdtemp(prefix='frontier-', dir=self.directory)
+            self.finalizer = weakref.finalize(self, shutil.rmtree, self.spill_directory, True)
+        return os.path.join(self.spill_directory, 'segment-' + str(next(self.segment_numbers)) + '.pkl')
+
+    def spill(self):
+        # Write the whole tail out as one segment:
+        items = list(self.tail)
+        self.item_class = type(items[0])
+        file_name = self.new_segment_file()
+        with open(file_name, 'wb') as f:
+            pickle.dump(pack_states(items), f, protocol=pickle.HIGHEST_PROTOCOL)
+        self.segments.append((file_name, len(items)))
+        self.spilled += len(items)
+        self.tail.clear()
+
+    def add_segment(self, file_name, count, item_class):
+        '''
+        Append a segment file written by another frontier (e.g., kept by a checkpoint) to the spilled items, after the
+        segments already there. The file itself is left alone: the frontier links or copies it into its spill directory.
+        '''
+        target = self.new_segment_file()
+        link_or_copy(file_name, target)
+        self.item_class = item_class
+        self.segments.append((target, count))
+        self.spilled += count
+
+    def load_segment(self):
+        (file_name, count) = self.segments.popleft()
+        with open(file_name, 'rb') as f:
+            (records, indices) = pickle.load(f)
+        os.remove(file_name)
+        self.spilled -= count
+        states = unpack_states(self.item_class, records)
+        return [states[i] for i in indices]
+
+    def refill(self):
+        # Move the oldest items that are not in head into head:
+        if self.segments:
+            self.head.extend(self.load_segment())
+        else:
+            self.head, self.tail = self.tail, self.head
+
+    def pop(self):
+        if not self.head:
+            if self.is_empty():
+                raise IndexError("dequeue from empty queue")
+            self.refill()
+        return self.head.popleft()
+
+    def peek(self):
+        if not self.head:
+            if self.is_empty():
+                raise IndexError("peek from empty queue")
+            self.refill()
+        return self.head[0]
+
+    def clear(self):
+        self.head.clear()
+        self.tail.clear()
+        for (file_name, _) in self.segments:
+            os.remove(file_name)
+        self.segments.clear()
+        self.spilled = 0
+
+    def close(self):
+        self.clear()
+        if self.finalizer is not None:
+            self.finalizer()
+
+    def __iter__(self):
+        # Spilled segments are read (but not consumed) as the iteration reaches them.
+        yield from self.head
+        for (file_name, _) in list(self.segments):
+            with open(file_name, 'rb') as f:
+                (records, indices) = pickle.load(f)
+            states = unpack_states(self.item_class, records)
+            yield from (states[i] for i in indices)
+        yield from self.tail
+
+    def __len__(self):
+        return len(self.head) + self.spilled + len(self.tail)
@@ -1,4 +1,7 @@
 from search import *
+import heapq
+import itertools
+import time
 '''
 To make it easier to search directed graphs whose edges have costs, we introduce Graph_State, a subclass of State,
 that contains a graph_definition (None by default, as actual graphs will be introduced as subclass of Graph_State). 
@@ -35,6 +38,143 @@ class Graph_State(State):
     def __str__(self):
         return str(self.node)
 
+    def compute_state_key(self):
+        return self.node
+
+    def to_compact(self):
+        return (self.node,self.cost)
+
+    @classmethod
+    def from_compact(cls,data):
+        (node,cost) = data
+        s = cls(node)
+        s.cost = cost
+        return s
+
+    @classmethod
+    def estimate(cls,from_node,to_node):
+        '''
+        An estimate of the cost of the cheapest path from from_node to to_node, used by bidirectional_search in both 
+        directions. The default of 0 makes bidirectional search uniform-cost; an override must be consistent (e.g., a 
+        straight-line distance), otherwise the result of bidirectional_search is not guaranteed to be optimal. 
+        '''
+        return 0
+
+    @classmethod
+    def reverse_edges(cls):
+        '''
+        Return the reverse adjacency view of the graph, a dictionary mapping every node to a list of pairs 
+        (predecessor node, edge cost). It is built only once per class. Edges without a cost count as 0. 
+        '''
+        if 'reverse_edge_table' not in cls.__dict__:
+            table = {}
+            for node, edges in cls.graph_definition['edges'].items():
+                for c in edges:
+                    table.setdefault(cls.make_node(c['node']),[]).append((node,c.get('cost',0)))
+            cls.reverse_edge_table = table
+        return cls.reverse_edge_table
+
+    @classmethod
+    def forward_edges(cls,node):
+        return [(cls.make_node(c['node']),c.get('cost',0)) for c in cls.graph_definition['edges'].get(node,[])]
+
+    def bidirectional_search(self,goal_node_string,params=State.default_params):
+        '''
+        Find a cheapest path from self to the given goal node by searching forward from self and backward (over the 
+        reverse edges) from the goal at the same time, always expanding the side whose best open node is cheaper. 
+        Search stops as soon as the cheapest path found so far (through a node reached from both sides) costs no 
+        more than a lower bound on every path not yet found: the sum of the two frontiers' smallest g-scores when 
+        there is no heuristic, and the larger of their smallest f-scores otherwise. 
+        Searches are node-based, so no states are built until the end. Returns ([goal state], iterations) just like 
+        the other algorithms (or ([], iterations) if there is no path), so the usual solution_path() applies. Only the
+        max_iterations, time_budget, deadline, max_states_to_show (for silence), and return_stats params are used. 
+        '''
+        params = {**State.default_params, **params}
+        cls = type(self)
+        start, goal = self.node, cls.make_node(goal_node_string)
+        max_iterations, verbose = params['max_iterations'], params['max_states_to_show'] > 0
+        start_time = time.perf_counter()
+        deadline = State.deadline_from(params)
+        stats = SearchStats()
+        counter = itertools.count()
+        reverse_edges = cls.reverse_edges()
+        # One record per direction: the best g found for each node, the parent of each node (towards the side's 
+        # origin), the heap of (f, tie, g, node) entries, and the neighbor and heuristic functions: 
+        forward = {'g': {start: 0}, 'parent': {start: None}, 'heap': [(cls.estimate(start,goal),next(counter),0,start)],
+                   'neighbors': cls.forward_edges, 'h': lambda n: cls.estimate(n,goal)}
+        backward = {'g': {goal: 0}, 'parent': {goal: None}, 'heap': [(cls.estimate(start,goal),next(counter),0,goal)],
+                    'neighbors': lambda n: reverse_edges.get(n,[]), 'h': lambda n: cls.estimate(start,n)}
+        best_cost, meeting_node = (0, start) if start == goal else (float('inf'), None)
+        uniform_cost = cls.estimate.__func__ is Graph_State.estimate.__func__
+        def min_f(side):
+            heap = side['heap']
+            # Discard stale entries (nodes for which a cheaper g was found after they were pushed): 
+            while heap and heap[0][2] > side['g'][heap[0][3]]:
+                heapq.heappop(heap)
+            return heap[0][0] if heap else float('inf')
+        stop_reason = 'exhausted'
+        while forward['heap'] and backward['heap']:
+            min_f_forward, min_f_backward = min_f(forward), min_f(backward)
+            # Without a heuristic, f = g and the much tighter bidirectional Dijkstra bound (the sum) applies: 
+            lower_bound = min_f_forward + min_f_backward if uniform_cost else max(min_f_forward,min_f_backward)
+            if best_cost <= lower_bound:
+                # (If one side has run dry, the bound is infinite, and we stop whether or not a path was found.)
+                stop_reason = 'max_solutions' if meeting_node is not None else 'exhausted'
+                break
+            if stats.iterations >= max_iterations:
+                stop_reason = 'max_iterations'
+                break
+            if deadline is not None and time.time() > deadline:
+                stop_reason = 'time_budget'
+                break
+            (side,other) = (forward,backward) if min_f_forward <= min_f_backward else (backward,forward)
+            (f,_,g,node) = heapq.heappop(side['heap'])
+            stats.iterations += 1
+            stats.expanded += 1
+            for (neighbor,cost) in side['neighbors'](node):
+                stats.generated += 1
+                new_g = g + cost
+                if new_g >= side['g'].get(neighbor,float('inf')):
+                    stats.duplicates += 1
+                    continue
+                side['g'][neighbor] = new_g
+                side['parent'][neighbor] = node
+                heapq.heappush(side['heap'],(new_g + side['h'](neighbor),next(counter),new_g,neighbor))
+                if neighbor in other['g'] and new_g + other['g'][neighbor] < best_cost:
+                    best_cost, meeting_node = new_g + other['g'][neighbor], neighbor
+            stats.peak_frontier = max(stats.peak_frontier,len(forward['heap']) + len(backward['heap']))
+        solutions = []
+        if meeting_node is not None:
+            # Build the path of states: from self to the meeting node along the forward parents, and from there to 
+            # the goal along the backward parents: 
+            nodes, n = [], meeting_node
+            while n is not None:
+                nodes.append(n)
+                n = forward['parent'][n]
+            nodes.reverse()
+            n = backward['parent'][meeting_node]
+            while n is not None:
+                nodes.append(n)
+                n = backward['parent'][n]
+            meeting_index = nodes.index(meeting_node)
+            state = self
+            for i in range(1,len(nodes)):
+                child_state = cls(nodes[i])
+                child_state.cost = forward['g'][nodes[i]] if i <= meeting_index else best_cost - backward['g'][nodes[i]]
+                child_state.set_parent(state)
+                state = child_state
+            solutions.append(state)
+            stats.solutions = 1
+            if verbose:
+                print("\nSuccess! Path of cost " + str(best_cost) + " found after " + str(stats.iterations) + " iterations.")
+        elif verbose:
+            print("No path found after " + str(stats.iterations) + " iterations.")
+        stats.stop_reason = stop_reason
+        stats.seconds = time.perf_counter() - start_time
+        if params['return_stats']:
+            return (solutions,stats.iterations,stats)
+        return (solutions,stats.iterations)
+
     def expand(self):
         children_states = []
         for c in type(self).graph_definition['edges'][self.node]: 
@@ -69,8 +209,11 @@ class Romania_Travel(Graph_State):
     def is_solution(self):
         return self.node == 'B'
     
-s = Travel.create('S')
-(sols,its) = s.best_first_search({'max_solutions':2})
-sol1,sol2 = sols
-path1 = sol1.solution_path()
-path2 = sol2.solution_path()
+if __name__ == "__main__":
+    s = Romania_Travel.create('S')
+    (sols,its) = s.best_first_search({'max_solutions':2})
+    sol1,sol2 = sols
+    path1 = sol1.solution_path()
+    path2 = sol2.solution_path()
+    (sols,its) = Romania_Travel.create('S').bidirectional_search('B')
+    path3 = sols[0].solution_path()
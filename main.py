@@ -7,6 +7,8 @@ from actors.llm import llm4
 import math
 import random
 from sudoku import *
+from sudoku_validation import boards_to_array, validate_boards
+from solve_cache import SolveCache
 import ast
 import re
 import numpy as np
@@ -118,10 +120,34 @@ def solve_sudoku_puzzle(puzzle_string):
     success, solution = tot.run(prompt)
     return success, puzzle_string, solution 
 
+def sudoku_answer_verdicts(puzzles,answers,grid_dimension=9):
+    '''
+    Score a whole set of LLM answers (boards, possibly of the wrong size) against their puzzles at once (see 
+    sudoku_validation.py). Return a list of pairs (success, error_reason), where the error reason is '' for a 
+    solution, and otherwise 'formatting error', 'extension error', 'incomplete', or 'logical/validity error'. 
+    '''
+    (boards,well_formed) = boards_to_array(answers,grid_dimension)
+    checks = validate_boards(boards,boards_to_array(puzzles,grid_dimension)[0],well_formed)
+    verdicts = []
+    for b in range(len(answers)):
+        if checks['solved'][b]:
+            verdicts.append((True,''))
+        elif not(checks['well_formed'][b]):
+            verdicts.append((False,'formatting error'))
+        elif not(checks['extends'][b]):
+            verdicts.append((False,'extension error'))
+        elif not(checks['complete'][b]):
+            verdicts.append((False,'incomplete'))
+        else:
+            verdicts.append((False,'logical/validity error'))
+    return verdicts
+
 def showSols(S):
     for (p,sol) in S:
         print("Puzzle: " + p + " --- SOLUTION: " + str(sol))
 
+# Return a tuple (success, prompt, LLM reply, error reason, board), where the board is the answer of the LLM (None if
+# it could not be extracted): 
 def solve_sudoku_puzzle_with_single_prompt(puzzle_string,grid_dimension=9,temp=1.0):
     given_puzzle = SudokuBoard.from_line(puzzle_string)
     grid_dim_str = str(grid_dimension) + "x" + str(grid_dimension)
@@ -140,33 +166,37 @@ def solve_sudoku_puzzle_with_single_prompt(puzzle_string,grid_dimension=9,temp=1
     try:
         llm_reply = llm4([],msg=prompt,temp=temp)
     except:
-        return (False, prompt,llm_reply,'LLM call failure')
+        return (False, prompt,llm_reply,'LLM call failure',None)
     (successful_json_extraction,json_dict) = common.utils.extract_json_from_text_string(llm_reply)
     if successful_json_extraction:
         line_str = str(json_dict['rows'])
         print("Managed to extract the JSON answer, about to construct a Sudoku board from this flat string: " + line_str,flush=True)
         board = SudokuBoard.from_line(line_str)
-        if not(board.has_dimension(grid_dimension)):
-            return (False, prompt,llm_reply,'formatting error')
-        res1 = board.extends(given_puzzle)
-        res2 = board.is_valid()
-        res3 = board.blank_cells() == 0
-        res = res1 and res2 and res3
-        error_reason = '' if res else ('extension error' if not(res1) else ('incomplete' if not(res3) else 'logical/validity error'))
-        return (res,prompt,llm_reply,error_reason)
+        [(res,error_reason)] = sudoku_answer_verdicts([given_puzzle],[board],grid_dimension)
+        return (res,prompt,llm_reply,error_reason,board)
     else:
         print("Could not extract a proper JSON object from this LLM reply: " + llm_reply,flush=True)
-        return (False, prompt,llm_reply,'formatting error')
+        return (False, prompt,llm_reply,'formatting error',None)
 
-def solve_sudoku_puzzle_with_independent_iterations(puzzle_string,grid_dimension=9,attempt_count=100,given_temp=1.0):
+# With a cache (a SolveCache, see solve_cache.py), a puzzle that was already solved (in this run or an earlier one, up
+# to the symmetries of SudokuBoard.canonical_form) is not sent to the LLM again, and a new solution is stored in it: 
+def solve_sudoku_puzzle_with_independent_iterations(puzzle_string,grid_dimension=9,attempt_count=100,given_temp=1.0,cache=None):
+    if cache is not None:
+        cached = cache.lookup(SudokuBoard.from_line(puzzle_string))
+        if cached:
+            print("----------- Found a solution of this puzzle in the solve cache: " + cached[0].to_line(),flush=True)
+            print(">>>>>>>> FINAL VERDICT: SUCCESS (cached)", flush=True)
+            return True
     for i in range(1,attempt_count+1):
         temp = given_temp if given_temp >= 0.0 else np.random.uniform(0.0,1.0)
         print("\n[[[[[[[[[[[[[[[[[[[[[[[[[[[[[[[[[[[[[[[[[[[[[[\nAttempt #" + str(i) + \
               " with temp: " + str(temp) + " to solve this puzzle: " + puzzle_string,flush=True)
-        (success,prompt,llm_reply,reason) = solve_sudoku_puzzle_with_single_prompt(puzzle_string,
-                                                                                   grid_dimension=grid_dimension,
-                                                                                   temp=temp)
+        (success,prompt,llm_reply,reason,board) = solve_sudoku_puzzle_with_single_prompt(puzzle_string,
+                                                                                         grid_dimension=grid_dimension,
+                                                                                         temp=temp)
         if success:
+            if cache is not None:
+                cache.store(SudokuBoard.from_line(puzzle_string),[board])
             print("----------- Fantastic - valid solution found on attempt #" + str(i) + "!",flush=True)
             print(">>>>>>>>Here is the prompt:\n" + prompt + \
                   "\n>>>>>>>>and here is the LLM's reply:\n" + llm_reply,flush=True)
@@ -184,7 +214,8 @@ def solve_sudoku_puzzle_with_independent_iterations(puzzle_string,grid_dimension
 def solve_sudoku_puzzle_with_independent_iterations_batch(file_name,
                                                           grid_dimension=9,
                                                           attempt_count=100,
-                                                          temp=1.0):
+                                                          temp=1.0,
+                                                          cache=None):
     lines = [l.strip() for l in common.utils.readFile(file_name).split("\n") if l]
     iteration = 0
     for l in lines:
@@ -194,9 +225,14 @@ def solve_sudoku_puzzle_with_independent_iterations_batch(file_name,
         solve_sudoku_puzzle_with_independent_iterations(l,
                                                         grid_dimension=grid_dimension,
                                                         attempt_count=attempt_count,
-                                                        given_temp=temp)
+                                                        given_temp=temp,
+                                                        cache=cache)
+    if cache is not None:
+        cache.flush()
+        print("Solve cache: " + str(cache) + ".",flush=True)
               
-def solve_sudoku_puzzle_batch(puzzle_file):
+# With a cache, as in solve_sudoku_puzzle_with_independent_iterations: 
+def solve_sudoku_puzzle_batch(puzzle_file,cache=None):
     lines = [l.strip() for l in common.utils.readFile(puzzle_file).split("\n") if l]
     S, F = [], []
     iteration = 0
@@ -205,7 +241,13 @@ def solve_sudoku_puzzle_batch(puzzle_file):
         iteration += 1
         print("Working on puzzle #" + str(iteration) + "...",flush=True)
         start_time = time.time()
-        success, puzzle_string, solution = solve_sudoku_puzzle(l)
+        cached = cache.lookup(SudokuBoard.from_line(l)) if cache is not None else None
+        if cached:
+            success, puzzle_string, solution = True, l, np.matrix(cached[0].rows)
+        else:
+            success, puzzle_string, solution = solve_sudoku_puzzle(l)
+            if success and cache is not None:
+                cache.store(SudokuBoard.from_line(l),[SudokuBoard.from_line(str(np.asarray(solution).tolist()))])
         end_time = time.time()
         elapsed_time = end_time - start_time
         print("Execution time for puzzle #" + str(iteration) + ": " + \
@@ -219,11 +261,20 @@ def solve_sudoku_puzzle_batch(puzzle_file):
           " puzzles in " + str(np.sum(execution_times)) + " seconds (avg time: " + \
           str(np.mean(execution_times)) + ").")
     print("\nSuccesses: " + str(len(S)))
+    if cache is not None:
+        cache.flush()
+        print("Solve cache: " + str(cache) + ".",flush=True)
         
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument('binomial-sudoku', type=str)
     parser.add_argument('binomial-24', type=str)    
+    # An optional --cache <file> (anywhere on the command line) keeps the Sudoku solutions in a solve cache: 
+    cache = None
+    if '--cache' in sys.argv:
+        k = sys.argv.index('--cache')
+        cache = SolveCache(sys.argv[k + 1])
+        del sys.argv[k:k + 2]
     first_arg = sys.argv[1]
     if first_arg == 'binomial-sudoku':
         puzzle_file = sys.argv[2]
@@ -245,7 +296,8 @@ if __name__ == "__main__":
         solve_sudoku_puzzle_with_independent_iterations_batch(puzzle_file,
                                                               grid_dimension=grid_dimension,
                                                               attempt_count=attempt_count,
-                                                              temp=temp)
+                                                              temp=temp,
+                                                              cache=cache)
     elif first_arg == 'binomial-24':
         puzzle_file = sys.argv[2]
         attempt_count = 100
@@ -266,4 +318,6 @@ if __name__ == "__main__":
                                                               temp=temp)        
     else:
         puzzle_file = first_arg
-        solve_sudoku_puzzle_batch(puzzle_file)
+        solve_sudoku_puzzle_batch(puzzle_file,cache=cache)
+    if cache is not None:
+        cache.close()
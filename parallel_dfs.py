@@ -0,0 +1,222 @@
+'''
+Parallel depth-first search with work stealing, for single hard instances (sparse Sudoku boards, games of N with more
+numbers, and so on) that State.dfs would search on one core.
+
+The master process first expands the shallowest states of the tree (as dfs would treat them: invalid states are
+pruned, solutions are reported, and max_depth is honoured) until there are split_factor * workers open subtrees or
+the shallowest open state reaches split_depth. The subtrees go into a shared task queue, in dfs order, and every
+worker process repeatedly takes a subtree and searches it depth-first with a local stack. Whenever there are more
+idle workers than queued tasks, a busy worker gives away the bottom of its stack (its shallowest, and hence usually
+largest, unexplored subtree), so idle workers effectively steal work from busy ones. Everything stops as soon as
+max_solutions solutions have been found, or when the (shared) max_iterations or time budget runs out.
+
+States cross process boundaries as lists of State.to_compact data along their paths from the initial state, which
+are rebuilt with from_compact (see checkpoint.py), so any State subclass works as long as that data is picklable
+(the default to_compact is a parentless snapshot of the state itself). Only tree search (tree_space=True) is
+supported, since the visited tables of graph search would have to be shared between the workers. Solutions are
+found in a different order than by the serial dfs, and the iteration budget is enforced approximately (workers
+update the shared count every few dozen iterations).
+'''
+import multiprocessing
+import queue
+import time
+from search import State, SearchStats
+
+# How many iterations a worker runs between updates of the shared iteration count (and checks for idle workers):
+SYNC_EVERY = 32
+
+def encode_path(state):
+    return [s.to_compact() for s in state.path()]
+
+def decode_path(cls,path_data):
+    state = None
+    for data in path_data:
+        s = cls.from_compact(data)
+        if state is not None:
+            s.set_parent(state)
+        state = s
+    return state
+
+def visit(state,max_depth,stats):
+    '''
+    Handle a popped state as State.iter_search does for dfs. Return a pair (is_solution, children).
+    '''
+    if not(state.is_valid()):
+        stats.pruned_invalid += 1
+        return (False,[])
+    if max_depth is not None and state.depth > max_depth:
+        stats.pruned_depth += 1
+        return (False,[])
+    if state.is_solution():
+        return (True,[])
+    stats.expanded += 1
+    children_states = state.expand()
+    for child_state in children_states:
+        child_state.set_parent(state)
+    stats.generated += len(children_states)
+    return (False,children_states)
+
+def dfs_worker(cls,params,tasks,results,stop,iterations,idle,queued,outstanding):
+    max_depth, max_iterations, deadline = params['max_depth'], params['max_iterations'], params['deadline']
+    stats = SearchStats()
+    unsynced = 0
+    def sync():
+        # Add this worker's recent iterations to the shared count and return the total:
+        nonlocal unsynced
+        with iterations.get_lock():
+            iterations.value += unsynced
+            total = iterations.value
+        unsynced = 0
+        return total
+    while not(stop.is_set()):
+        try:
+            path_data = tasks.get(timeout=0.01)
+        except queue.Empty:
+            if outstanding.value == 0:
+                break
+            continue
+        with queued.get_lock():
+            queued.value -= 1
+        with idle.get_lock():
+            idle.value -= 1
+        stack = [decode_path(cls,path_data)]
+        while stack and not(stop.is_set()):
+            state = stack.pop()
+            stats.iterations += 1
+            unsynced += 1
+            if unsynced >= SYNC_EVERY:
+                total = sync()
+                if total >= max_iterations or (deadline is not None and time.time() > deadline):
+                    results.put(('limit','max_iterations' if total >= max_iterations else 'time_budget'))
+                    stop.set()
+                    break
+                if len(stack) > 1 and idle.value > queued.value:
+                    # Give the bottom of the stack to an idle worker:
+                    with outstanding.get_lock():
+                        outstanding.value += 1
+                    with queued.get_lock():
+                        queued.value += 1
+                    tasks.put(encode_path(stack.pop(0)))
+            (is_solution,children_states) = visit(state,max_depth,stats)
+            if is_solution:
+                results.put(('solution',encode_path(state),iterations.value + unsynced))
+            else:
+                State.push_new(children_states,stack)
+                stats.peak_frontier = max(stats.peak_frontier,len(stack))
+        with outstanding.get_lock():
+            outstanding.value -= 1
+        with idle.get_lock():
+            idle.value += 1
+    sync()
+    results.put(('done',stats))
+
+def iter_parallel_dfs(initial_state,params=State.default_params,workers=None,split_factor=4,split_depth=None):
+    '''
+    Run a work-stealing parallel dfs from initial_state on the given number of worker processes (all cores by default).
+    Yields and returns are as for State.iter_dfs. With a single worker this simply is State.iter_dfs.
+    '''
+    params = {**State.default_params, **params}
+    workers = multiprocessing.cpu_count() if workers is None else workers
+    if not(params['tree_space']):
+        raise ValueError("Parallel dfs only supports tree search (tree_space=True).")
+    if workers <= 1:
+        return (yield from initial_state.iter_dfs(params))
+    max_iterations, max_solutions, max_depth = params['max_iterations'], params['max_solutions'], params['max_depth']
+    verbose = params['max_states_to_show'] > 0
+    start_time = time.perf_counter()
+    deadline = State.deadline_from(params)
+    stats = SearchStats()
+    def finish(reason):
+        stats.stop_reason = reason
+        stats.seconds = time.perf_counter() - start_time
+        if verbose:
+            print("Parallel dfs stopped (" + reason + ") after " + str(stats.iterations) + " iterations on " + str(workers) + " workers.")
+        return stats
+    # Split the tree in the master: repeatedly expand the shallowest open state, keeping the frontier in dfs order.
+    frontier = [initial_state]
+    while frontier and len(frontier) < split_factor * workers:
+        i = min(range(len(frontier)),key=lambda j: frontier[j].depth)
+        if split_depth is not None and frontier[i].depth >= split_depth:
+            break
+        if stats.iterations >= max_iterations:
+            return finish('max_iterations')
+        state = frontier.pop(i)
+        stats.iterations += 1
+        (is_solution,children_states) = visit(state,max_depth,stats)
+        if is_solution:
+            stats.solutions += 1
+            yield (state,stats.iterations,state.path())
+            if max_solutions is not None and stats.solutions >= max_solutions:
+                return finish('max_solutions')
+        frontier[i:i] = children_states
+    if not(frontier):
+        return finish('exhausted')
+    tasks, results, stop = multiprocessing.Queue(), multiprocessing.Queue(), multiprocessing.Event()
+    iterations = multiprocessing.Value('q',stats.iterations)
+    idle, queued, outstanding = multiprocessing.Value('i',workers), multiprocessing.Value('i',len(frontier)), multiprocessing.Value('i',len(frontier))
+    for state in frontier:
+        tasks.put(encode_path(state))
+    worker_params = {'max_depth': max_depth, 'max_iterations': max_iterations, 'deadline': deadline}
+    processes = [multiprocessing.Process(target=dfs_worker,
+                                         args=(type(initial_state),worker_params,tasks,results,stop,iterations,idle,queued,outstanding),
+                                         daemon=True)
+                 for _ in range(workers)]
+    for p in processes:
+        p.start()
+    if verbose:
+        print("Split the search tree into " + str(len(frontier)) + " subtrees for " + str(workers) + " workers.")
+    reason, done = 'exhausted', 0
+    try:
+        while done < workers:
+            try:
+                message = results.get(timeout=0.1)
+            except queue.Empty:
+                if not any(p.is_alive() for p in processes) and results.empty():
+                    break
+                continue
+            if message[0] == 'solution':
+                if reason == 'max_solutions':
+                    continue
+                state = decode_path(type(initial_state),message[1])
+                stats.solutions += 1
+                yield (state,message[2],state.path())
+                if max_solutions is not None and stats.solutions >= max_solutions:
+                    reason = 'max_solutions'
+                    stop.set()
+            elif message[0] == 'limit':
+                if reason == 'exhausted':
+                    reason = message[1]
+            else:
+                message[1].solutions = 0
+                stats.absorb(message[1])
+                done += 1
+    finally:
+        stop.set()
+        for p in processes:
+            p.join(timeout=1)
+            if p.is_alive():
+                p.terminate()
+                p.join()
+    stats.iterations = iterations.value
+    return finish(reason)
+
+def parallel_dfs(initial_state,params=State.default_params,workers=None,split_factor=4,split_depth=None):
+    return State.collect(iter_parallel_dfs(initial_state,params,workers,split_factor,split_depth),params)
+
+def report_speedup(initial_state,params=State.default_params,workers=None):
+    '''
+    Time the serial dfs and the parallel dfs on the same instance, print the speedup, and return it.
+    '''
+    params = {**State.default_params, **params, 'max_states_to_show':0, 'return_stats':True}
+    workers = multiprocessing.cpu_count() if workers is None else workers
+    start_time = time.perf_counter()
+    (serial_solutions,serial_iterations,_) = initial_state.dfs(params)
+    serial_seconds = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    (parallel_solutions,parallel_iterations,_) = parallel_dfs(initial_state,params,workers)
+    parallel_seconds = time.perf_counter() - start_time
+    speedup = serial_seconds / parallel_seconds if parallel_seconds > 0 else float('inf')
+    print("Serial dfs: " + str(len(serial_solutions)) + " solutions, " + str(serial_iterations) + " iterations, " + "%.3f" % serial_seconds + " seconds. " +
+          "Parallel dfs (" + str(workers) + " workers): " + str(len(parallel_solutions)) + " solutions, " + str(parallel_iterations) + " iterations, " +
+          "%.3f" % parallel_seconds + " seconds. Speedup: " + "%.2f" % speedup + "x.")
+    return speedup
@@ -0,0 +1,121 @@
+'''
+Portfolio search: race several (algorithm, params) configurations against each other on the same initial state,
+each in its own process, return the first solution found, and stop the others. Which search algorithm works best
+varies a lot from instance to instance (e.g., beam search with beam_width=1 is fast on the game of 24 but misses
+solutions, whereas dfs is thorough but can be slow), so a portfolio is often faster than any single configuration,
+and it never misses a solution that one of its members would find.
+
+A configuration is a triple (name, algorithm, params), where algorithm is any of the names accepted by
+State.iter_solutions and params override the params shared by the whole portfolio. Every win can be appended to a
+log file (one tab-separated line per instance: dataset, winning configuration, algorithm, iterations, seconds), and
+portfolio_winners tallies such a log per dataset, so that defaults can be tuned from real data.
+'''
+import multiprocessing
+import queue
+import time
+from collections import Counter, defaultdict
+from search import State
+
+DEFAULT_PORTFOLIO = [('dfs','dfs',{}),
+                     ('bfs','bfs',{}),
+                     ('beam-1','beam_search',{'beam_width':1}),
+                     ('beam-4','beam_search',{'beam_width':4}),
+                     ('best-first','best_first_search',{})]
+
+def run_configuration(index,initial_state,algorithm,params,results):
+    # The body of each portfolio process. Errors are reported as (index, None) so that the race can go on.
+    try:
+        results.put((index,State.run_algorithm(initial_state,algorithm,params)))
+    except Exception as e:
+        print("Portfolio configuration " + str(index) + " (" + algorithm + ") failed: " + repr(e))
+        results.put((index,None))
+
+def run_portfolio(initial_state,configurations=DEFAULT_PORTFOLIO,params=State.default_params,log_file=None,dataset=''):
+    '''
+    Race the given configurations on initial_state, one process each. As soon as one of them returns a non-empty list
+    of solutions, the remaining processes are terminated. Return a dictionary with the solutions, the name of the
+    winning configuration (None if no configuration found a solution), its iterations and seconds, and the wall-clock
+    time of the whole race. If log_file is given, a line recording the outcome is appended to it.
+    '''
+    params = {**State.default_params, **params}
+    start_time = time.perf_counter()
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=run_configuration,
+                                         args=(i,initial_state,algorithm,{**params, **config_params},results),
+                                         daemon=True)
+                 for i, (_,algorithm,config_params) in enumerate(configurations)]
+    for p in processes:
+        p.start()
+    outcome = {'solutions': [], 'winner': None, 'algorithm': None, 'iterations': 0, 'seconds': 0.0}
+    pending = len(processes)
+    try:
+        while pending > 0:
+            try:
+                (i,result) = results.get(timeout=0.1)
+            except queue.Empty:
+                # A process that died without reporting (e.g., it was killed) would otherwise make us wait forever:
+                if not any(p.is_alive() for p in processes) and results.empty():
+                    break
+                continue
+            pending -= 1
+            if result is not None and result[0]:
+                (name,algorithm,_) = configurations[i]
+                outcome = {'solutions': result[0], 'winner': name, 'algorithm': algorithm, 'iterations': result[1], 'seconds': result[2]}
+                break
+    finally:
+        for p in processes:
+            if p.is_alive():
+                p.terminate()
+        for p in processes:
+            p.join()
+    outcome['wall_time'] = time.perf_counter() - start_time
+    if params['max_states_to_show'] > 0:
+        if outcome['winner'] is None:
+            print("Portfolio: no configuration found a solution (" + "%.3f" % outcome['wall_time'] + " seconds).")
+        else:
+            print("Portfolio winner: " + outcome['winner'] + " (" + str(outcome['iterations']) + " iterations, " +
+                  "%.3f" % outcome['seconds'] + " seconds; " + "%.3f" % outcome['wall_time'] + " seconds in total).")
+    if log_file is not None:
+        with open(log_file,'a') as f:
+            f.write('\t'.join([str(dataset),str(outcome['winner']),str(outcome['algorithm']),str(outcome['iterations']),
+                               "%.6f" % outcome['seconds']]) + '\n')
+    return outcome
+
+def solve_batch_with_portfolio(file_name,parse_file,configurations=DEFAULT_PORTFOLIO,params=State.default_params,log_file=None,dataset=None):
+    '''
+    The portfolio counterpart of State.solve_batch: race the configurations on every instance parsed from file_name,
+    report the usual batch stats plus a tally of the winners, and return the list of solutions per instance.
+    '''
+    dataset = str(file_name) if dataset is None else dataset
+    quiet_params = {**params, 'max_states_to_show':0}
+    results, iters, times, winners = [], [], [], Counter()
+    start_time = time.perf_counter()
+    for initial_state in parse_file(file_name):
+        outcome = run_portfolio(initial_state,configurations,quiet_params,log_file,dataset)
+        results.append(outcome['solutions'])
+        iters.append(outcome['iterations'])
+        times.append(outcome['wall_time'])
+        winners[outcome['winner']] += 1
+    State.report_batch_stats(results,iters,times,time.perf_counter() - start_time)
+    print("Portfolio winners: " + ', '.join([str(name) + ': ' + str(count) for (name,count) in winners.most_common()]) + "\n")
+    return results
+
+def portfolio_winners(log_file):
+    '''
+    Read a portfolio log and return a dictionary mapping every dataset to a Counter of its winning configurations.
+    '''
+    tally = defaultdict(Counter)
+    with open(log_file) as f:
+        for line in f:
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) >= 2:
+                tally[fields[0]][fields[1]] += 1
+    return dict(tally)
+
+if __name__ == "__main__":
+    from twenty_four import TwentyFourState
+    file_name = 'new_data/puzzles_24_100.txt'
+    solve_batch_with_portfolio(file_name,
+                               lambda file_name: TwentyFourState.parse_file(file_name,is_csv_file=False),
+                               params={'max_iterations':2000},log_file='portfolio_log.tsv',dataset='24')
+    print(portfolio_winners('portfolio_log.tsv'))
@@ -0,0 +1,267 @@
+'''
+Incremental constraint propagation for Sudoku boards of any size N = n^2 (4x4, 9x9, 16x16, ...).
+
+A SudokuPropagator keeps a candidate set for every cell, as a bitmask (bit v set iff the value v is still possible),
+and updates it incrementally: every elimination of a value from a cell is queued, and processing it can trigger
+further eliminations through the following rules:
+
+(1) naked singles: once a cell has a single candidate left, that value is eliminated from all of its peers (the other
+cells in its row, column, and box);
+(2) hidden singles: once a value has a single possible place left in a row, column, or box, that cell is
+restricted to that value;
+(3) naked pairs: if two cells of a unit have the same two candidates, those two values are eliminated from the
+rest of the unit; and
+(4) hidden pairs: if two values of a unit can only go in the same two cells, those cells are restricted to those
+two values.
+
+Rules (1) and (2) run after every single elimination; the pair rules, which have to scan whole units, only run once
+the singles have reached a fixpoint (and only at the 'pairs' level). A cell or a unit that runs out of candidates
+or places signals a contradiction, i.e., the board (with the assignments made so far) has no solution.
+
+The propagator is cheap to copy (a list of N^2 ints), so a search can give every child its own copy, assign one
+value, and propagate only the consequences of that assignment. See PropagatingSudokuBoard in sudoku.py. A search that
+works on a single board in place can set trail to a list instead: every elimination is then recorded there, and
+undo_to takes the eliminations back down to an earlier length of the trail.
+'''
+
+class SudokuPropagator:
+
+    # For each N, the triple (units, units of every cell, peers of every cell), where units lists the cell indices
+    # (in row-major order) of every row, column, and box:
+    geometries = {}
+
+    @classmethod
+    def geometry(cls, N):
+        if N not in cls.geometries:
+            n = int(N ** 0.5)
+            if n * n != N:
+                raise ValueError("The size of a Sudoku board must be a perfect square, not " + str(N))
+            rows = [tuple(r * N + c for c in range(N)) for r in range(N)]
+            cols = [tuple(r * N + c for r in range(N)) for c in range(N)]
+            boxes = [tuple((br * n + r) * N + bc * n + c for r in range(n) for c in range(n)) for br in range(n) for bc in range(n)]
+            units = rows + cols + boxes
+            cell_units = [[] for _ in range(N * N)]
+            for (u, unit) in enumerate(units):
+                for i in unit:
+                    cell_units[i].append(u)
+            peers = [tuple(sorted(set(j for u in cell_units[i] for j in units[u]) - {i})) for i in range(N * N)]
+            cls.geometries[N] = (units, [tuple(us) for us in cell_units], peers)
+        return cls.geometries[N]
+
+    def __init__(self, N):
+        self.N = N
+        (self.units, self.cell_units, self.peers) = SudokuPropagator.geometry(N)
+        self.full = (1 << (N + 1)) - 2
+        self.cands = [self.full] * (N * N)
+        # settled[i] is 1 once cell i is down to one candidate and that value has been eliminated from its peers:
+        self.settled = bytearray(N * N)
+        # The cells settled since the last call of drain_settled:
+        self.newly_settled = []
+        # Queued eliminations, as pairs (cell, bit of the value):
+        self.pending = []
+        # place_counts[u * (N + 1) + v] is the number of cells of unit u that still have v as a candidate:
+        self.place_counts = [N] * (len(self.units) * (N + 1))
+        # The eliminations made by propagate, as pairs (cell, bit of the value), if this is a list (see undo_to):
+        self.trail = None
+
+    def copy(self):
+        other = object.__new__(SudokuPropagator)
+        (other.N, other.units, other.cell_units, other.peers, other.full) = (self.N, self.units, self.cell_units, self.peers, self.full)
+        other.cands = self.cands[:]
+        other.place_counts = self.place_counts[:]
+        other.settled = bytearray(self.settled)
+        other.newly_settled, other.pending, other.trail = [], [], None
+        return other
+
+    def load(self, values):
+        '''
+        Assign the given values (a flat list in row-major order, with 0 for blanks). Return False on a clash, or if
+        some cell or some value of a unit is left without candidates.
+        '''
+        if self.pending or self.cands.count(self.full) != len(self.cands):
+            for (i, v) in enumerate(values):
+                if v and not(self.assign(i, v)):
+                    return False
+            return True
+        # On a fresh propagator, the candidates and place counts are computed in bulk, rather than by queueing the
+        # eliminations of every given one at a time; only the singles that this uncovers are queued.
+        (cands, units, cell_units, stride) = (self.cands, self.units, self.cell_units, self.N + 1)
+        used = [0] * len(units)
+        for (i, v) in enumerate(values):
+            if v:
+                bit = 1 << v
+                for u in cell_units[i]:
+                    if used[u] & bit:
+                        return False
+                    used[u] |= bit
+        place_counts = [0] * len(self.place_counts)
+        for (i, v) in enumerate(values):
+            us = cell_units[i]
+            c = 1 << v if v else self.full & ~(used[us[0]] | used[us[1]] | used[us[2]])
+            if c == 0:
+                return False
+            cands[i] = c
+            if c & (c - 1) == 0:
+                self.settled[i] = 1
+                self.newly_settled.append(i)
+                if not(v):
+                    for j in self.peers[i]:
+                        if cands[j] & c:
+                            self.pending.append((j, c))
+            while c:
+                low = c & -c
+                v = low.bit_length() - 1
+                for u in us:
+                    place_counts[u * stride + v] += 1
+                c ^= low
+        self.place_counts = place_counts
+        for (u, unit) in enumerate(units):
+            for v in range(1, stride):
+                count = place_counts[u * stride + v]
+                if count == 0:
+                    return False
+                if count == 1:
+                    bit = 1 << v
+                    for j in unit:
+                        if cands[j] & bit:
+                            if cands[j] != bit:
+                                self.restrict(j, bit)
+                            break
+        return True
+
+    def assign(self, i, v):
+        '''
+        Queue the eliminations that restrict cell i to the value v. Return False if v is not a candidate of i.
+        '''
+        bit = 1 << v
+        if not(self.cands[i] & bit):
+            return False
+        self.restrict(i, bit)
+        return True
+
+    def restrict(self, i, keep):
+        # Queue the elimination of every candidate of cell i that is not in the mask keep:
+        others = self.cands[i] & ~keep
+        while others:
+            low = others & -others
+            self.pending.append((i, low))
+            others ^= low
+
+    def propagate(self, level='pairs'):
+        '''
+        Process all queued eliminations and everything they entail, using the single rules, and also the pair rules
+        if level is 'pairs'. Return False iff a contradiction was found.
+        '''
+        while True:
+            if not(self.propagate_singles()):
+                return False
+            if level != 'pairs' or not(self.find_pairs()):
+                return True
+
+    def propagate_singles(self):
+        cands, pending, units, place_counts, stride = self.cands, self.pending, self.units, self.place_counts, self.N + 1
+        trail = self.trail
+        while pending:
+            (i, bit) = pending.pop()
+            c = cands[i]
+            if not(c & bit):
+                continue
+            c ^= bit
+            cands[i] = c
+            if trail is not None:
+                trail.append((i, bit))
+            if c == 0:
+                pending.clear()
+                return False
+            if c & (c - 1) == 0 and not(self.settled[i]):
+                # A naked single:
+                self.settled[i] = 1
+                self.newly_settled.append(i)
+                for j in self.peers[i]:
+                    if cands[j] & c:
+                        pending.append((j, c))
+            v = bit.bit_length() - 1
+            for u in self.cell_units[i]:
+                k = u * stride + v
+                place_counts[k] -= 1
+                if place_counts[k] == 0:
+                    pending.clear()
+                    return False
+                if place_counts[k] == 1:
+                    # A hidden single:
+                    for j in units[u]:
+                        if cands[j] & bit:
+                            if cands[j] != bit:
+                                self.restrict(j, bit)
+                            break
+        return True
+
+    def find_pairs(self):
+        '''
+        Apply the naked-pair and hidden-pair rules to every unit, queueing the eliminations they entail. Return True
+        iff anything was queued.
+        '''
+        cands, place_counts, stride, queued = self.cands, self.place_counts, self.N + 1, False
+        for (u, unit) in enumerate(self.units):
+            seen = {}
+            for j in unit:
+                c = cands[j]
+                if c.bit_count() == 2:
+                    if c in seen:
+                        for k in unit:
+                            if k != j and k != seen[c] and cands[k] & c:
+                                self.restrict(k, ~c)
+                                queued = True
+                    else:
+                        seen[c] = j
+            places_of = {}
+            for v in range(1, stride):
+                # (Only the values with two places left, according to the place counts, need a look.)
+                if place_counts[u * stride + v] == 2:
+                    bit = 1 << v
+                    places = tuple(j for j in unit if cands[j] & bit)
+                    places_of.setdefault(places, []).append(bit)
+            for (places, bits) in places_of.items():
+                if len(bits) == 2:
+                    keep = bits[0] | bits[1]
+                    for j in places:
+                        if cands[j] & ~keep:
+                            self.restrict(j, keep)
+                            queued = True
+        return queued
+
+    def undo_to(self, mark):
+        '''
+        Take back the eliminations recorded in the trail after its first mark entries, and drop whatever is queued.
+        '''
+        (cands, trail, place_counts, stride) = (self.cands, self.trail, self.place_counts, self.N + 1)
+        while len(trail) > mark:
+            (i, bit) = trail.pop()
+            cands[i] |= bit
+            if cands[i] & (cands[i] - 1):
+                self.settled[i] = 0
+            v = bit.bit_length() - 1
+            for u in self.cell_units[i]:
+                place_counts[u * stride + v] += 1
+        self.pending.clear()
+        self.newly_settled = []
+
+    def value(self, i):
+        '''
+        The value of cell i if it has a single candidate, and 0 otherwise.
+        '''
+        c = self.cands[i]
+        return c.bit_length() - 1 if c & (c - 1) == 0 else 0
+
+    def candidate_values(self, i):
+        # From the largest to the smallest, as SudokuBoard.cands orders them:
+        c = self.cands[i]
+        return [v for v in range(self.N, 0, -1) if c >> v & 1]
+
+    def drain_settled(self):
+        '''
+        Return the pairs (cell, value) of the cells settled since the last call.
+        '''
+        settled = [(i, self.value(i)) for i in self.newly_settled]
+        self.newly_settled = []
+        return settled
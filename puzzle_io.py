@@ -0,0 +1,200 @@
+'''
+Streaming readers and a compact binary format for puzzle files, for corpora of millions of puzzles.
+
+The text readers never load a whole file: iter_lines yields the non-empty lines of a file one at a time, and
+scan_board parses a board in the text format of the Sudoku data files, "[[_,3,...],...,[...]]", in linear time and
+without eval. SudokuBoard.iter_file and TwentyFourState.iter_file build on them.
+
+The binary files have a 16-byte header (a 4-byte magic string, then, for Sudoku, the board size N in one byte; the
+other bytes are zero) followed by fixed-width records: N * N bytes per Sudoku board (the values of its cells, in
+row-major order, with 0 for a blank; see SUDOKU_SYMBOLS), and 4 bytes per game of 24 (its four numbers, each of
+which must be an integer between 0 and 255). The number of records follows from the file size, so files can be
+written in a streaming fashion and appended to, and open_sudoku_binary and open_24_binary memory-map them as NumPy
+arrays of shape (count, N, N) and (count, 4) without reading them in. (Those arrays can be passed straight to
+sudoku_validation.validate_boards.)
+
+Run python3 puzzle_io.py to-binary|to-text sudoku|24 <input-file> <output-file> to convert between the text files
+of new_data/ and the binary format.
+'''
+import os
+import re
+import sys
+import numpy as np
+
+# The symbols of the values of Sudoku cells: '*' for a blank (0), and the decimal numbers '1', '2', ..., for the values
+# 1, 2, ..., so that boards up to 9x9 have single digits, and 16x16 and 25x25 boards also have '10', '11', and so on
+# (which is also what the ToT checker in actors/checker.py expects). Values go up to 255, as in the binary format.
+SUDOKU_SYMBOLS = ['*'] + [str(v) for v in range(1,256)]
+SUDOKU_VALUES = {symbol: v for (v,symbol) in enumerate(SUDOKU_SYMBOLS)}
+SUDOKU_VALUES['_'] = 0
+
+SUDOKU_MAGIC = b'SDK1'
+TWENTY_FOUR_MAGIC = b'T241'
+HEADER_SIZE = 16
+
+# Whitespace and quotes, which scan_board drops, and the brackets of a row with its contents:
+IGNORED_CHARACTERS = str.maketrans('', '', ' \t\r\n\'"')
+BOARD_ROW = re.compile(r"\[([^\[\]]*)\]")
+
+def scan_board(line):
+    '''
+    Parse a board of the form "[[...], ..., [...]]", whose entries are symbols (such as digits), or '*' or '_' for a
+    blank, optionally quoted. Return its rows, as lists of strings with '*' for every blank. (This takes a few linear
+    passes over the line, all of them in C: dropping whitespace and quotes, finding the rows, and splitting them.)
+    '''
+    text = line.translate(IGNORED_CHARACTERS).replace('_','*')
+    if len(text) < 4 or text[0] != '[' or text[-1] != ']':
+        raise ValueError("Invalidly formatted board: " + line)
+    inner = text[1:-1]
+    rows = BOARD_ROW.findall(inner)
+    # Everything outside the rows must be the commas between them:
+    if not(rows) or ','.join(['[' + row + ']' for row in rows]) != inner:
+        raise ValueError("Invalidly formatted board: " + line)
+    rows = [row.split(',') for row in rows]
+    if any('' in row for row in rows):
+        raise ValueError("Empty entry in this board: " + line)
+    return rows
+
+def sudoku_values(entries):
+    '''
+    The values of the given Sudoku symbols (see SUDOKU_SYMBOLS), as a list of ints. Raise ValueError on anything else.
+    '''
+    try:
+        return [SUDOKU_VALUES[entry] for entry in entries]
+    except KeyError as e:
+        raise ValueError("Not a symbol of a Sudoku cell: " + repr(e.args[0]))
+
+def iter_lines(file_name):
+    '''
+    Yield the stripped non-empty lines of a text file, one at a time.
+    '''
+    with open(file_name) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield line
+
+def write_header(f,magic,N=0):
+    f.write(magic + bytes([N]) + bytes(HEADER_SIZE - len(magic) - 1))
+
+def read_header(file_name,magic):
+    with open(file_name,'rb') as f:
+        header = f.read(HEADER_SIZE)
+    if len(header) != HEADER_SIZE or header[:len(magic)] != magic:
+        raise ValueError(str(file_name) + " is not a binary puzzle file of the expected kind")
+    return header[len(magic)]
+
+def write_sudoku_binary(boards,file_name):
+    '''
+    Write the given boards (any iterable of SudokuBoards of the same size, consumed lazily) to a binary file. Return
+    the number of boards written.
+    '''
+    count, N = 0, None
+    with open(file_name,'wb') as f:
+        for board in boards:
+            if N is None:
+                N = board.N
+                write_header(f,SUDOKU_MAGIC,N)
+            elif board.N != N:
+                raise ValueError("All the boards of a binary file must have the same size")
+            f.write(bytes(board.values()))
+            count += 1
+        if N is None:
+            write_header(f,SUDOKU_MAGIC)
+    return count
+
+def open_sudoku_binary(file_name):
+    '''
+    Memory-map a binary Sudoku file as a read-only uint8 array of shape (count, N, N).
+    '''
+    N = read_header(file_name,SUDOKU_MAGIC)
+    count = (os.path.getsize(file_name) - HEADER_SIZE) // (N * N) if N else 0
+    if count == 0:
+        return np.zeros((0,N,N),dtype=np.uint8)
+    return np.memmap(file_name,dtype=np.uint8,mode='r',offset=HEADER_SIZE,shape=(count,N,N))
+
+def iter_sudoku_binary(file_name,cls):
+    '''
+    Yield the boards of a binary Sudoku file as instances of cls (a SudokuBoard class), one at a time.
+    '''
+    for cells in open_sudoku_binary(file_name):
+        yield cls.from_values(cells.ravel().tolist())
+
+def write_24_binary(puzzles,file_name):
+    '''
+    Write the given games of 24 (TwentyFourStates or sequences of four numbers, consumed lazily) to a binary file.
+    Return the number of puzzles written.
+    '''
+    count = 0
+    with open(file_name,'wb') as f:
+        write_header(f,TWENTY_FOUR_MAGIC)
+        for puzzle in puzzles:
+            numbers = puzzle.available_nums if hasattr(puzzle,'available_nums') else puzzle
+            if len(numbers) != 4 or not(all(float(x).is_integer() and 0 <= x <= 255 for x in numbers)):
+                raise ValueError("Only four integers between 0 and 255 fit in a binary record: " + str(numbers))
+            f.write(bytes([int(x) for x in numbers]))
+            count += 1
+    return count
+
+def open_24_binary(file_name):
+    '''
+    Memory-map a binary file of games of 24 as a read-only uint8 array of shape (count, 4).
+    '''
+    read_header(file_name,TWENTY_FOUR_MAGIC)
+    count = (os.path.getsize(file_name) - HEADER_SIZE) // 4
+    if count == 0:
+        return np.zeros((0,4),dtype=np.uint8)
+    return np.memmap(file_name,dtype=np.uint8,mode='r',offset=HEADER_SIZE,shape=(count,4))
+
+def iter_24_binary(file_name,cls):
+    for numbers in open_24_binary(file_name):
+        yield cls([str(x) for x in numbers.tolist()])
+
+def sudoku_text_to_binary(text_file,binary_file,cls):
+    return write_sudoku_binary(cls.iter_file(text_file),binary_file)
+
+def write_sudoku_text(boards,file_name):
+    '''
+    Write the given boards (any iterable of SudokuBoards, consumed lazily) to a text file in the format of the data
+    files, one board per line. Return the number of boards written.
+    '''
+    count = 0
+    with open(file_name,'w') as f:
+        for board in boards:
+            f.write(board.to_line() + '\n')
+            count += 1
+    return count
+
+def sudoku_binary_to_text(binary_file,text_file,cls):
+    return write_sudoku_text(iter_sudoku_binary(binary_file,cls),text_file)
+
+def twenty_four_text_to_binary(text_file,binary_file,cls,is_csv_file=True):
+    return write_24_binary(cls.iter_file(text_file,is_csv_file),binary_file)
+
+def twenty_four_binary_to_text(binary_file,text_file):
+    # (In the format of puzzles_24_100.txt, i.e., not as a CSV file.)
+    count = 0
+    with open(text_file,'w') as f:
+        for numbers in open_24_binary(binary_file):
+            f.write(' '.join([str(x) for x in numbers.tolist()]) + '\n')
+            count += 1
+    return count
+
+if __name__ == "__main__":
+    if len(sys.argv) != 5 or sys.argv[1] not in ['to-binary','to-text'] or sys.argv[2] not in ['sudoku','24']:
+        print("Usage: python3 puzzle_io.py to-binary|to-text sudoku|24 <input-file> <output-file>")
+        exit(1)
+    (direction,kind,input_file,output_file) = sys.argv[1:]
+    if kind == 'sudoku':
+        from sudoku import SudokuBoard
+        if direction == 'to-binary':
+            count = sudoku_text_to_binary(input_file,output_file,SudokuBoard)
+        else:
+            count = sudoku_binary_to_text(input_file,output_file,SudokuBoard)
+    else:
+        from twenty_four import TwentyFourState
+        if direction == 'to-binary':
+            count = twenty_four_text_to_binary(input_file,output_file,TwentyFourState,input_file.endswith('.csv'))
+        else:
+            count = twenty_four_binary_to_text(input_file,output_file)
+    print("Converted " + str(count) + " puzzles from " + input_file + " to " + output_file + ".")
@@ -1,7 +1,8 @@
 ''' 
 The class State implements general classical-AI search functionality over trees or general graphs: 
 depth-first, breadth-first, iterative deepening, best-first, beam search, and A*. All six algorithms 
-are implemented by passing appropriate argument values to one single method, State.search. 
+are implemented by passing appropriate argument values to one single method, State.search, except for
+iterative deepening, which (like IDA*) is implemented by State.iter_cost_bounded_search. 
 
 Backtracking pruning is also implemented by incorporating into State.search a virtual method is_valid that
 determines whether a given state is feasible. Only valid states are expanded. The default implementation
@@ -19,12 +20,51 @@ edges from the start state to s) as its cost. Any over-riding implementation mus
 Parameters that can be used to control the search include the maximum number of iterations; the maximum
 number of states to show during the execution of a search algorithm (5 by default; setting this to 0 forces
 the algorithm to be silent); the maximum number of solutions to return (1 by default); the maximum depth 
-to search (no such limit exists by default); the beam width (this is only applicable to beam search); and
+to search (no such limit exists by default); the maximum number of seconds to spend on the search (time_budget, 
+no limit by default) and/or an absolute deadline (a time.time() value; none by default); the beam width (this is 
+only applicable to beam search); and
 tree_space, a parameter indicating whether the search space is a tree (true by default; setting this to
 False means that the search space is a non-tree graph, i.e., that there are multiple paths between some
 pairs of nodes). In that case the implementation uses hash tables to keep track of the search fringe 
-as well as the set of visited nodes. By default, states are hashed on their string representations, but this
-can be changed by overriding the __hash__ and __eq__ methods. 
+as well as the set of visited nodes. States are hashed and compared on their state keys (see state_key), which
+are computed once per state and cached. By default the key is the string representation of the state, but 
+subclasses should override compute_state_key to return something compact, hashable, and immutable (e.g., a tuple). 
+A state that is mutated in place after its key has been computed must call invalidate_key. 
+
+The open states of a search are kept in a frontier (see frontier.py): a stack for depth-first search, a FIFO for
+breadth-first search (optionally spilling to disk once it holds more than 'spill_threshold' states, so that wide 
+searches run in bounded memory), a priority queue for best-first search and A*, and a bounded priority queue for 
+beam search. 
+
+Every search keeps a SearchStats record (states expanded, generated, and pruned, duplicates rejected, peak frontier
+size, and, if the 'profile' param is set, the time spent in expand, is_valid, distance, and is_solution). Setting the
+'return_stats' param makes every algorithm return a triple (solutions, iterations, stats) instead of the usual pair 
+(solutions, iterations). An optional SearchObserver can be passed as the 'observer' param to follow the search as 
+it runs. 
+
+When searching a tree, the same state can still be reached along many different paths. Setting the 
+'transposition_size' param to a positive number enables a transposition table with that many entries (with LRU 
+eviction; see transposition.py) that records the cheapest cost at which each state key was reached and whether its
+subtree is known to be dead. States reached again at no smaller cost, and states with dead subtrees, are skipped. 
+Note that skipping them also skips any further solutions that differ only in the path leading to that state. 
+
+Long runs of dfs, bfs, best-first search, A*, and beam search (but not anytime weighted A*) can be checkpointed 
+by setting the 'checkpoint_file' param: the search then saves its progress to that file every 'checkpoint_every' iterations (and/or every 
+'checkpoint_seconds' seconds), and when it stops at its iteration cap or runs out of time. If the file exists when 
+the search starts, the search resumes from it. (Raise max_iterations to continue a search that stopped at its 
+iteration cap.) A search that completes (finding max_solutions solutions or exhausting the space) removes the file.
+Only the same search (the same initial state, algorithm, and params, except for the budgets) can resume from a file;
+any other search raises a ValueError. States are stored via to_compact and rebuilt via from_compact; see 
+checkpoint.py. 
+
+Best-first search and A* keep every generated state. Setting the 'max_stored_states' param turns best_first_search
+into a memory-bounded search in the style of SMA* (see iter_sma_star), which drops the worst leaves when memory is 
+full and regenerates them when they become promising again. 
+
+To race several algorithms (or several parameter settings) against each other on one instance, see portfolio.py. For a
+work-stealing depth-first search of one hard instance on several cores, see parallel_dfs.py. To skip instances that
+were already solved in an earlier run (or that are symmetric to one, see canonical_form), pass a SolveCache (see
+solve_cache.py) to solve_batch.
 
 By default a state contains only a pointer to its parent state (used to obtain solution paths), and its depth. 
 Of course subclasses derived from State will typically have additional content, e.g., a Sudoku state will
@@ -36,46 +76,97 @@ returns False); and
 (3) the expand method, which returns a list of all and only the successor states of self; and, if applicable,
 (4) the is_valid method. 
 
+Optionally, a class can also implement the reversible move protocol: moves(), which returns the moves available in a
+state (in the same order as expand() generates the corresponding children); apply(move), which makes a move in 
+place; and undo(move), which takes it back. State.dfs_in_place then runs depth-first search by mutating a single 
+state object instead of allocating a new state for every child, and rebuilds solution paths from the move stack. 
+
 See sudoku.py and twenty_four.py for examples of tree-based search, and see graph.py for graph-based examples
 and A*. 
 '''
 
-from queue import *
-from heapq import merge 
+from frontier import Frontier, StackFrontier, FifoFrontier, Queue, PriorityFrontier, BeamFrontier, SpillingFifoFrontier
+from transposition import TranspositionTable
+from checkpoint import save_checkpoint, load_checkpoint, remove_checkpoint, search_fingerprint
 from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import copy
+import heapq
+import itertools
+import os
+import time
 import numpy as np
 
-def in_place_merge_descending(L1, L2, get_key=lambda x: x):
+class SearchStats:
     '''
-    This helper function takes two lists L1 and L2 of arbitrary objects, where every such object x 
-    has some numeric key associated with it, obtained by get_key(x). (By default, get_key is the
-    identity function.) L1 is already sorted in reverse. This function sorts L2 (also in reverse order)
-    and then does an in-place merge of the result with L1. The idea here is that L1 will typically
-    be large and already sorted, while L2 will be relatively small. So instead of adding L2's elements
-    to L1 and then re-sorting the entire thing from scratch, we only sort L2 and then merge. 
+    A record of what a single search did. The counters are always maintained (they are plain integer increments).
+    The cumulative times spent in expand, is_valid, distance (which covers all state scoring, i.e., get_cost() + 
+    distance(), done by priority frontiers), and is_solution are only measured when the 'profile' param is True. 
+    stop_reason is one of 'max_solutions', 'exhausted', 'max_iterations', or 'time_budget' (which also covers the 
+    deadline). When best-first or beam search is cut short by a budget, best_open_state is the open state with 
+    the best f-score, i.e., the most promising partial answer. 
     '''
-    # First, sort L2: 
-    L2.sort(key=get_key,reverse=True)
-    # Then, expand L1 to accommodate the elements of L2: 
-    L1.extend([None] * len(L2))
-    # Set up three indices (for L1, L2, and the merged list): 
-    i1 = len(L1) - len(L2) - 1  # Index of the last non-None element in the original L1
-    i2 = len(L2) - 1            # Index of the last element in L2
-    i = len(L1) - 1             # Index for the merged list
-    # Finally, merge L2 into L1 in-place, starting from the end: 
-    while i1 >= 0 and i2 >= 0:
-        if get_key(L1[i1]) < get_key(L2[i2]):
-            L1[i] = L1[i1]
-            i1 -= 1
-        else:
-            L1[i] = L2[i2]
-            i2 -= 1
-        i -= 1
-    # If any elements are left in L2, place them at whatever empty locations remain in L1: 
-    while i2 >= 0:
-        L1[i] = L2[i2]
-        i2 -= 1
-        i -= 1
+    def __init__(self) -> None:
+        self.iterations = 0
+        self.expanded = 0
+        self.generated = 0
+        self.pruned_invalid = 0
+        self.pruned_depth = 0
+        self.duplicates = 0
+        self.pruned_dead = 0
+        self.pruned_bound = 0
+        self.stale = 0
+        self.forgotten = 0
+        self.solutions = 0
+        self.peak_frontier = 0
+        self.time_expand = 0.0
+        self.time_is_valid = 0.0
+        self.time_distance = 0.0
+        self.time_is_solution = 0.0
+        self.seconds = 0.0
+        self.stop_reason = None
+        self.best_open_state = None
+
+    def timed(self, field, f):
+        '''
+        Wrap f so that the time spent in it is added to the given field. 
+        '''
+        def timed_f(*args):
+            start_time = time.perf_counter()
+            result = f(*args)
+            setattr(self, field, getattr(self, field) + time.perf_counter() - start_time)
+            return result
+        return timed_f
+
+    def absorb(self, other):
+        '''
+        Add the counters and times of another record (e.g., of a later round of the same search) to this one. 
+        '''
+        for (field,value) in vars(other).items():
+            if field == 'peak_frontier':
+                self.peak_frontier = max(self.peak_frontier,value)
+            elif isinstance(value,(int,float)) and not(isinstance(value,bool)):
+                setattr(self,field,getattr(self,field) + value)
+
+    def as_dict(self):
+        return dict(vars(self))
+
+    def __str__(self):
+        return ', '.join(k + ': ' + (("%.4f" % v) if isinstance(v,float) else str(v)) for k, v in vars(self).items())
+
+class SearchObserver:
+    '''
+    Base class for optional search observers, passed to State.search via the 'observer' param. All callbacks are
+    no-ops by default; override the ones you need. When no observer is given, the search loop makes no calls at all. 
+    '''
+    def on_expand(self, stats, state, children_states, open_states):
+        pass
+
+    def on_solution(self, stats, state):
+        pass
+
+    def on_finish(self, stats):
+        pass
 
 class State(ABC):
 
@@ -84,12 +175,28 @@ class State(ABC):
                       'max_solutions': 1,
                       'max_depth': None,
                       'beam_width': 4,
-                      'tree_space': True}
+                      'tree_space': True,
+                      'time_budget': None,
+                      'deadline': None,
+                      'cost_bound': None,
+                      'weight': 3.0,
+                      'weight_decay': 0.5,
+                      'checkpoint_file': None,
+                      'checkpoint_every': 10000,
+                      'checkpoint_seconds': None,
+                      'observer': None,
+                      'profile': False,
+                      'return_stats': False,
+                      'transposition_size': 0,
+                      'max_stored_states': None,
+                      'spill_threshold': None,
+                      'spill_directory': None}
     
     def __init__(self) -> None:
         self.parent = None
         self.depth = 0
-        pass
+        self.cached_key = None
+        self.cached_hash = None
 
     @abstractmethod
     def __str__(self):
@@ -98,12 +205,49 @@ class State(ABC):
     def is_valid(self):
         return True
 
+    @staticmethod
+    def deadline_from(params):
+        '''
+        Return the absolute time (as a time.time() value) at which a search with the given params must stop, 
+        combining the 'deadline' and 'time_budget' params, or None if neither is set. 
+        '''
+        deadline = params.get('deadline')
+        if params.get('time_budget') is not None:
+            budget_deadline = time.time() + params['time_budget']
+            deadline = budget_deadline if deadline is None else min(deadline,budget_deadline)
+        return deadline
+
+    def compute_state_key(self):
+        '''
+        Return a compact, hashable, immutable key that identifies this state: two states are considered
+        the same state iff their keys are equal. The default is the string representation. 
+        '''
+        return str(self)
+
+    def state_key(self):
+        '''
+        Return the key of this state, computing it (and its hash) only the first time around. 
+        '''
+        if self.cached_key is None:
+            self.cached_key = self.compute_state_key()
+            self.cached_hash = hash(self.cached_key)
+        return self.cached_key
+
+    def invalidate_key(self):
+        '''
+        Must be called whenever the state is mutated in place, so that its key is recomputed. 
+        '''
+        self.cached_key = None
+        self.cached_hash = None
+
     def __hash__(self):
-        return hash(str(self))
+        if self.cached_hash is None:
+            self.state_key()
+        return self.cached_hash
     
     def __eq__(self, other):
         if isinstance(other, State):
-            return str(self) == str(other)
+            return self is other or (hash(self) == hash(other) and self.state_key() == other.state_key())
         return NotImplemented
     
     # Set s to be the parent of this state:
@@ -114,6 +258,16 @@ class State(ABC):
     def is_solution(self):
         return False    
 
+    @classmethod
+    def verify_solutions(cls,initial_states,results):
+        '''
+        Check the solutions found for a batch of instances (results[i] is the list of solutions found for
+        initial_states[i]) and return a list of flags, one per instance, telling whether all of its solutions are
+        genuine. The default calls is_solution on every solution; a subclass can check a whole result set at once
+        (see SudokuBoard.verify_solutions). 
+        '''
+        return [all([s.is_solution() for s in solutions]) for solutions in results]
+
     @staticmethod
     def push_new(new_items,old_items):
         for item in reversed(new_items):
@@ -129,12 +283,93 @@ class State(ABC):
         '''
         return 0
 
+    # A subclass can set this to a class method that takes a list of states and returns the list of their distances, 
+    # computed in one go (vectorized, or via a cache). Best-first and beam search then score each batch of children 
+    # with a single call instead of calling distance() on every child. It must be defined on the same class as 
+    # distance(); otherwise it is ignored (see f_scores_function). 
+    distance_batch = None
+
+    @classmethod
+    def f_scores_function(cls):
+        '''
+        Return a function that maps a list of states of this class to their f-scores (get_cost() + distance()) 
+        with one distance_batch call, or None if the class has no distance_batch. A distance_batch that is defined
+        on another class than distance() (e.g., inherited by a subclass that only overrides distance()) is not used,
+        since it would compute some other heuristic. 
+        '''
+        defined_on = lambda name: next(c for c in cls.__mro__ if name in c.__dict__)
+        if cls.distance_batch is None or defined_on('distance_batch') is not defined_on('distance'):
+            return None
+        def f_scores(states):
+            return [s.get_cost() + d for (s,d) in zip(states,cls.distance_batch(states))]
+        return f_scores
+
     def get_cost(self):
         '''        
         Return the true cost/distance from the initial state to self.  
         '''        
         return self.depth
     
+    def to_compact(self):
+        '''
+        Return compact, picklable data from which from_compact can rebuild this state (apart from its parent and
+        depth), used by checkpoints. The default is a parentless snapshot of the state itself; subclasses should 
+        return something small, such as a tuple. 
+        '''
+        return self.snapshot()
+
+    @classmethod
+    def from_compact(cls, data):
+        return data
+
+    def canonical_form(self):
+        '''
+        Return a pair (key, transform), where key is a picklable value that is the same for all the states that are
+        equivalent to this one under the symmetries of the problem, and transform is whatever to_canonical and
+        from_canonical need to map solutions between this state and its canonical form. Used by the solve cache (see
+        solve_cache.py). The default returns None, which keeps the states of a class out of the cache: the cached
+        solutions are rebuilt without their paths, which are the whole answer for some problems (e.g., the game of 24).
+        '''
+        return None
+
+    def to_canonical(self, solution, transform):
+        # Compact data for a solution of this state, mapped to the canonical form through the given transform:
+        return solution.to_compact()
+
+    def from_canonical(self, data, transform):
+        # The inverse of to_canonical, i.e., a solution of this state:
+        return type(self).from_compact(data)
+
+    def moves(self):
+        '''
+        Return the list of moves available in this state, in the order in which expand() generates the 
+        corresponding children. Only needed for dfs_in_place. 
+        '''
+        raise NotImplementedError
+
+    def apply(self, move):
+        '''
+        Make the given move in place. 
+        '''
+        raise NotImplementedError
+
+    def undo(self, move):
+        '''
+        Take back the given move, which must be the last move applied. 
+        '''
+        raise NotImplementedError
+
+    def snapshot(self):
+        '''
+        Return an independent copy of this state, without its parent. Subclasses can override this with something 
+        cheaper than a deep copy. 
+        '''
+        parent, self.parent = self.parent, None
+        try:
+            return copy.deepcopy(self)
+        finally:
+            self.parent = parent
+
     def print_state_frontier(self,
                              states,
                              state_iterator,
@@ -162,43 +397,40 @@ class State(ABC):
             self.print_state_frontier(states,state_iterator,max_states_to_show=max_states_to_show)
 
     @staticmethod
-    def worth_keeping(s,visited_table,frontier_table,graph_state_space):
+    def is_new_or_cheaper(s,visited_table,frontier_table):
         '''        
-        If we are searching a tree we keep every expanded state, since every such state is fresh (we didn't see it before).
-        For a graph, a state can be generated multiple times, so a state might either have already been visited, in
-        which case we only keep it if its cost is smaller than the one we saw before; or it might already be in the frontier,
-        in which case we keep it there but replacing it with the new instance if the latter's cost is smaller.
+        When searching a graph, a state can be generated multiple times. If it has already been visited, we only keep
+        the new instance if its cost is smaller than the one we saw before (in which case the state is reopened). If it
+        is already in the frontier, we only keep the new instance if it is cheaper; the new instance then takes over the
+        frontier_table entry, and the old, more expensive instance becomes stale and is skipped when it is popped
+        (lazy deletion). s must already have its parent set, since its cost may depend on its depth. 
         '''                
-        if not(graph_state_space):
-            # If we're searching a tree, 
-            return True
         if s in visited_table:
             if visited_table[s].get_cost() > s.get_cost():
                 visited_table.pop(s)
                 return True
-            else:
-                return False
+            return False
         if s in frontier_table:
-            if frontier_table[s].get_cost() > s.get_cost():
-                frontier_table[s] = s
-                return False
-            else:
-                return False
+            return frontier_table[s].get_cost() > s.get_cost()
         return True 
 
-    @staticmethod
-    def switch_if_cheaper_path_exists(state,frontier_table):
-        if state in frontier_table and [state].get_cost() < state.get_cost():
-            return frontier_table[state]
-        else:
-            return state
-        
-    def search(self,
-               make_initial_frontier,
-               add_states,
-               choose_state_to_expand,
-               state_iterator,
-               params=default_params):
+    def iter_search(self,
+                    make_initial_frontier,
+                    add_states=None,
+                    choose_state_to_expand=None,
+                    state_iterator=None,
+                    params=default_params):
+        '''
+        The generator form of search: yield a triple (solution, iteration, path) as soon as each solution is found,
+        where path is the list of states from self to the solution. The caller can stop consuming at any time. 
+        When the search ends, its SearchStats record is returned as the generator's return value. Setting 
+        max_solutions to None enumerates all solutions. 
+        make_initial_frontier(self) normally returns a Frontier (see frontier.py), in which case add_states, 
+        choose_state_to_expand, and state_iterator default to its push_items, pop, and iteration. 
+        '''
+        add_states = add_states or (lambda new_states,old_states: old_states.push_items(new_states))
+        choose_state_to_expand = choose_state_to_expand or (lambda states: states.pop())
+        state_iterator = state_iterator or (lambda states: states.__iter__())
         # Note that frontier_table is a hash-table representation of the list open_states. 
         params = {**State.default_params, **params}
         graph_state_space = not(params['tree_space'])
@@ -208,130 +440,818 @@ class State(ABC):
                 table[item] = item
         add_to_table(self,frontier_table)
         max_iterations, max_states_to_show = params['max_iterations'], params['max_states_to_show']
-        max_solutions, max_depth = params['max_solutions'], params['max_depth']
+        max_solutions, max_depth, cost_bound = params['max_solutions'], params['max_depth'], params['cost_bound']
+        observer, profile, verbose = params['observer'], params['profile'], max_states_to_show > 0
+        start_time = time.perf_counter()
+        deadline = State.deadline_from(params)
+        stats = SearchStats()
+        # In tree mode, an optional bounded transposition table catches states reached again along other paths: 
+        transposition_table = TranspositionTable(params['transposition_size']) if params['transposition_size'] and not(graph_state_space) else None
+        if transposition_table is not None:
+            transposition_table.record(self.state_key(),self.get_cost())
+        def mark_dead(s):
+            # The subtree below s holds no solutions. So does the subtree of every ancestor with no other open children: 
+            while True:
+                transposition_table.mark_dead(s.state_key(),s.get_cost())
+                if s is self or s.parent is None or not(hasattr(s.parent,'open_children')):
+                    # (The parent may have been expanded before the search was resumed from a checkpoint.)
+                    return
+                s = s.parent
+                s.open_children -= 1
+                if s.open_children > 0:
+                    return
         open_states = make_initial_frontier(self)
-        iteration, solutions = 0, []        
+        if profile and hasattr(open_states,'get_key'):
+            open_states.get_key = stats.timed('time_distance',open_states.get_key)
+            if open_states.get_keys is not None:
+                open_states.get_keys = stats.timed('time_distance',open_states.get_keys)
+        def finish(reason):
+            stats.stop_reason = reason
+            stats.seconds = time.perf_counter() - start_time
+            if checkpoint_file is not None:
+                # Only a search that was cut short can be resumed: 
+                if reason in ['max_iterations','time_budget']:
+                    save_checkpoint(checkpoint_file,fingerprint,open_states,frontier_table,visited_table,solutions_so_far,stats)
+                else:
+                    remove_checkpoint(checkpoint_file)
+            if hasattr(open_states,'close'):
+                open_states.close()
+            if reason in ['max_iterations','time_budget'] and hasattr(open_states,'peek_key') and open_states:
+                stats.best_open_state = open_states.peek()
+            if observer is not None:
+                observer.on_finish(stats)
+            return stats
+        iteration = 0
+        checkpoint_file, solutions_so_far = params['checkpoint_file'], []
+        fingerprint = search_fingerprint(self,open_states,params) if checkpoint_file is not None else None
+        if checkpoint_file is not None and os.path.exists(checkpoint_file):
+            solutions_so_far = load_checkpoint(checkpoint_file,fingerprint,self,open_states,frontier_table,visited_table,stats)
+            iteration = stats.iterations
+            start_time -= stats.seconds
+            if verbose:
+                print("Resuming the search from " + str(checkpoint_file) + " after " + str(iteration) + " iterations.")
+            for (solution,solution_iteration) in solutions_so_far:
+                yield (solution,solution_iteration,solution.path())
+            if max_solutions is not None and stats.solutions >= max_solutions:
+                return finish('max_solutions')
+        last_checkpoint_iteration, last_checkpoint_time = iteration, time.time()
         while open_states:
-            iteration += 1
-            if iteration > max_iterations:
-                print("Reached the maximum number of iterations (" + str(max_iterations) + "), stopping the search. Pending open states: " + str(len(open_states)) + ".")
-                return (solutions,iteration)
-            self.show_states(open_states,iteration,state_iterator,max_states_to_show)
+            if checkpoint_file is not None and (iteration - last_checkpoint_iteration >= params['checkpoint_every'] or
+                                                (params['checkpoint_seconds'] is not None and time.time() - last_checkpoint_time >= params['checkpoint_seconds'])):
+                stats.seconds = time.perf_counter() - start_time
+                save_checkpoint(checkpoint_file,fingerprint,open_states,frontier_table,visited_table,solutions_so_far,stats)
+                last_checkpoint_iteration, last_checkpoint_time = iteration, time.time()
+            if iteration >= max_iterations:
+                if verbose:
+                    print("Reached the maximum number of iterations (" + str(max_iterations) + "), stopping the search. Pending open states: " + str(len(open_states)) + ".")
+                return finish('max_iterations')
+            if deadline is not None and time.time() > deadline:
+                if verbose:
+                    print("Ran out of time after " + str(iteration) + " iterations, stopping the search. Pending open states: " + str(len(open_states)) + ".")
+                return finish('time_budget')
+            self.show_states(open_states,iteration+1,state_iterator,max_states_to_show)
             state = choose_state_to_expand(open_states)
             if graph_state_space:
-                # It's possible that the table already contains this state but with a smaller cost; if so, swap it:
-                State.switch_if_cheaper_path_exists(state,frontier_table)
+                # If a cheaper instance of this state was generated after this one was put on the frontier, the table
+                # points to that instance and this one is stale, so we skip it. (The costs are compared rather than the
+                # instances, since a frontier that spills to disk hands back equal copies of the states it was given.) 
+                table_state = frontier_table.get(state)
+                if table_state is None or (table_state is not state and table_state.get_cost() < state.get_cost()):
+                    stats.stale += 1
+                    continue
                 # Remove the state from the frontier table: 
                 frontier_table.pop(state)
+            iteration += 1
+            stats.iterations = iteration
             add_to_table(state,visited_table)
-            if state.is_valid() and not(max_depth is not None and state.depth > max_depth): 
-                if state.is_solution():
+            if not(state.is_valid() if not(profile) else stats.timed('time_is_valid',state.is_valid)()):
+                stats.pruned_invalid += 1
+                if transposition_table is not None:
+                    mark_dead(state)
+            elif max_depth is not None and state.depth > max_depth:
+                stats.pruned_depth += 1
+            elif state.is_solution() if not(profile) else stats.timed('time_is_solution',state.is_solution)():
+                if verbose:
                     print("\nSuccess! Solution found after " + str(iteration)  + " iterations: " + str(state))
-                    solutions.append(state)
-                    if len(solutions) >= max_solutions:
-                        return (solutions,iteration)
+                stats.solutions += 1
+                if checkpoint_file is not None:
+                    solutions_so_far.append((state,iteration))
+                if observer is not None:
+                    observer.on_solution(stats,state)
+                yield (state,iteration,state.path())
+                if max_solutions is not None and stats.solutions >= max_solutions:
+                    return finish('max_solutions')
+            else:
+                stats.expanded += 1
+                children_states, live_duplicates = [], 0
+                for child_state in (state.expand() if not(profile) else stats.timed('time_expand',state.expand)()):
+                    stats.generated += 1
+                    child_state.set_parent(state)
+                    if cost_bound is not None and child_state.get_cost() + child_state.distance() >= cost_bound:
+                        stats.pruned_bound += 1
+                        live_duplicates = 1
+                        continue
+                    if graph_state_space and not(State.is_new_or_cheaper(child_state,visited_table,frontier_table)):
+                        stats.duplicates += 1
+                        continue
+                    if transposition_table is not None:
+                        key, cost = child_state.state_key(), child_state.get_cost()
+                        entry = transposition_table.lookup(key)
+                        if entry is not None and entry[1] and (max_depth is None or entry[0] <= cost):
+                            stats.pruned_dead += 1
+                            continue
+                        if entry is not None and entry[0] <= cost:
+                            stats.duplicates += 1
+                            live_duplicates = 1
+                            continue
+                        transposition_table.record(key,cost)
+                    add_to_table(child_state,frontier_table)
+                    children_states.append(child_state)
+                if transposition_table is not None:
+                    # A duplicate that was skipped might still lead to a solution (through its other instance), so it 
+                    # keeps this state from ever being marked dead. Children dropped by a beam never finish, likewise.
+                    # So do children cut by the cost bound: a cheaper path to this state may bring them under it. 
+                    state.open_children = len(children_states) + live_duplicates
+                    if state.open_children == 0:
+                        mark_dead(state)
+                add_states(children_states,open_states)
+                if len(open_states) > stats.peak_frontier:
+                    stats.peak_frontier = len(open_states)
+                if observer is not None:
+                    observer.on_expand(stats,state,children_states,open_states)
+        if verbose:
+            print("No more states to explore after " + str(iteration) + " iterations.")
+        return finish('exhausted')
+
+    @staticmethod
+    def collect(search_run,params=default_params):
+        '''
+        Drain a generator produced by iter_search (or any of the iter_* algorithms) and return the pair 
+        (solutions, iterations), or the triple (solutions, iterations, stats) if the 'return_stats' param is set. 
+        '''
+        solutions = []
+        try:
+            while True:
+                solutions.append(next(search_run)[0])
+        except StopIteration as stop:
+            stats = stop.value
+            if params.get('return_stats'):
+                return (solutions,stats.iterations,stats)
+            return (solutions,stats.iterations)
+
+    def search(self,
+               make_initial_frontier,
+               add_states=None,
+               choose_state_to_expand=None,
+               state_iterator=None,
+               params=default_params):
+        return State.collect(self.iter_search(make_initial_frontier,add_states,choose_state_to_expand,state_iterator,params),params)
+
+    def iter_dfs(self,params=default_params):
+        # Assuming that new_states were generated in their natural left-to-right order, StackFrontier pushes them 
+        # on the stack in reverse order, from right to left: 
+        return self.iter_search(make_initial_frontier=lambda state: StackFrontier(state),params=params)
+
+    def dfs(self,params=default_params):
+        return State.collect(self.iter_dfs(params),params)
+
+    def iter_cost_bounded_search(self,get_f,params=default_params,bound_limit=None):
+        '''
+        Iterative deepening on an arbitrary cost bound f (IDA* when f = g + h): run a depth-first search that prunes
+        every state whose f exceeds the current bound, and then raise the bound to the smallest f that exceeded it,
+        rather than by a fixed step. Memory is proportional to the depth of the search (times the branching factor,
+        since siblings wait on the stack). Each solution is yielded once, in the first pass that can reach it (i.e.,
+        when the largest f along its path first fits under the bound). The search stops when the bound exceeds 
+        bound_limit (if given). In graph mode (tree_space=False) states that already occur on the current path are 
+        skipped. A positive 'transposition_size' param enables a small per-pass transposition table (see 
+        transposition.py) of the cheapest g at which each state was reached, so that states reached again at no 
+        smaller cost are not re-searched. 
+        Yields and returns are as for iter_search. 
+        '''
+        params = {**State.default_params, **params}
+        graph_state_space = not(params['tree_space'])
+        max_iterations, max_solutions, max_depth = params['max_iterations'], params['max_solutions'], params['max_depth']
+        verbose, observer, transposition_size = params['max_states_to_show'] > 0, params['observer'], params['transposition_size']
+        start_time = time.perf_counter()
+        deadline = State.deadline_from(params)
+        stats = SearchStats()
+        def finish(reason):
+            stats.stop_reason = reason
+            stats.seconds = time.perf_counter() - start_time
+            if observer is not None:
+                observer.on_finish(stats)
+            return stats
+        def on_path(s):
+            p = s.parent
+            while p is not None:
+                if p == s:
+                    return True
+                p = p.parent
+            return False
+        root_f = get_f(self)
+        bound, previous_bound = root_f, float('-inf')
+        while bound_limit is None or bound <= bound_limit:
+            if verbose:
+                print("-------------------------------------------- Depth-first pass with bound " + str(bound))
+            next_bound = float('inf')
+            cache = TranspositionTable(transposition_size) if transposition_size else None
+            # Every stack entry is a triple (state, f of the state, largest f along the path to the state): 
+            stack = [(self,root_f,root_f)]
+            while stack:
+                (state,f,path_f) = stack.pop()
+                if f > bound:
+                    next_bound = min(next_bound,f)
+                    continue
+                if stats.iterations >= max_iterations:
+                    if verbose:
+                        print("Reached the maximum number of iterations (" + str(max_iterations) + "), stopping the search.")
+                    return finish('max_iterations')
+                if deadline is not None and time.time() > deadline:
+                    if verbose:
+                        print("Ran out of time after " + str(stats.iterations) + " iterations, stopping the search.")
+                    return finish('time_budget')
+                stats.iterations += 1
+                if not(state.is_valid()):
+                    stats.pruned_invalid += 1
+                elif max_depth is not None and state.depth > max_depth:
+                    stats.pruned_depth += 1
+                elif state.is_solution():
+                    # Solutions whose paths fit under the previous bound were already reported in an earlier pass: 
+                    if path_f > previous_bound:
+                        if verbose:
+                            print("\nSuccess! Solution found after " + str(stats.iterations)  + " iterations: " + str(state))
+                        stats.solutions += 1
+                        if observer is not None:
+                            observer.on_solution(stats,state)
+                        yield (state,stats.iterations,state.path())
+                        if max_solutions is not None and stats.solutions >= max_solutions:
+                            return finish('max_solutions')
                 else:
-                    children_states = [s for s in state.expand() if State.worth_keeping(s,visited_table,frontier_table,graph_state_space)]
-                    for child_state in children_states:
+                    stats.expanded += 1
+                    children_states = []
+                    for child_state in state.expand():
+                        stats.generated += 1
                         child_state.set_parent(state)
-                        add_to_table(child_state,frontier_table)
-                    add_states(children_states,open_states)
-        print("No more states to explore after " + str(iteration) + " iterations.")
-        return (solutions,iteration)
+                        if graph_state_space and on_path(child_state):
+                            stats.duplicates += 1
+                            continue
+                        if cache is not None:
+                            key, g = child_state.state_key(), child_state.get_cost()
+                            entry = cache.lookup(key)
+                            if entry is not None and entry[0] <= g:
+                                stats.duplicates += 1
+                                continue
+                            cache.record(key,g)
+                        children_states.append(child_state)
+                    # Push the children in reverse, so that they are searched in their natural left-to-right order: 
+                    for child_state in reversed(children_states):
+                        child_f = get_f(child_state)
+                        stack.append((child_state,child_f,max(path_f,child_f)))
+                    if len(stack) > stats.peak_frontier:
+                        stats.peak_frontier = len(stack)
+                    if observer is not None:
+                        observer.on_expand(stats,state,children_states,stack)
+            if next_bound == float('inf'):
+                break
+            previous_bound, bound = bound, next_bound
+        if verbose:
+            print("No more states to explore after " + str(stats.iterations) + " iterations.")
+        return finish('exhausted')
 
-    def dfs(self,params=default_params):
-        return self.search(make_initial_frontier=lambda state: [state],
-                           # Assuming that new_states were generated in their natural left-to-right order, they should be pushed
-                           # on the stack in reverse order, from right to left, using push_new:
-                           add_states=lambda new_states,old_states: State.push_new(new_states,old_states),
-                           choose_state_to_expand=lambda states: states.pop(),
-                           state_iterator=lambda states: reversed(states),
-                           params=params)
+    def iter_ida_star(self,params=default_params):
+        return self.iter_cost_bounded_search(lambda s: s.get_cost() + s.distance(),params)
+
+    def ida_star(self,params=default_params):
+        '''
+        IDA*: iterative deepening on f = get_cost() + distance(). With an admissible distance estimate, the first
+        solution found is optimal, as with A*, but without A*'s frontier memory. 
+        '''
+        return State.collect(self.iter_ida_star(params),params)
+
+    def iter_iterative_deepening(self,depth_limit,params=default_params):
+        return self.iter_cost_bounded_search(lambda s: s.depth,params,bound_limit=depth_limit)
 
     def iterative_deepening(self,depth_limit,params=default_params):
-        params = {**State.default_params, **params}        
-        depth = 0
-        all_results, all_iterations = [], 0
-        print("Here's depth: " + str(depth))
-        print("And here's depth_limit: " + str(depth_limit))
-        while depth <= depth_limit:
-            print("-------------------------------------------- DFS up to depth " + str(depth))
-            (results,iterations) = self.dfs(params={**params, 'max_depth':depth})
-            all_results.extend(results)
-            all_iterations += iterations
-            if len(all_results) >= params['max_solutions']:
-                return (all_results,all_iterations)
-            depth += 1
-        return (all_results,all_iterations)
+        '''
+        Depth-first iterative deepening: cost-bounded search on the depth of a state, up to depth_limit. 
+        '''
+        return State.collect(self.iter_iterative_deepening(depth_limit,params),params)
+
+    def path_from_moves(self, applied_moves):
+        '''
+        Given the stack of moves that led from some initial state to self (which is being mutated in place), return 
+        the path of states from that initial state to self, as fresh, parent-linked snapshots. 
+        '''
+        states = [self.snapshot()]
+        for move in reversed(applied_moves):
+            s = states[-1].snapshot()
+            s.undo(move)
+            s.invalidate_key()
+            states.append(s)
+        states.reverse()
+        states[0].parent, states[0].depth = None, self.depth - len(applied_moves)
+        for i in range(1,len(states)):
+            states[i].set_parent(states[i-1])
+        return states
+
+    def iter_dfs_in_place(self,params=default_params):
+        '''
+        Depth-first search over the reversible move protocol (moves/apply/undo): a single state, self, is mutated 
+        in place, so the only allocations are the move lists. Visits states in the same order as dfs, honors the 
+        same params (except tree_space and transposition_size), and yields and returns like iter_search, with each 
+        solution (and its path) rebuilt as snapshots from the move stack. self is restored when the search ends, 
+        or when the caller stops consuming. 
+        '''
+        params = {**State.default_params, **params}
+        max_iterations, max_solutions, max_depth = params['max_iterations'], params['max_solutions'], params['max_depth']
+        verbose, observer = params['max_states_to_show'] > 0, params['observer']
+        start_time = time.perf_counter()
+        deadline = State.deadline_from(params)
+        stats = SearchStats()
+        def finish(reason):
+            stats.stop_reason = reason
+            stats.seconds = time.perf_counter() - start_time
+            if observer is not None:
+                observer.on_finish(stats)
+            return stats
+        # frames holds one iterator over the remaining moves for every state on the current path that was expanded;
+        # applied holds the moves that led from the initial state to the current one: 
+        frames, applied = [], []
+        def make_move(move):
+            self.apply(move)
+            self.depth += 1
+            self.invalidate_key()
+            applied.append(move)
+        def undo_move():
+            self.undo(applied.pop())
+            self.depth -= 1
+            self.invalidate_key()
+        try:
+            while True:
+                if stats.iterations >= max_iterations:
+                    if verbose:
+                        print("Reached the maximum number of iterations (" + str(max_iterations) + "), stopping the search.")
+                    return finish('max_iterations')
+                if deadline is not None and time.time() > deadline:
+                    if verbose:
+                        print("Ran out of time after " + str(stats.iterations) + " iterations, stopping the search.")
+                    return finish('time_budget')
+                stats.iterations += 1
+                descend = False
+                if not(self.is_valid()):
+                    stats.pruned_invalid += 1
+                elif max_depth is not None and self.depth > max_depth:
+                    stats.pruned_depth += 1
+                elif self.is_solution():
+                    path = self.path_from_moves(applied)
+                    if verbose:
+                        print("\nSuccess! Solution found after " + str(stats.iterations)  + " iterations: " + str(self))
+                    stats.solutions += 1
+                    if observer is not None:
+                        observer.on_solution(stats,path[-1])
+                    yield (path[-1],stats.iterations,path)
+                    if max_solutions is not None and stats.solutions >= max_solutions:
+                        return finish('max_solutions')
+                else:
+                    stats.expanded += 1
+                    moves = self.moves()
+                    stats.generated += len(moves)
+                    frames.append(iter(moves))
+                    descend = True
+                    if len(frames) > stats.peak_frontier:
+                        stats.peak_frontier = len(frames)
+                if not(descend) and applied:
+                    undo_move()
+                # Move on to the next state: the next untried move of the deepest unfinished state.
+                while frames:
+                    move = next(frames[-1],None)
+                    if move is not None:
+                        make_move(move)
+                        break
+                    # The state that owns this frame is finished, so take back the move that led to it: 
+                    frames.pop()
+                    if applied:
+                        undo_move()
+                else:
+                    if verbose:
+                        print("No more states to explore after " + str(stats.iterations) + " iterations.")
+                    return finish('exhausted')
+        finally:
+            while applied:
+                undo_move()
+
+    def dfs_in_place(self,params=default_params):
+        return State.collect(self.iter_dfs_in_place(params),params)
+
+    def iter_bfs(self,params=default_params): 
+        '''
+        Breadth-first search. If the 'spill_threshold' param is set, at most that many open states are kept in memory,
+        and the rest are spilled to files in the 'spill_directory' param (a temporary directory by default); see 
+        SpillingFifoFrontier. This bounds memory in tree mode only, since graph search keeps every state it has seen in 
+        its frontier and visited tables anyway. 
+        '''
+        spill_threshold = params.get('spill_threshold')
+        if spill_threshold is not None:
+            make_frontier = lambda state: SpillingFifoFrontier(state,max_in_memory=spill_threshold,directory=params.get('spill_directory'))
+        else:
+            make_frontier = lambda state: FifoFrontier(state)
+        return self.iter_search(make_initial_frontier=make_frontier,params=params)
 
     def bfs(self,params=default_params): 
-        return self.search(make_initial_frontier=lambda state: Queue(state),
-                           add_states=lambda new_states,old_states: old_states.enqueue_items(new_states),
-                           choose_state_to_expand=lambda states: states.dequeue(),
-                           state_iterator=lambda states: states.__iter__(),
-                           params=params)                           
+        return State.collect(self.iter_bfs(params),params)
     
     @staticmethod        
     def sorter(new_states,old_states,beam_width=None):
         '''
-        Instead of adding the new states to the old states and sorting the result, we can take advantage of the fact that
-        the old states are already sorted, so we only need to sort the new states (typically a relatively short list) and then
-        merge the resulting list with the old states, a linear-time operation.
-        We sort in reverse order so that the smallest-distance element is at the right end of the list.
-        This ensures that we can then get the best state to expand in O(1) time. 
-        #old_states.sort(key=lambda s: -(s.get_cost() + s.distance()))
-        If a beam width is specified, keep only the candidates in the beam, pruning everything else.
-        Since we are sorting in reverse, this means we need to keep the *last* beam_width list elements.         
+        Add the new states to a PriorityFrontier. Every state is scored (get_cost() + distance()) exactly once, 
+        when it is pushed (all new states in one batch if their class defines distance_batch), and each push is 
+        O(log n) in the size of the frontier. 
+        If a beam width is specified, keep only the best beam_width candidates, pruning everything else. 
         '''
-        in_place_merge_descending(old_states,new_states,get_key=lambda s: s.get_cost() + s.distance())
+        old_states.push_items(new_states)
         if beam_width:
-            # Remove all but the last beam_width elements: 
-            del old_states[:-beam_width]
+            old_states.keep_best(beam_width)
         
+    def iter_best_first_search(self,params=default_params): 
+        if params.get('max_stored_states') is not None:
+            return self.iter_sma_star(params)
+        # The frontier pops the state with the smallest f-score: 
+        return self.iter_search(make_initial_frontier=lambda state: PriorityFrontier(state,get_keys=type(state).f_scores_function()),
+                                params=params)
+
     def best_first_search(self,params=default_params): 
-        return self.search(make_initial_frontier=lambda state: [state],
-                           add_states=State.sorter,
-                           choose_state_to_expand=lambda states: states.pop(), # get the smallest-distance state 
-                           state_iterator=lambda states: reversed(states),
-                           params=params)                                                      
+        return State.collect(self.iter_best_first_search(params),params)
     
+    def iter_sma_star(self,params=default_params):
+        '''
+        Memory-bounded best-first search (A* when distance is admissible), in the style of SMA*: the search tree that
+        is kept in memory never holds more than the 'max_stored_states' param states (the ancestors of every open
+        state included). As in SMA*, every step adds one child to the tree: the best open state (lowest f, deepest 
+        first) is either a leaf, which is expanded, or a state with successors that are not in memory, and its best 
+        such successor is generated. The first expansion of a state computes the f of all of its successors, and the
+        state remembers the f of every successor that is not in memory (which takes a key and a number, not a state).
+        When memory is full, the worst leaf (highest f, shallowest first) other than the new child is dropped, and 
+        its parent remembers its backed-up f, which it gets back when it is generated again. f-values are monotone 
+        along paths (a child's f is at least its parent's), and the f of an expanded state is the smallest f of its 
+        successors, in memory or not, so that f always bounds the cost of any solution below it. 
+
+        Solutions are optimal whenever the distance is admissible and the optimal solution path (plus one child per 
+        state along it) fits in the budget; states at depth max_stored_states - 1 can't be expanded at all. Instead of
+        the visited tables of graph search, graph mode (tree_space=False) only skips states that already occur on the
+        current path. Yields and returns are as for iter_search; stats.peak_frontier is the peak number of stored 
+        states, and stats.forgotten the number of dropped leaves. 
+        '''
+        params = {**State.default_params, **params}
+        max_stored = params['max_stored_states']
+        graph_state_space = not(params['tree_space'])
+        max_iterations, max_solutions, max_depth = params['max_iterations'], params['max_solutions'], params['max_depth']
+        verbose, observer = params['max_states_to_show'] > 0, params['observer']
+        start_time = time.perf_counter()
+        deadline = State.deadline_from(params)
+        stats = SearchStats()
+        infinity = float('inf')
+        counter = itertools.count()
+        # best_heap holds (open key, -depth, -counter, version, state) for every open state, where the open key of a 
+        # leaf that has not been expanded is its f, and that of an expanded state is the best f among its successors
+        # that are not in memory. worst_heap holds (-f, depth, counter, version, state) for every leaf (a state with
+        # no children in memory) that may be dropped. Entries are deleted lazily: an entry is stale if its state has
+        # been dropped or its version has moved on. sma_remembered maps the keys of the successors of an expanded 
+        # state that are not in memory to their f-values. 
+        best_heap, worst_heap = [], []
+        stored = 0
+        def store(s,f):
+            nonlocal stored
+            s.sma_f, s.sma_children, s.sma_remembered, s.sma_version, s.sma_stored = f, [], None, 0, True
+            stored += 1
+        def reopen(s):
+            s.sma_version += 1
+            if s.sma_remembered is None:
+                key = s.sma_f
+            else:
+                key = min(s.sma_remembered.values(),default=infinity)
+            if key < infinity:
+                heapq.heappush(best_heap,(key,-s.depth,-next(counter),s.sma_version,s))
+            if not(s.sma_children) and s is not self:
+                heapq.heappush(worst_heap,(-s.sma_f,s.depth,next(counter),s.sma_version,s))
+        def live(entry):
+            return entry[4].sma_stored and entry[3] == entry[4].sma_version
+        def backup(s):
+            # Recompute the f-values of s and its ancestors from their successors, for as long as they change: 
+            while s is not None and s.sma_remembered is not None:
+                new_f = min(min((c.sma_f for c in s.sma_children),default=infinity),min(s.sma_remembered.values(),default=infinity))
+                if new_f == s.sma_f:
+                    return
+                s.sma_f = new_f
+                s = s.parent
+        def forget(s,remember=True):
+            # Drop the leaf s from memory, remembering its f in its parent (unless it is dead): 
+            nonlocal stored
+            p = s.parent
+            p.sma_children.remove(s)
+            s.sma_stored = False
+            stored -= 1
+            if remember:
+                key = s.state_key()
+                p.sma_remembered[key] = min(p.sma_remembered.get(key,infinity),s.sma_f)
+            return p
+        def remove_dead(s):
+            # s (and so, possibly, some of its ancestors) leads to no (further) solutions: 
+            while True:
+                s.sma_f = infinity
+                if s is self:
+                    s.sma_stored = False
+                    return
+                p = forget(s,False)
+                if p.sma_children or p.sma_remembered:
+                    backup(p)
+                    reopen(p)
+                    return
+                s = p
+        def on_path(s):
+            p = s.parent
+            while p is not None:
+                if p == s:
+                    return True
+                p = p.parent
+            return False
+        def successors(s):
+            stats.expanded += 1
+            children_states = []
+            for child_state in s.expand():
+                stats.generated += 1
+                child_state.set_parent(s)
+                if graph_state_space and on_path(child_state):
+                    stats.duplicates += 1
+                    continue
+                children_states.append(child_state)
+            return children_states
+        def finish(reason):
+            stats.stop_reason = reason
+            stats.seconds = time.perf_counter() - start_time
+            if reason in ['max_iterations','time_budget']:
+                open_entries = [entry for entry in best_heap if live(entry) and entry[4].sma_remembered is None]
+                if open_entries:
+                    stats.best_open_state = min(open_entries)[4]
+            if observer is not None:
+                observer.on_finish(stats)
+            return stats
+        store(self,self.get_cost() + self.distance())
+        reopen(self)
+        stats.peak_frontier = stored
+        while best_heap:
+            entry = heapq.heappop(best_heap)
+            if not(live(entry)):
+                continue
+            state = entry[4]
+            if stats.iterations >= max_iterations:
+                heapq.heappush(best_heap,entry)
+                if verbose:
+                    print("Reached the maximum number of iterations (" + str(max_iterations) + "), stopping the search. Stored states: " + str(stored) + ".")
+                return finish('max_iterations')
+            if deadline is not None and time.time() > deadline:
+                heapq.heappush(best_heap,entry)
+                if verbose:
+                    print("Ran out of time after " + str(stats.iterations) + " iterations, stopping the search. Stored states: " + str(stored) + ".")
+                return finish('time_budget')
+            stats.iterations += 1
+            if state.sma_remembered is None:
+                if not(state.is_valid()):
+                    stats.pruned_invalid += 1
+                    remove_dead(state)
+                    continue
+                if (max_depth is not None and state.depth > max_depth) or state.depth + 1 >= max_stored:
+                    stats.pruned_depth += 1
+                    remove_dead(state)
+                    continue
+                if state.is_solution():
+                    if verbose:
+                        print("\nSuccess! Solution found after " + str(stats.iterations)  + " iterations: " + str(state))
+                    stats.solutions += 1
+                    if observer is not None:
+                        observer.on_solution(stats,state)
+                    yield (state,stats.iterations,state.path())
+                    if max_solutions is not None and stats.solutions >= max_solutions:
+                        return finish('max_solutions')
+                    remove_dead(state)
+                    continue
+                # The first expansion: remember the f of every successor. 
+                children_states = successors(state)
+                state.sma_remembered = {}
+                for child_state in children_states:
+                    key = child_state.state_key()
+                    f = max(state.sma_f,child_state.get_cost() + child_state.distance())
+                    state.sma_remembered[key] = min(state.sma_remembered.get(key,infinity),f)
+                if not(state.sma_remembered):
+                    remove_dead(state)
+                    continue
+            else:
+                # Regenerate a successor that was dropped: 
+                children_states = successors(state)
+            # Generate the best successor that is not in memory, with the f that is remembered for it: 
+            (f,key) = min((f,key) for (key,f) in state.sma_remembered.items())
+            child_state = min([c for c in children_states if c.state_key() == key],key=lambda c: c.get_cost())
+            del state.sma_remembered[key]
+            store(child_state,f)
+            state.sma_children.append(child_state)
+            backup(state)
+            reopen(state)
+            reopen(child_state)
+            # Make room by dropping the worst leaves, but never the child just generated: 
+            held_back = []
+            while stored > max_stored and worst_heap:
+                entry = heapq.heappop(worst_heap)
+                if not(live(entry)):
+                    continue
+                if entry[4] is child_state:
+                    held_back.append(entry)
+                    continue
+                stats.forgotten += 1
+                parent = forget(entry[4])
+                reopen(parent)
+            for entry in held_back:
+                heapq.heappush(worst_heap,entry)
+            stats.peak_frontier = max(stats.peak_frontier,stored)
+            if observer is not None:
+                observer.on_expand(stats,state,[child_state],best_heap)
+        if verbose:
+            print("No more states to explore after " + str(stats.iterations) + " iterations.")
+        return finish('exhausted')
+
+    def sma_star(self,params=default_params):
+        return State.collect(self.iter_sma_star(params),params)
+
+    def iter_beam_search(self,params=default_params):
+        beam_width = {**State.default_params, **params}['beam_width']
+        return self.iter_search(make_initial_frontier=lambda state: BeamFrontier(state,beam_width,get_keys=type(state).f_scores_function()),
+                                params=params)
+
     def beam_search(self,params=default_params):
-        return self.search(make_initial_frontier=lambda state: [state],
-                           add_states=lambda new_states, old_states: State.sorter(new_states, old_states, beam_width=params['beam_width']),
-                           choose_state_to_expand=lambda states: states.pop(),
-                           state_iterator=lambda states: reversed(states),
-                           params=params)                                                                                 
+        return State.collect(self.iter_beam_search(params),params)
+
+    def iter_anytime_weighted_astar(self,params=default_params):
+        '''
+        Anytime weighted A*: run a sequence of best-first searches on f = g + w * h, starting from w = the 'weight'
+        param and shrinking the excess weight w - 1 by the 'weight_decay' factor after every round, until w reaches 1
+        or the budgets (max_iterations over all rounds, time_budget, deadline) run out. A larger weight finds some
+        solution quickly; every later round only looks for strictly cheaper solutions, pruning states whose 
+        g + h is no smaller than the cost of the best solution so far (which assumes that distance() is admissible).
+        Each improved solution is yielded as (solution, iteration, path) as soon as it is found; the last one is the
+        best. With an admissible distance(), the final round (w = 1) is plain A*, so if it completes, the last 
+        solution is optimal. Returns a SearchStats record that covers all rounds. Anytime search cannot be 
+        checkpointed (every round is a different search, with its own cost bound), so the 'checkpoint_file' param is
+        ignored. 
+        '''
+        params = {**State.default_params, **params}
+        deadline = State.deadline_from(params)
+        weight, weight_decay = max(1.0,params['weight']), params['weight_decay']
+        stats, best_cost = SearchStats(), params['cost_bound']
+        while True:
+            round_params = {**params,'max_solutions':1,'cost_bound':best_cost,'deadline':deadline,'time_budget':None,'checkpoint_file':None,
+                            'max_iterations':params['max_iterations'] - stats.iterations}
+            w = weight
+            search_run = self.iter_search(make_initial_frontier=lambda state: PriorityFrontier(state,get_key=lambda s: s.get_cost() + w * s.distance()),
+                                          params=round_params)
+            try:
+                while True:
+                    (solution,iteration,path) = next(search_run)
+                    best_cost = solution.get_cost()
+                    yield (solution,stats.iterations + iteration,path)
+            except StopIteration as stop:
+                round_stats = stop.value
+            stats.absorb(round_stats)
+            stats.stop_reason, stats.best_open_state = round_stats.stop_reason, round_stats.best_open_state
+            if round_stats.stop_reason in ['max_iterations','time_budget'] or weight == 1.0:
+                return stats
+            weight = max(1.0,1.0 + (weight - 1.0) * weight_decay)
+            if weight < 1.0 + 1e-9:
+                weight = 1.0
+
+    def anytime_weighted_astar(self,params=default_params):
+        return State.collect(self.iter_anytime_weighted_astar(params),params)
+
+    def iter_solutions(self,algorithm='dfs',params=default_params):
+        '''
+        Return a generator of (solution, iteration, path) triples for the named algorithm: 'dfs', 'dfs_in_place', 'bfs', 
+        'beam_search', 'ida_star', 'anytime_weighted_astar', 'sma_star', or 'best_first_search' (which is also the fallback). 
+        '''
+        if algorithm == 'dfs':
+            return self.iter_dfs(params)
+        elif algorithm == 'dfs_in_place':
+            return self.iter_dfs_in_place(params)
+        elif algorithm == 'bfs':
+            return self.iter_bfs(params)
+        elif algorithm == 'ida_star':
+            return self.iter_ida_star(params)
+        elif algorithm == 'anytime_weighted_astar':
+            return self.iter_anytime_weighted_astar(params)
+        elif algorithm == 'beam_search':
+            return self.iter_beam_search(params)
+        elif algorithm == 'sma_star':
+            return self.iter_sma_star(params)
+        else:
+            return self.iter_best_first_search(params)
+
+    @staticmethod
+    def run_algorithm(initial_state,algorithm,params):
+        '''
+        Run the named search algorithm (any of the names accepted by iter_solutions)
+        on initial_state, silently, and return a triple (solutions, iterations, elapsed seconds). 
+        '''
+        params = {**State.default_params, **params, 'max_states_to_show':0}
+        start_time = time.perf_counter()
+        result = State.collect(initial_state.iter_solutions(algorithm,params),params)
+        return (result[0],result[1],time.perf_counter() - start_time)
+
+    @staticmethod
+    def iter_solve_batch(initial_states,params=default_params,algorithm='dfs',workers=1,in_order=False):
+        '''
+        Solve the given initial states and yield a pair (i, (solutions, iterations, seconds)) for each of them as soon as
+        it is solved, where i is the index of the instance in initial_states. With workers > 1 the instances are spread
+        over a pool of worker processes (so the states must be picklable), and results come out in completion order,
+        unless in_order is True. The per-instance budgets are the usual max_iterations and time_budget params. 
+        '''
+        if workers <= 1:
+            for i, initial_state in enumerate(initial_states):
+                yield (i,State.run_algorithm(initial_state,algorithm,params))
+            return
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(State.run_algorithm,initial_state,algorithm,params) for initial_state in initial_states]
+            index_of = {future: i for i, future in enumerate(futures)}
+            for future in (futures if in_order else as_completed(futures)):
+                yield (index_of[future],future.result())
+
+    @staticmethod
+    def report_batch_stats(results,iters,times,wall_time):
+        '''
+        Print aggregate statistics for a batch run and return them as a dictionary. 
+        '''
+        count = len(results)
+        successes = len([result for result in results if result])
+        stats = {'instances': count,
+                 'successes': successes,
+                 'success_rate': successes / count if count else 0.0,
+                 'wall_time': wall_time,
+                 'throughput': count / wall_time if wall_time > 0 else float('inf')}
+        for name, values in [('iterations',iters),('seconds',times)]:
+            for p in [50,95,99]:
+                stats[name + '_p' + str(p)] = float(np.percentile(values,p)) if values else 0.0
+        print("\nSolved " + str(successes) + " problems out of " + str(count) + ".")
+        print("Average number of iterations: " + str(np.mean(iters)) + ".")
+        print("Iterations p50/p95/p99: " + str(stats['iterations_p50']) + " / " + str(stats['iterations_p95']) + " / " + str(stats['iterations_p99']) + ".")
+        print("Solve time p50/p95/p99 (seconds): " + "%.4f / %.4f / %.4f" % (stats['seconds_p50'],stats['seconds_p95'],stats['seconds_p99']) + ".")
+        print("Throughput: " + "%.2f" % stats['throughput'] + " problems per second (" + "%.2f" % wall_time + " seconds in total).\n")
+        return stats
 
-    # Solve a bunch of problem instances parsed from file_name. Report stats at the end. 
+    # Solve a bunch of problem instances parsed from file_name. Report stats at the end. With verify=True, the
+    # solutions are also checked, all at once, with verify_solutions. With a cache (a SolveCache, see solve_cache.py),
+    # the instances found in it are not solved again (and count as 0 iterations), and the solutions of the others are
+    # stored in it. 
     @staticmethod        
-    def solve_batch(file_name,parse_file,params=default_params,algorithm='dfs'):
+    def solve_batch(file_name,parse_file,params=default_params,algorithm='dfs',workers=1,in_order=False,verify=False,cache=None):
         initial_states = parse_file(file_name)
-        results, iters = [], []
-        for initial_state in initial_states:
-            result = None
-            if algorithm == 'dfs':
-                result = initial_state.dfs({**State.default_params, **params, 'max_states_to_show':0})
-            elif algorithm == 'bfs':
-                result = initial_state.bfs({**State.default_params, **params, 'max_states_to_show':0})
-            elif algorithm == 'beam_search':
-                result = initial_state.beam_search({**State.default_params, **params, 'max_states_to_show':0})         
-            else:
-                result = initial_state.best_first_search({**State.default_params, **params, 'max_states_to_show':0})
-            results.append(result[0])                
-            iters.append(result[1])
-        successes = len([result for result in results if result])
-        print("\nSolved " + str(successes) + " problems out of " + str(len(initial_states)) + ".")
-        print("Average number of iterations: " + str(np.mean(iters)) + ".\n")
+        results, iters, times = [None] * len(initial_states), [], []
+        start_time = time.perf_counter()
+        max_solutions = {**State.default_params, **params}['max_solutions']
+        to_solve = list(range(len(initial_states)))
+        if cache is not None:
+            to_solve = []
+            for (i,initial_state) in enumerate(initial_states):
+                lookup_start_time = time.perf_counter()
+                results[i] = cache.lookup(initial_state,max_solutions)
+                if results[i] is None:
+                    to_solve.append(i)
+                else:
+                    iters.append(0)
+                    times.append(time.perf_counter() - lookup_start_time)
+        for (j,(solutions,iterations,seconds)) in State.iter_solve_batch([initial_states[i] for i in to_solve],params,algorithm,workers,in_order):
+            results[to_solve[j]] = solutions
+            iters.append(iterations)
+            times.append(seconds)
+            if cache is not None:
+                cache.store(initial_states[to_solve[j]],solutions,max_solutions)
+        State.report_batch_stats(results,iters,times,time.perf_counter() - start_time)
+        if cache is not None:
+            cache.flush()
+            print("Solve cache: " + str(cache) + ".\n")
+        if verify and initial_states:
+            start_time = time.perf_counter()
+            verified = type(initial_states[0]).verify_solutions(initial_states,results)
+            print("Verified the solutions of " + str(sum(verified)) + " instances out of " + str(len(verified)) + 
+                  " (in " + "%.4f" % (time.perf_counter() - start_time) + " seconds).\n")
         return results
 
-    # Print a path from the initial state to a solution state: 
-    def solution_path(self):
+    # Return the path from the initial state to this state, as a list of states: 
+    def path(self):
         p = self
         parents = [p]
         while p.parent:
             p = p.parent
             parents.append(p)
-        res = list(reversed(parents))        
+        return list(reversed(parents))
+
+    # Print a path from the initial state to a solution state: 
+    def solution_path(self):
+        res = self.path()
         print("Solution path: ")
         cost_so_far = 0        
         if len(res) > 1: 
@@ -0,0 +1,84 @@
+'''
+A persistent cache of solved problem instances, so that runs over overlapping puzzle sets (or the same set, run
+again with other parameters) only solve each instance once. It is an SQLite database, so it survives across runs
+and can be shared by runs that take turns.
+
+Instances are keyed by their canonical forms (see State.canonical_form), so an instance also hits the cache if a
+symmetric one was solved before: for Sudoku, one that is the same up to a relabeling of the values, a transposition,
+and permutations of the bands and stacks (see SudokuBoard.canonical_form). The solutions are stored in canonical
+form as well, and mapped back through the symmetry that relates the two instances (see State.to_canonical and
+State.from_canonical). Classes without a canonical form are never cached.
+
+Entries are kept apart by problem (the topmost class below State, so that all the SudokuBoard variants share their
+entries, whatever their search policies) and by the maximum number of solutions that was asked for, since a search
+for one solution does not tell how many there are. Only instances that were solved are stored.
+'''
+import pickle
+import sqlite3
+from search import State
+
+class SolveCache:
+
+    def __init__(self, file_name, commit_every=100):
+        self.file_name = file_name
+        self.connection = sqlite3.connect(file_name)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS solutions (context TEXT, key BLOB, solutions BLOB, PRIMARY KEY (context, key))")
+        self.connection.commit()
+        # Stores are committed in groups of commit_every (and by flush and close):
+        self.commit_every = commit_every
+        self.uncommitted = 0
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+
+    @staticmethod
+    def context(state, max_solutions):
+        family = [cls for cls in type(state).__mro__ if State in cls.__bases__]
+        name = family[0].__name__ if family else type(state).__name__
+        return name + '/' + ('all' if max_solutions is None else str(max_solutions))
+
+    def lookup(self, state, max_solutions=1):
+        '''
+        Return the list of cached solutions of the given state (rebuilt as states of its class), or None.
+        '''
+        canonical = state.canonical_form()
+        if canonical is None:
+            return None
+        (key, transform) = canonical
+        row = self.connection.execute("SELECT solutions FROM solutions WHERE context = ? AND key = ?",
+                                      (SolveCache.context(state, max_solutions), pickle.dumps(key))).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return [state.from_canonical(data, transform) for data in pickle.loads(row[0])]
+
+    def store(self, state, solutions, max_solutions=1):
+        '''
+        Store the solutions found for the given state with the given max_solutions (nothing if there are none).
+        '''
+        canonical = state.canonical_form() if solutions else None
+        if canonical is None:
+            return
+        (key, transform) = canonical
+        data = [state.to_canonical(solution, transform) for solution in solutions]
+        self.connection.execute("INSERT OR REPLACE INTO solutions VALUES (?, ?, ?)",
+                                (SolveCache.context(state, max_solutions), pickle.dumps(key), pickle.dumps(data)))
+        self.stored += 1
+        self.uncommitted += 1
+        if self.uncommitted >= self.commit_every:
+            self.flush()
+
+    def flush(self):
+        self.connection.commit()
+        self.uncommitted = 0
+
+    def close(self):
+        self.flush()
+        self.connection.close()
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM solutions").fetchone()[0]
+
+    def __str__(self):
+        return str(self.hits) + " hits, " + str(self.misses) + " misses, " + str(self.stored) + " stored, " + str(len(self)) + " entries in " + str(self.file_name)
@@ -2,14 +2,28 @@ from search import *
 import itertools
 import math
 import copy
-import ast
 import numpy as np
-from pathlib import Path
+from propagation import SudokuPropagator
+import exact_cover
+from sudoku_validation import validate_boards
+from puzzle_io import scan_board, iter_lines, sudoku_values, SUDOKU_SYMBOLS, SUDOKU_VALUES
 
 class SudokuBoard(State):
-    
+
+    # The branching policy of expand (and moves). branching picks the cell to branch on: 'first' is the first blank
+    # cell in row-major order; 'mrv' is the blank cell with the fewest remaining values (the values that don't occur
+    # in its row, column, or box), which also cuts off a branch as soon as some cell has no values left; and
+    # 'mrv-degree' breaks MRV ties in favour of the cell with the most blank peers. value_order is 'descending'
+    # (from the largest value to the smallest) or 'lcv' (least-constraining value first: the values that are
+    # possible in the fewest blank peers of the cell go first, with ties in descending order). Set these on a
+    # subclass, so that children, boards rebuilt by from_compact, and so on, all get the same policy.
+    branching = 'first'
+    value_order = 'descending'
+
     def __init__(self, rows):
-        # A Sudoku board is represented as a list of rows, where each row is a list of digit strings or '*' (or '_').
+        # A Sudoku board is represented as a list of rows, where each row is a list of symbols, i.e., the strings '1'
+        # through str(N) (so 16x16 and 25x25 boards have multi-character symbols such as '10'), or '*' (or '_').
+        # See puzzle_io.SUDOKU_SYMBOLS.
         super().__init__()
         self.rows = rows
         N = len(rows)
@@ -18,6 +32,79 @@ class SudokuBoard(State):
     def __str__(self):
         return str(self.rows)
 
+    def compute_state_key(self):
+        # The cells of the board, flattened in row-major order: 
+        return tuple(itertools.chain.from_iterable(self.rows))
+
+    def to_compact(self):
+        return self.state_key()
+
+    @classmethod
+    def from_compact(cls,cells):
+        N = math.isqrt(len(cells))
+        return cls([list(cells[r*N:(r+1)*N]) for r in range(N)])
+
+    # For each N, the symmetries of N x N boards used by canonical_form (see symmetry_permutations): 
+    symmetries = {}
+
+    @classmethod
+    def symmetry_permutations(cls,N):
+        '''
+        Return the symmetries of N x N boards, as an array of cell permutations in which row k lists, for every cell
+        of the transformed board (in row-major order), the cell of the original board that it comes from. The
+        symmetries are the permutations of the bands (groups of n = sqrt(N) rows sharing boxes) and of the stacks
+        (the same for columns), each with and without a transposition: 2 (n!)^2 of them, i.e., 72 for 9x9 and 1152
+        for 16x16. Beyond that there are too many to try, so 25x25 and larger boards only use the transposition.
+        '''
+        if N not in cls.symmetries:
+            n = math.isqrt(N)
+            orders = list(itertools.permutations(range(n))) if n <= 4 else [tuple(range(n))]
+            perms = []
+            for transpose in [False,True]:
+                for bands in orders:
+                    rows = [b * n + r for b in bands for r in range(n)]
+                    for stacks in orders:
+                        cols = [s * n + c for s in stacks for c in range(n)]
+                        perms.append([c * N + r if transpose else r * N + c for r in rows for c in cols])
+            cls.symmetries[N] = np.array(perms,dtype=np.intp)
+        return cls.symmetries[N]
+
+    def canonical_form(self):
+        '''
+        The canonical form of a board is the smallest (as a byte string) of its transformations by the symmetries of
+        symmetry_permutations, once the values of each transformation are relabeled in the order of their first
+        occurrence (so the first given becomes a 1, the next different given a 2, and so on). All the boards that
+        are the same up to those symmetries and a relabeling of the values have the same canonical form. The
+        transform is the pair (cell permutation, relabeling) that leads to it.
+        '''
+        N = self.N
+        perms = SudokuBoard.symmetry_permutations(N)
+        seqs = np.array(self.values(),dtype=np.intp)[perms]
+        # first[t, v] is the position of the first occurrence of the value v in the t-th transformation (N * N if
+        # it does not occur), and ranking the values by it gives their labels (with the absent values last): 
+        first = np.full((len(perms),N + 1),N * N,dtype=np.intp)
+        (ts,ks) = np.nonzero(seqs)
+        np.minimum.at(first,(ts,seqs[ts,ks]),ks)
+        order = np.argsort(first[:,1:],axis=1,kind='stable') + 1
+        labels = np.zeros((len(perms),N + 1),dtype=np.uint8)
+        np.put_along_axis(labels,order,np.arange(1,N + 1,dtype=np.uint8)[None,:],axis=1)
+        relabeled = np.take_along_axis(labels,seqs,axis=1)
+        keys = [row.tobytes() for row in relabeled]
+        t = min(range(len(keys)),key=keys.__getitem__)
+        return (keys[t],(perms[t],labels[t]))
+
+    def to_canonical(self,solution,transform):
+        (perm,labels) = transform
+        return labels[np.array(solution.values(),dtype=np.intp)[perm]].tobytes()
+
+    def from_canonical(self,data,transform):
+        (perm,labels) = transform
+        inverse = np.zeros(len(labels),dtype=np.intp)
+        inverse[labels] = np.arange(len(labels))
+        values = np.zeros(len(perm),dtype=np.intp)
+        values[perm] = inverse[np.frombuffer(data,dtype=np.uint8)]
+        return type(self).from_values(values.tolist())
+
     def blank_cells(self):
         '''
         Return the total number of blank cells in the puzzle.
@@ -29,20 +116,33 @@ class SudokuBoard(State):
         
     @classmethod
     # A factory method that builds a Sudoku board from a string (rather than a list) of the form "[[...], ..., [...]]",
-    # where every entry in the inner lists is either a digit or an underscore or an asterisk (the latter two are interchangeable).
+    # where every entry in the inner lists is either a symbol (such as 7 or 12) or an underscore or an asterisk (the latter two are interchangeable).
+    # The string is parsed with a single scan, without eval (see puzzle_io.scan_board). 
     def from_line(cls,line_string):
-        try: 
-            lst = ast.literal_eval(line_string)
-            return cls([[str(x) for x in l] for l in lst])
-        except:        
-            lst = ast.literal_eval(line_string.replace('*',"'*'").replace('_',"'*'"))
-            return cls([[str(x) for x in l] for l in lst])
-        
-    @staticmethod
+        return cls(scan_board(line_string))
+
+    def to_line(self):
+        # The inverse of from_line, in the format of the data files: 
+        return '[' + ','.join(['[' + ','.join(row) + ']' for row in self.rows]) + ']'
+
+    @classmethod
+    def from_values(cls,values):
+        '''
+        Build a board from a flat list of values in row-major order, as returned by values(). 
+        '''
+        N = math.isqrt(len(values))
+        return cls([[SUDOKU_SYMBOLS[v] for v in values[r*N:(r+1)*N]] for r in range(N)])
+
+    @classmethod
+    # Yield the boards of a text file whose every line is a string that can be parsed by from_line, one at a time: 
+    def iter_file(cls,file_name):
+        for line in iter_lines(file_name):
+            yield cls.from_line(line)
+
+    @classmethod
     #Return a list of boards built from a text file whose every line is a string that can be parsed by from_line: 
-    def parse_file(file_name):
-        lines = [l.strip() for l in Path(file_name).read_text().split("\n") if l]
-        return [SudokuBoard.from_line(l) for l in lines]
+    def parse_file(cls,file_name):
+        return list(cls.iter_file(file_name))
         
     def extends(self,board):
         # Return True or False depending on whether the given board extends self.
@@ -62,6 +162,14 @@ class SudokuBoard(State):
         '''
         return np.sum([row.count('*') for row in self.rows])    
         
+    @classmethod
+    def distance_batch(cls,states):
+        '''
+        The distances (blank-cell counts) of a whole list of boards, as plain ints. (Counting with str.count turned out
+        to be faster than building a NumPy matrix of the cells, even for batches of a hundred boards.) 
+        '''
+        return [sum([row.count('*') for row in s.rows]) for s in states]
+
     def all_unique(self,lst):
         '''
         Return True iff all (non-blank) elements in the given list are unique.
@@ -107,7 +215,38 @@ class SudokuBoard(State):
         return True
 
     def missing_values(self,row):
-        return [str(v) for v in range(1,10) if not(str(v) in self.rows[row])]
+        present = set(self.rows[row])
+        return [SUDOKU_SYMBOLS[v] for v in range(1,self.N + 1) if not(SUDOKU_SYMBOLS[v] in present)]
+
+    def values(self):
+        '''
+        The cells of the board as a flat list of ints in row-major order: 0 for a blank, and v for the symbol str(v)
+        (e.g., 1 through 16 for '1' through '16' on a 16x16 board). Raise ValueError on any other symbol. 
+        '''
+        return sudoku_values(itertools.chain.from_iterable(self.rows))
+
+    def fill(self,row,col,v):
+        '''
+        Put the value v (an int, as in values) in the given blank cell. 
+        '''
+        self.rows[row][col] = SUDOKU_SYMBOLS[v]
+
+    def basic_candidates(self):
+        '''
+        Return a list with the bitmask of the candidates of every blank cell (the values that don't occur in its row,
+        column, or box), and 0 for every filled cell, in row-major order; or None if the board is invalid. 
+        '''
+        engine = SudokuPropagator(self.N)
+        values = self.values()
+        (units, cell_units, _) = SudokuPropagator.geometry(self.N)
+        used = [0] * len(units)
+        for (i,v) in enumerate(values):
+            if v:
+                for u in cell_units[i]:
+                    if used[u] >> v & 1:
+                        return None
+                    used[u] |= 1 << v
+        return [0 if v else engine.full & ~(used[us[0]] | used[us[1]] | used[us[2]]) for (v,us) in zip(values,cell_units)]
 
     def can_be_placed(self,row,col,v):
         original_entry = self.rows[row][col]
@@ -118,52 +257,74 @@ class SudokuBoard(State):
     
     def deduce(self):
         '''
-        Carry out all uniquely-determined-cell deductions possible in the current board. 
-        Return the deductions as a list of dictionaries of the form {'row': ..., 'unique_cell': ..., 'value': ...}
+        Find the values that have a single possible blank cell in their row (hidden singles, one pass, without 
+        changing the board). Return the deductions as a list of dictionaries of the form 
+        {'row': ..., 'unique_cell': ..., 'value': ...}
         '''
-        initial_rows = copy.deepcopy(self.rows)
+        N = self.N
+        candidates = self.basic_candidates()
+        if candidates is None:
+            return []
         deductions = []
-        for row in range(9):
-            missing_vals = self.missing_values(row)
-            for v in missing_vals:
-                cands = []
-                for col in [c for c in range(9) if not(self.rows[row][c].isdigit())]:
-                    if self.can_be_placed(row,col,v):
-                        cands.append(col)
-                if len(cands) == 1:
-                    deductions.append({'row': row, 'unique_cell': cands[0], 'value': v})
-        self.rows = initial_rows
+        for row in range(N):
+            for v in self.missing_values(row):
+                bit = 1 << SUDOKU_VALUES[v]
+                cols = [c for c in range(N) if candidates[row*N + c] & bit]
+                if len(cols) == 1:
+                    deductions.append({'row': row, 'unique_cell': cols[0], 'value': v})
         return deductions
 
-    def solve_deductively(self):
+    def propagator(self,level='pairs'):
         '''
-        Solve a Sudoku puzzle by pure Boolean constraint propagation. 
+        Return a SudokuPropagator (see propagation.py) loaded with this board and propagated at the given level 
+        ('singles' or 'pairs'), or None if the board has no solution. 
         '''
-        done = False
-        while not(done):
-            if self.blank_cells() == 0:
-                return True
-            deductions = self.deduce()
-            for d in deductions:
-                self.rows[d['row']][d['unique_cell']] = d['value']
-            if len(deductions) < 1: 
-                done = True
+        engine = SudokuPropagator(self.N)
+        if not(engine.load(self.values())) or not(engine.propagate(level)):
+            return None
+        return engine
+
+    def solve_deductively(self,level='pairs'):
+        '''
+        Solve a Sudoku puzzle by pure constraint propagation (naked and hidden singles, and also naked and hidden pairs 
+        at the 'pairs' level), filling in every cell that propagation settles. Return True iff the board is solved. 
+        '''
+        engine = self.propagator(level)
+        if engine is None:
+            return False
+        N = self.N
+        for (i,v) in engine.drain_settled():
+            (row,col) = divmod(i,N)
+            if self.rows[row][col] in ['*','_']:
+                self.fill(row,col,v)
+        self.invalidate_key()
         return self.blank_cells() == 0 
                 
+    def solve_exact_cover(self,max_solutions=1):
+        '''
+        Return up to max_solutions solutions of the board (all of them if it is None), found by the exact-cover
+        backend of exact_cover.py rather than by search. 
+        '''
+        return exact_cover.solve_sudoku(self,max_solutions)
+
+    def count_solutions(self,limit=2):
+        # 0, 1, or 2 (i.e., several) with the default limit; see exact_cover.count_sudoku_solutions.
+        return exact_cover.count_sudoku_solutions(self,limit)
+
     def is_det(self,row,col):
+        '''
+        Return True iff exactly one value can go in the given cell (whatever it holds now) without breaking the rules. 
+        '''
         original_entry = self.rows[row][col]
-        cands = 0
-        for v in range(1,10):
-            self.rows[row][col] = str(v)
-            if self.is_valid():
-                cands += 1
+        self.rows[row][col] = '*'
+        candidates = self.basic_candidates()
         self.rows[row][col] = original_entry
-        return cands == 1
+        return candidates is not None and candidates[row*self.N + col].bit_count() == 1
     
     def det_cells(self):
         uniquely_determined_cells = []
-        for row in range(9):
-            for col in range(9):
+        for row in range(self.N):
+            for col in range(self.N):
                 if self.is_det(row,col):
                     uniquely_determined_cells.append((row,col))
         if uniquely_determined_cells:
@@ -175,11 +336,28 @@ class SudokuBoard(State):
     def is_solution(self):
         return self.is_valid() and not([row for row in self.rows if '*' in row])        
 
+    @classmethod
+    def verify_solutions(cls,initial_states,results):
+        '''
+        Check all the solutions of a batch at once (see sudoku_validation.py): a solution is genuine iff it is valid,
+        complete, and extends its puzzle. 
+        '''
+        solutions = [s for solutions in results for s in solutions]
+        givens = [initial_state for (initial_state,solutions) in zip(initial_states,results) for _ in solutions]
+        if not(solutions):
+            return [True] * len(results)
+        solved = validate_boards(solutions,givens)['solved']
+        verified, k = [], 0
+        for solutions in results:
+            verified.append(bool(solved[k:k + len(solutions)].all()))
+            k += len(solutions)
+        return verified
+
     def cands(self,r,c):
         row = self.rows[r]
         col = [row[c] for row in self.rows]
         ruled_out = set([d for d in row + col if d != '*'])
-        return list(reversed([digit for digit in [chr(i) for i in range(49,49+self.N)] if not(digit in ruled_out)]))
+        return [symbol for symbol in SUDOKU_SYMBOLS[self.N:0:-1] if not(symbol in ruled_out)]
     
     def get_candidates(self,r,c):
         row = self.rows[r]
@@ -188,7 +366,67 @@ class SudokuBoard(State):
     def get_all_candidates(self,r,cols):
         return list(itertools.chain.from_iterable(self.get_candidates(r,c) for c in cols))
     
+    def pick_branch_cell(self,counts,degree):
+        '''
+        Given the number of remaining values of every cell (N + 1 for a filled cell), return the index of the MRV cell
+        (the first one in row-major order, unless the branching policy is 'mrv-degree', in which case ties go to the
+        cell with the highest degree(i)), or -1 if there are no blank cells. 
+        '''
+        fewest = min(counts)
+        if fewest > self.N:
+            return -1
+        i = counts.index(fewest)
+        if self.branching == 'mrv-degree':
+            ties = [j for j in range(i,len(counts)) if counts[j] == fewest]
+            if len(ties) > 1:
+                i = max(ties,key=degree)
+        return i
+
+    def least_constraining_first(self,values,peer_masks):
+        # Order values (given in descending order) by the number of the given candidate masks they occur in:
+        return sorted(values,key=lambda v: sum([m >> v & 1 for m in peer_masks]))
+
+    def branch(self):
+        '''
+        Return a pair (i, values): the cell that expand and moves branch on (as an index in row-major order, or -1 if
+        there is none) and the values to try in it, in order, according to the branching policy. 
+        '''
+        N = self.N
+        values = self.values()
+        if self.branching == 'first':
+            if not(0 in values):
+                return (-1,[])
+            i = values.index(0)
+            candidates = [SUDOKU_VALUES[symbol] for symbol in self.cands(i // N,i % N)]
+            if self.value_order != 'lcv':
+                return (i,candidates)
+        masks = self.basic_candidates()
+        if masks is None:
+            return (-1,[])
+        peers = SudokuPropagator.geometry(N)[2]
+        if self.branching != 'first':
+            counts = [N + 1 if v else m.bit_count() for (v,m) in zip(values,masks)]
+            i = self.pick_branch_cell(counts,lambda j: sum([not(values[k]) for k in peers[j]]))
+            if i < 0:
+                return (-1,[])
+            candidates = [v for v in range(N,0,-1) if masks[i] >> v & 1]
+        if self.value_order == 'lcv':
+            # (The masks of filled cells are 0.)
+            candidates = self.least_constraining_first(candidates,[masks[j] for j in peers[i]])
+        return (i,candidates)
+
     def expand(self):
+        if self.branching != 'first' or self.value_order != 'descending':
+            (i,values) = self.branch()
+            if i < 0:
+                return []
+            (r,c) = divmod(i,self.N)
+            children = []
+            for v in values:
+                rows = [row[:] for row in self.rows]
+                rows[r][c] = SUDOKU_SYMBOLS[v]
+                children.append(type(self)(rows))
+            return children
         new1, new2, new3 = [], [], []
         for r in range(self.N):
             row = self.rows[r]
@@ -198,22 +436,457 @@ class SudokuBoard(State):
             else:
                 new2 = self.get_all_candidates(r,[blanks[0]])
                 new3 = self.rows[r+1:]
-                return [SudokuBoard(new1 + [cand] + new3) for cand in new2]
+                return [type(self)(new1 + [cand] + new3) for cand in new2]
         return []
 
-rows = "[[_,3,_,8,9,_,_,_,4],\
-         [_,6,_,_,3,1,8,9,_],\
-         [_,9,7,_,_,_,2,_,_],\
-         [9,_,8,6,5,_,_,_,2],\
-         [1,_,2,_,_,_,6,_,3],\
-         [6,_,_,_,4,2,9,7,_],\
-         [3,_,5,_,_,9,_,2,_],\
-         [_,2,_,3,_,5,7,8,_],\
-         [_,_,_,4,2,_,_,1,5]]"
+    # The reversible move protocol, used by State.dfs_in_place. A move is a triple (row, col, symbol) that fills a blank cell.
+    # moves() branches on the same cell, with the symbols in the same order, as expand(): 
+    def moves(self):
+        (i,values) = self.branch()
+        if i < 0:
+            return []
+        (r,c) = divmod(i,self.N)
+        return [(r,c,SUDOKU_SYMBOLS[v]) for v in values]
+
+    def apply(self,move):
+        (r,c,symbol) = move
+        self.rows[r][c] = symbol
+
+    def undo(self,move):
+        (r,c,_) = move
+        self.rows[r][c] = '*'
+
+    def snapshot(self):
+        return type(self)([row[:] for row in self.rows])
+
+class BitboardSudokuBoard(SudokuBoard):
+    '''
+    The same search space as SudokuBoard (the same children in the same order), over a compact representation: a flat
+    bytearray of cell values (0 for a blank, v for the symbol str(v), e.g., '1' through '16' on a 16x16 board),
+    plus a bitmask of the values used in every row, column, and box, all kept up to date on every placement. 
+    Validity checks and is_solution are then O(1), and the candidates of a cell are a few bit operations. A placement
+    that clashes with an equal value in its row, column, or box leaves the masks alone and is recorded in a set of
+    clashing cells instead, so a board is valid iff that set is empty. (Placements must therefore be undone in 
+    reverse order, as dfs_in_place does.) 
+
+    The rows attribute is still available, as a property, for I/O: reading it builds the usual list of lists of 
+    strings, and assigning to it rebuilds the board. Mutating the lists it returns has no effect on the board. 
+
+    Under the MRV branching policies, place and clear also keep the number of remaining values of every cell and the
+    number of blank peers of every cell (its degree) up to date, by looking only at the peers of the changed cell, so
+    finding the branching cell is a min over a list. 
+    '''
+
+    # For each N, the tuples (row of cell, column of cell, box of cell), indexed by cell:
+    cell_units = {}
+
+    @classmethod
+    def units_of(cls,N):
+        if N not in cls.cell_units:
+            n = math.isqrt(N)
+            cls.cell_units[N] = (tuple(i // N for i in range(N*N)),
+                                 tuple(i % N for i in range(N*N)),
+                                 tuple((i // N // n) * n + (i % N) // n for i in range(N*N)))
+        return cls.cell_units[N]
+
+    @property
+    def rows(self):
+        N = self.N
+        return [[SUDOKU_SYMBOLS[v] for v in self.cells[r*N:(r+1)*N]] for r in range(N)]
+
+    @rows.setter
+    def rows(self,rows):
+        N = len(rows)
+        self.N = N
+        self.cells = bytearray(N*N)
+        self.row_masks, self.col_masks, self.box_masks = [0] * N, [0] * N, [0] * N
+        self.clashes = set()
+        self.blanks = N*N
+        (self.cell_row, self.cell_col, self.cell_box) = type(self).units_of(N)
+        self.peers = SudokuPropagator.geometry(N)[2]
+        if self.tracks_counts():
+            self.counts = [N] * (N*N)
+            self.degrees = [len(p) for p in self.peers]
+        else:
+            self.counts = self.degrees = None
+        for r in range(N):
+            for (c,v) in enumerate(sudoku_values(rows[r][:N])):
+                if v:
+                    self.place(r*N + c,v)
+        self.invalidate_key()
+
+    def place(self,i,v):
+        '''
+        Put the value v in the blank cell i (in row-major order). 
+        '''
+        bit = 1 << v
+        (r,c,b) = (self.cell_row[i],self.cell_col[i],self.cell_box[i])
+        self.cells[i] = v
+        self.blanks -= 1
+        clash = (self.row_masks[r] | self.col_masks[c] | self.box_masks[b]) & bit
+        if self.counts is not None:
+            self.update_counts(i,bit,-1,clash)
+        if clash:
+            self.clashes.add(i)
+        else:
+            self.row_masks[r] |= bit
+            self.col_masks[c] |= bit
+            self.box_masks[b] |= bit
+
+    def clear(self,i):
+        '''
+        Blank out cell i, undoing the latest placement in it. 
+        '''
+        v = self.cells[i]
+        self.cells[i] = 0
+        self.blanks += 1
+        clash = i in self.clashes
+        if clash:
+            self.clashes.remove(i)
+        else:
+            mask = ~(1 << v)
+            self.row_masks[self.cell_row[i]] &= mask
+            self.col_masks[self.cell_col[i]] &= mask
+            self.box_masks[self.cell_box[i]] &= mask
+        if self.counts is not None:
+            self.update_counts(i,1 << v,1,clash)
+
+    def tracks_counts(self):
+        # Whether place and clear keep the counts and degrees used by the MRV policies:
+        return self.branching != 'first'
+
+    def update_counts(self,i,bit,delta,clash):
+        # Called by place (delta = -1, before the masks are updated) and clear (delta = 1, after). The value bit
+        # becomes impossible (or possible again) in the blank peers that don't have it in their masks, unless the
+        # placement clashed, in which case the masks don't change at all. 
+        (cells, counts, degrees) = (self.cells, self.counts, self.degrees)
+        (row_masks, col_masks, box_masks) = (self.row_masks, self.col_masks, self.box_masks)
+        (cell_row, cell_col, cell_box) = (self.cell_row, self.cell_col, self.cell_box)
+        for j in self.peers[i]:
+            degrees[j] += delta
+            if not(clash or cells[j] or (row_masks[cell_row[j]] | col_masks[cell_col[j]] | box_masks[cell_box[j]]) & bit):
+                counts[j] += delta
+        counts[i] = self.N + 1 if delta < 0 else self.legal_values(i).bit_count()
+
+    def copy(self):
+        '''
+        A parentless copy of this board, made without going through the rows. 
+        '''
+        board = object.__new__(type(self))
+        State.__init__(board)
+        board.N, board.cells, board.blanks = self.N, bytearray(self.cells), self.blanks
+        board.row_masks, board.col_masks, board.box_masks = self.row_masks[:], self.col_masks[:], self.box_masks[:]
+        board.clashes = set(self.clashes)
+        (board.cell_row, board.cell_col, board.cell_box, board.peers) = (self.cell_row, self.cell_col, self.cell_box, self.peers)
+        if self.counts is None:
+            board.counts = board.degrees = None
+        else:
+            board.counts, board.degrees = self.counts[:], self.degrees[:]
+        return board
+
+    def compute_state_key(self):
+        return bytes(self.cells)
+
+    def to_compact(self):
+        return self.state_key()
+
+    @classmethod
+    def from_compact(cls,cells):
+        N = math.isqrt(len(cells))
+        return cls([[SUDOKU_SYMBOLS[v] for v in cells[r*N:(r+1)*N]] for r in range(N)])
+
+    def blank_cells(self):
+        return self.blanks
+
+    def distance(self):
+        return self.blanks
+
+    @classmethod
+    def distance_batch(cls,states):
+        return [s.blanks for s in states]
+
+    def is_valid(self):
+        return not(self.clashes)
+
+    def is_solution(self):
+        return self.blanks == 0 and not(self.clashes)
+
+    def free_values(self,i):
+        '''
+        The bitmask of the values that don't occur in the row or the column of cell i. (Like SudokuBoard.cands, this
+        leaves box clashes to is_valid, so that both representations search the same tree.)
+        '''
+        N = self.N
+        return ((1 << (N + 1)) - 2) & ~(self.row_masks[self.cell_row[i]] | self.col_masks[self.cell_col[i]])
+
+    def candidate_values(self,i):
+        # The values allowed by free_values, from the largest to the smallest (the order of SudokuBoard.cands):
+        free = self.free_values(i)
+        return [v for v in range(self.N,0,-1) if free >> v & 1]
+
+    def legal_values(self,i):
+        '''
+        The bitmask of the values that don't occur in the row, the column, or the box of cell i. 
+        '''
+        N = self.N
+        return ((1 << (N + 1)) - 2) & ~(self.row_masks[self.cell_row[i]] | self.col_masks[self.cell_col[i]] | self.box_masks[self.cell_box[i]])
+
+    def branch(self):
+        if self.branching == 'first':
+            i = self.cells.find(0)
+            if i < 0:
+                return (-1,[])
+            values = self.candidate_values(i)
+        else:
+            i = self.pick_branch_cell(self.counts,self.degrees.__getitem__)
+            if i < 0:
+                return (-1,[])
+            legal = self.legal_values(i)
+            values = [v for v in range(self.N,0,-1) if legal >> v & 1]
+        if self.value_order == 'lcv':
+            values = self.least_constraining_first(values,[self.legal_values(j) for j in self.peers[i] if not(self.cells[j])])
+        return (i,values)
+
+    def cands(self,r,c):
+        return [SUDOKU_SYMBOLS[v] for v in self.candidate_values(r*self.N + c)]
+
+    def can_be_placed(self,row,col,v):
+        i = row*self.N + col
+        (value,original_value) = (SUDOKU_VALUES[v],self.cells[i])
+        if self.clashes:
+            # (Which of the clashing placements the masks hold depends on the order of the placements, so the board
+            # is rebuilt with v in the cell.)
+            values = list(self.cells)
+            values[i] = value
+            return type(self).from_values(values).is_valid()
+        # Without clashes, the bit of the value in cell i is in the masks of its units because of that cell alone:
+        used = self.row_masks[self.cell_row[i]] | self.col_masks[self.cell_col[i]] | self.box_masks[self.cell_box[i]]
+        if original_value:
+            used &= ~(1 << original_value)
+        return self.is_valid() and not(used >> value & 1 and value)
+
+    def extends(self,board):
+        # As SudokuBoard.extends, on the cells:
+        if self.N != board.N:
+            return False
+        return all(v == 0 or w == v for (v,w) in zip(board.values(),self.cells))
+
+    def validBlock(self,starting_row,starting_col,n):
+        N = self.N
+        entries = [v for r in range(starting_row,starting_row + n) for v in self.cells[r*N + starting_col:r*N + starting_col + n] if v]
+        return len(entries) == len(set(entries))
+
+    def missing_values(self,row):
+        N = self.N
+        used = 0
+        for v in self.cells[row*N:(row+1)*N]:
+            used |= 1 << v
+        return [SUDOKU_SYMBOLS[v] for v in range(1,N + 1) if not(used >> v & 1)]
+
+    def solve_deductively(self,level='pairs'):
+        # As SudokuBoard.solve_deductively, on the cells:
+        engine = self.propagator(level)
+        if engine is None:
+            return False
+        for (i,v) in engine.drain_settled():
+            if not(self.cells[i]):
+                self.place(i,v)
+        self.invalidate_key()
+        return self.blanks == 0
+
+    def values(self):
+        return list(self.cells)
+
+    def fill(self,row,col,v):
+        self.place(row*self.N + col,v)
+
+    def is_det(self,row,col):
+        i = row*self.N + col
+        original_value = self.cells[i]
+        if original_value:
+            self.clear(i)
+        cands = 0
+        for v in range(1,self.N + 1):
+            self.place(i,v)
+            cands += self.is_valid()
+            self.clear(i)
+        if original_value:
+            self.place(i,original_value)
+        return cands == 1
+
+    def expand(self):
+        (i,values) = self.branch()
+        if i < 0:
+            return []
+        children = []
+        for v in values:
+            child = self.copy()
+            child.place(i,v)
+            children.append(child)
+        return children
+
+    def apply(self,move):
+        (r,c,symbol) = move
+        self.place(r*self.N + c,SUDOKU_VALUES[symbol])
+
+    def undo(self,move):
+        (r,c,_) = move
+        self.clear(r*self.N + c)
+
+    def snapshot(self):
+        return self.copy()
+
+class PropagatingSudokuBoard(BitboardSudokuBoard):
+    '''
+    A BitboardSudokuBoard that runs constraint propagation (see propagation.py) in every search node: the board keeps
+    a SudokuPropagator with the candidates of every cell, propagates the givens when it is built, and every child
+    made by expand gets a copy of its parent's propagator, assigns the branching value, and propagates only the 
+    consequences of that assignment. Every cell that propagation settles is filled in, so easy puzzles are solved 
+    at the root, without any branching. Children whose propagation runs into a contradiction are not generated at 
+    all, and a board whose givens are contradictory is invalid. The propagation_level class attribute is 'pairs' 
+    (naked and hidden singles and pairs) or 'singles'. 
+
+    The branching policies are those of the other boards, except that the remaining values of a cell are its 
+    candidates in the propagator (so MRV uses the counts that propagation keeps up to date, rather than place and 
+    clear). moves only returns the values whose propagation does not run into a contradiction, as expand does. apply 
+    also propagates, and records on the trail the cells that it filled in, while the propagator records its 
+    eliminations on its own trail (see SudokuPropagator.undo_to), so that undo only takes back what apply changed. 
+    '''
+
+    propagation_level = 'pairs'
+
+    @BitboardSudokuBoard.rows.setter
+    def rows(self,rows):
+        BitboardSudokuBoard.rows.fset(self,rows)
+        self.engine = SudokuPropagator(self.N)
+        self.contradiction = not(self.engine.load(self.cells)) or not(self.engine.propagate(self.propagation_level))
+        self.trail = []
+        self.fill_settled()
+
+    def fill_settled(self):
+        # Return the cells filled in: 
+        filled = []
+        for (i,v) in self.engine.drain_settled():
+            if not(self.cells[i]):
+                self.place(i,v)
+                filled.append(i)
+        return filled
+
+    def copy(self):
+        board = super().copy()
+        board.engine = self.engine.copy()
+        board.contradiction = self.contradiction
+        board.trail = []
+        return board
+
+    def is_valid(self):
+        return not(self.clashes or self.contradiction)
+
+    def is_solution(self):
+        return self.blanks == 0 and self.is_valid()
+
+    def candidate_values(self,i):
+        return self.engine.candidate_values(i)
+
+    def tracks_counts(self):
+        return False
+
+    def branch(self):
+        (cells, cands, N) = (self.cells, self.engine.cands, self.N)
+        if self.branching == 'first':
+            i = cells.find(0)
+        else:
+            counts = [N + 1 if v else c.bit_count() for (v,c) in zip(cells,cands)]
+            i = self.pick_branch_cell(counts,lambda j: sum([not(cells[k]) for k in self.peers[j]]))
+        if i < 0:
+            return (-1,[])
+        values = self.candidate_values(i)
+        if self.value_order == 'lcv':
+            values = self.least_constraining_first(values,[cands[j] for j in self.peers[i] if not(cells[j])])
+        return (i,values)
+
+    def assign_and_propagate(self,i,v):
+        '''
+        Put v in cell i, propagate, and fill in the cells that propagation settles. Return False on a contradiction. 
+        '''
+        self.place(i,v)
+        if not(self.engine.assign(i,v)) or not(self.engine.propagate(self.propagation_level)):
+            self.contradiction = True
+            return False
+        self.fill_settled()
+        return True
+
+    def expand(self):
+        if not(self.is_valid()):
+            return []
+        (i,values) = self.branch()
+        if i < 0:
+            return []
+        children = []
+        for v in values:
+            child = self.copy()
+            if child.assign_and_propagate(i,v):
+                children.append(child)
+        return children
+
+    def propagates(self,i,v):
+        # Whether assigning v to cell i leaves the propagator without a contradiction (tried on a copy): 
+        engine = self.engine.copy()
+        return engine.assign(i,v) and engine.propagate(self.propagation_level)
+
+    def moves(self):
+        if not(self.is_valid()):
+            return []
+        (i,values) = self.branch()
+        if i < 0:
+            return []
+        (r,c) = divmod(i,self.N)
+        return [(r,c,SUDOKU_SYMBOLS[v]) for v in values if self.propagates(i,v)]
+
+    def apply(self,move):
+        (r,c,symbol) = move
+        (i,v,engine) = (r*self.N + c,SUDOKU_VALUES[symbol],self.engine)
+        if engine.trail is None:
+            engine.trail = []
+        # Each trail entry holds the cells filled in by the move, the length of the propagator's trail before it, and
+        # the contradiction flag before it: 
+        entry = ([i],len(engine.trail),self.contradiction)
+        self.place(i,v)
+        if not(engine.assign(i,v)) or not(engine.propagate(self.propagation_level)):
+            self.contradiction = True
+        else:
+            entry[0].extend(self.fill_settled())
+        self.trail.append(entry)
+
+    def undo(self,move):
+        (filled,mark,contradiction) = self.trail.pop()
+        for i in reversed(filled):
+            self.clear(i)
+        self.engine.undo_to(mark)
+        self.contradiction = contradiction
+
+    def snapshot(self):
+        # (Trail entries are never changed once recorded, so the copies can share them.) 
+        board = self.copy()
+        board.trail = self.trail[:]
+        if self.engine.trail is not None:
+            board.engine.trail = self.engine.trail[:]
+        return board
+
+if __name__ == "__main__":
+    rows = "[[_,3,_,8,9,_,_,_,4],\
+             [_,6,_,_,3,1,8,9,_],\
+             [_,9,7,_,_,_,2,_,_],\
+             [9,_,8,6,5,_,_,_,2],\
+             [1,_,2,_,_,_,6,_,3],\
+             [6,_,_,_,4,2,9,7,_],\
+             [3,_,5,_,_,9,_,2,_],\
+             [_,2,_,3,_,5,7,8,_],\
+             [_,_,_,4,2,_,_,1,5]]"
 
-b = SudokuBoard.from_line(rows)
+    b = SudokuBoard.from_line(rows)
 
-(solutions,iterations) = b.dfs({'max_states_to_show':0})
+    (solutions,iterations) = b.dfs({'max_states_to_show':0})
 
-file_name = "easy_sudoku_puzzles_9x9_100.txt"
-State.solve_batch(file_name,SudokuBoard.parse_file,{'max_iterations':800})
+    file_name = "easy_sudoku_puzzles_9x9_100.txt"
+    State.solve_batch(file_name,SudokuBoard.parse_file,{'max_iterations':800})
@@ -0,0 +1,185 @@
+'''
+Generate Sudoku puzzles of any size N = n^2 in bulk, each with a unique solution and a chosen difficulty, e.g., to
+build benchmark sets of 100k puzzles. Generation is spread over all cores, and it is deterministic: the k-th puzzle
+of a run only depends on the seed and on k (not on the number of workers), so the same seed always gives the same file.
+
+A puzzle starts out as a random solution (the exact-cover search of exact_cover.py on an empty board, with its
+choices shuffled). Its givens are then removed one at a time, in a random order, and a removal is only kept if the
+puzzle still passes the test of its difficulty, where the rules are those of propagation.py:
+
+'easy': the singles rules (naked and hidden singles) solve the puzzle;
+'medium': the singles and pairs rules solve it, but the singles alone do not;
+'hard': the puzzle has a unique solution, but the singles and pairs rules do not solve it.
+
+Propagation only eliminates impossible values, so a puzzle that it solves has a unique solution. For 'hard', the
+uniqueness after the removal of the value v from cell i is checked by a single exact-cover search for a solution with
+another value in cell i (the puzzle had a unique solution before, with v in cell i, so any other solution must differ
+there), which mostly fails fast (see MAX_CHECK_NODES for the searches that don't). And a removed cell whose value is
+forced by its peers (every other value is given in its row, column, or box) passes every test without a search. The
+second half of the 'medium' and 'hard' tests is checked once no more givens can be removed; a puzzle that fails it is
+dropped and generation starts over.
+
+Run python3 sudoku_generator.py <count> <N> easy|medium|hard <output-file> [<seed>] [<workers>] to write count puzzles
+to a file, in the text format of new_data/ or, if the file name ends with .bin, in the binary format of puzzle_io.py.
+'''
+import collections
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from propagation import SudokuPropagator
+from exact_cover import exact_cover, sudoku_matrix
+from sudoku import SudokuBoard
+from puzzle_io import write_sudoku_text, write_sudoku_binary
+
+DIFFICULTIES = ['easy','medium','hard']
+
+# How many times generate_puzzle starts over before giving up on a difficulty (e.g., 'hard' 4x4 puzzles, which
+# don't exist):
+MAX_ATTEMPTS = 100
+
+# The budget (in search nodes) of every uniqueness check of a 'hard' puzzle. A check that runs out of it keeps the
+# given, so puzzles stay unique. 9x9 checks take a few hundred nodes at most, but on 16x16 and larger boards some
+# take hundreds of thousands, so those puzzles may keep a few givens that could have been removed:
+MAX_CHECK_NODES = 2000
+
+def random_solution(N,rng):
+    '''
+    Return a random solved N x N board, as a flat list of values in row-major order (see SudokuBoard.values).
+    '''
+    # A random search of an empty board mostly goes straight down, but now and then it gets stuck in a huge subtree
+    # (almost always on 25x25 boards), so it starts over, with other random choices, after 10 N^2 search nodes:
+    while True:
+        (X,Y) = sudoku_matrix([0] * (N * N),N)
+        rows = next(exact_cover(X,Y,None,1,[0],rng,10 * N * N),None)
+        if rows is not None:
+            break
+    values = [0] * (N * N)
+    for r in rows:
+        values[r // N] = r % N + 1
+    return values
+
+def solved_by_propagation(values,N,level):
+    # Whether the propagation rules of the given level settle every cell of the board with the given values (the
+    # pair rules, which are much slower, only come in if the singles rules are not enough):
+    propagator = SudokuPropagator(N)
+    if not(propagator.load(values)) or not(propagator.propagate('singles')):
+        return False
+    if level == 'pairs' and not(all(c & (c - 1) == 0 for c in propagator.cands)) and not(propagator.propagate('pairs')):
+        return False
+    return all(c & (c - 1) == 0 for c in propagator.cands)
+
+def has_other_solution(values,N,i,v,max_nodes=None):
+    '''
+    Whether the board with the given values (in which cell i is blank) has a solution without the value v in cell i.
+    A search that runs out of max_nodes search nodes counts as a yes.
+    '''
+    matrix = sudoku_matrix(values,N)
+    if matrix is None:
+        return False
+    (X,Y) = matrix
+    r = i * N + v - 1
+    for j in Y[r]:
+        X[j].discard(r)
+    nodes = [0]
+    found = next(exact_cover(X,Y,None,1,nodes,None,max_nodes),None) is not None
+    return found or (max_nodes is not None and nodes[0] > max_nodes)
+
+def is_forced(values,peers,i,v,full):
+    # Whether every value but v is given in some peer of cell i:
+    seen = 1 << v
+    for j in peers[i]:
+        seen |= 1 << values[j]
+    return seen & full == full
+
+def generate_puzzle(N,difficulty,rng,min_givens=0):
+    '''
+    Return a puzzle of the given size and difficulty, as a flat list of values in row-major order. Givens are removed
+    until no more can be removed, or until only min_givens are left.
+    '''
+    if difficulty not in DIFFICULTIES:
+        raise ValueError("The difficulty must be one of " + ', '.join(DIFFICULTIES) + ", not " + str(difficulty))
+    peers = SudokuPropagator.geometry(N)[2]
+    full = (1 << (N + 1)) - 2
+    for _ in range(MAX_ATTEMPTS):
+        values = random_solution(N,rng)
+        givens = N * N
+        cells = list(range(N * N))
+        rng.shuffle(cells)
+        for i in cells:
+            if givens <= min_givens:
+                break
+            v = values[i]
+            values[i] = 0
+            if is_forced(values,peers,i,v,full):
+                keep = True
+            elif difficulty == 'easy':
+                keep = solved_by_propagation(values,N,'singles')
+            elif difficulty == 'medium':
+                keep = solved_by_propagation(values,N,'pairs')
+            else:
+                keep = not(has_other_solution(values,N,i,v,MAX_CHECK_NODES))
+            if keep:
+                givens -= 1
+            else:
+                values[i] = v
+        if difficulty == 'easy' or (difficulty == 'medium' and not(solved_by_propagation(values,N,'singles'))) or \
+           (difficulty == 'hard' and not(solved_by_propagation(values,N,'pairs'))):
+            return values
+    raise ValueError("Could not generate a " + difficulty + " " + str(N) + "x" + str(N) + " puzzle in " + str(MAX_ATTEMPTS) + " attempts")
+
+def puzzle_rng(seed,k):
+    # The random generator of the k-th puzzle of a run (string seeds are hashed the same way in every process):
+    return random.Random(str(seed) + '/' + str(k))
+
+def generate_chunk(N,difficulty,seed,start,count,min_givens=0):
+    # Puzzles start through start + count - 1 of a run, as bytes of values (which are cheap to send between processes):
+    return [bytes(generate_puzzle(N,difficulty,puzzle_rng(seed,k),min_givens)) for k in range(start,start + count)]
+
+def iter_generate_puzzles(count,N=9,difficulty='easy',seed=0,workers=None,min_givens=0,cls=SudokuBoard,chunk_size=20):
+    '''
+    Yield count puzzles (as boards of class cls) of the given size and difficulty, in order, generating them in chunks
+    of chunk_size on a pool of worker processes (as many as there are cores if workers is None). Only a few chunks
+    per worker are in flight at any time, so the puzzles can be streamed to a file.
+    '''
+    workers = os.cpu_count() if workers is None else workers
+    chunks = [(start,min(chunk_size,count - start)) for start in range(0,count,chunk_size)]
+    if workers <= 1:
+        for (start,size) in chunks:
+            for values in generate_chunk(N,difficulty,seed,start,size,min_givens):
+                yield cls.from_values(list(values))
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = collections.deque()
+        for (start,size) in chunks:
+            pending.append(executor.submit(generate_chunk,N,difficulty,seed,start,size,min_givens))
+            if len(pending) >= 2 * workers:
+                for values in pending.popleft().result():
+                    yield cls.from_values(list(values))
+        while pending:
+            for values in pending.popleft().result():
+                yield cls.from_values(list(values))
+
+def generate_file(file_name,count,N=9,difficulty='easy',seed=0,workers=None,min_givens=0):
+    '''
+    Write count puzzles to file_name: in the binary format of puzzle_io.py if its name ends with .bin, and in the text
+    format of the data files otherwise. Return the number of puzzles written.
+    '''
+    puzzles = iter_generate_puzzles(count,N,difficulty,seed,workers,min_givens)
+    if str(file_name).endswith('.bin'):
+        return write_sudoku_binary(puzzles,file_name)
+    return write_sudoku_text(puzzles,file_name)
+
+if __name__ == "__main__":
+    if len(sys.argv) not in [5,6,7] or sys.argv[3] not in DIFFICULTIES:
+        print("Usage: python3 sudoku_generator.py <count> <N> easy|medium|hard <output-file> [<seed>] [<workers>]")
+        exit(1)
+    (count,N,difficulty,output_file) = (int(sys.argv[1]),int(sys.argv[2]),sys.argv[3],sys.argv[4])
+    seed = int(sys.argv[5]) if len(sys.argv) > 5 else 0
+    workers = int(sys.argv[6]) if len(sys.argv) > 6 else None
+    start_time = time.perf_counter()
+    written = generate_file(output_file,count,N,difficulty,seed,workers)
+    seconds = time.perf_counter() - start_time
+    print("Generated " + str(written) + " " + difficulty + " " + str(N) + "x" + str(N) + " puzzles in " + "%.1f" % seconds +
+          " s (" + "%.1f" % (written / seconds) + " puzzles per second) and wrote them to " + output_file + ".")
@@ -0,0 +1,141 @@
+'''
+Vectorized validation of many Sudoku boards at once. LLM answers and classical solutions are checked by the
+thousand, and SudokuBoard.is_valid, extends, and blank_cells loop over every board in Python; validate_boards checks
+a whole stack of boards with a few NumPy operations instead.
+
+Boards are stacked into an integer array of shape (B, N, N), with 0 for a blank cell and v for the symbol str(v) (see
+puzzle_io.SUDOKU_SYMBOLS), and -1 for anything else, such as a symbol that is not a number. boards_to_array builds
+such an array from SudokuBoards or lists of rows; boards that are not N x N (e.g., malformed LLM answers) are
+flagged as not well formed rather than rejected, so a whole result set can always be checked in one pass.
+
+For every board, validate_boards reports whether it is well formed, whether it is valid (every symbol is between 1
+and N and no row, column, or box has a repeated value), whether it is complete (no blanks), whether it extends its
+puzzle (keeps every given), and the first violation it found, in this order: 'shape', 'symbol', 'row', 'column',
+'box', 'given'.
+'''
+import itertools
+import numpy as np
+from puzzle_io import SUDOKU_VALUES
+
+def symbol_value(entry):
+    # 0 for a blank, v for str(v), and -1 for anything else:
+    return SUDOKU_VALUES.get(entry,-1)
+
+def symbol_codes(text):
+    # The values of a string of single-character symbols (i.e., the digits 1 through 9 and blanks), as an int array:
+    codes = np.frombuffer(text.encode('ascii'),dtype=np.uint8).astype(np.int16)
+    blanks = (codes == ord('*')) | (codes == ord('_'))
+    codes -= 48
+    codes[(codes <= 0) | (codes > 9)] = -1
+    codes[blanks] = 0
+    return codes
+
+def board_rows(board):
+    return board.rows if hasattr(board,'rows') else board
+
+def boards_to_array(boards,N=None):
+    '''
+    Stack the given boards (SudokuBoards, lists of rows of symbols, or lists of rows of ints) into an int array of
+    shape (B, N, N). N defaults to the size of the first board. Return the pair (array, well_formed), where
+    well_formed[b] is False iff board b is not N x N, in which case its cells are all -1.
+    '''
+    rows_list = [board_rows(board) for board in boards]
+    if N is None:
+        N = len(rows_list[0]) if rows_list else 0
+    array = np.full((len(rows_list),N,N),-1,dtype=np.int16)
+    well_formed = np.zeros(len(rows_list),dtype=bool)
+    # The boards whose symbols are all single characters (the usual case, up to 9x9) are converted together, in one go:
+    texts, text_indices = [], []
+    for (b,rows) in enumerate(rows_list):
+        if len(rows) == N and all(len(row) == N for row in rows):
+            well_formed[b] = True
+            if all(isinstance(entry,(int,np.integer)) for entry in rows[0]):
+                array[b] = rows
+                continue
+            try:
+                text = ''.join(itertools.chain.from_iterable(rows))
+            except TypeError:
+                text = ''
+            if len(text) == N * N and text.isascii():
+                texts.append(text)
+                text_indices.append(b)
+            else:
+                array[b] = [[symbol_value(str(entry)) for entry in row] for row in rows]
+    if texts:
+        array[text_indices] = symbol_codes(''.join(texts)).reshape(len(texts),N,N)
+    return (array,well_formed)
+
+def box_major(array):
+    # Reorder the cells of every board so that array[b, k] lists the cells of box k (boxes in row-major order):
+    (B,N,_) = array.shape
+    n = int(round(N ** 0.5))
+    if n * n != N:
+        raise ValueError("The size of a Sudoku board must be a perfect square, not " + str(N))
+    return array.reshape(B,n,n,n,n).transpose(0,1,3,2,4).reshape(B,N,N)
+
+def first_duplicates(units):
+    '''
+    For an array of shape (B, N, N) whose [b, k] entries are the values of the k-th unit of board b, return the
+    arrays (has_duplicate, unit, value): whether board b repeats a (nonzero) value in some unit, and the first such
+    unit and the smallest repeated value in it.
+    '''
+    # Sorting every unit puts equal values next to each other:
+    ordered = np.sort(units,axis=2)
+    repeated = (ordered[:,:,1:] == ordered[:,:,:-1]) & (ordered[:,:,1:] > 0)
+    per_unit = repeated.any(axis=2)
+    unit = per_unit.argmax(axis=1)
+    rows = np.arange(len(units))
+    value = ordered[rows,unit,1:][rows,repeated[rows,unit].argmax(axis=1)]
+    return (per_unit.any(axis=1),unit,value)
+
+def validate_boards(boards,givens=None,well_formed=None):
+    '''
+    Check a stack of boards (an int array of shape (B, N, N), see boards_to_array, or a list of boards, which is
+    converted first) against the rules, and against their puzzles if givens is given (a stack of the same shape or a
+    list of B boards, or a single puzzle for all boards, as an N x N array or a SudokuBoard). Return a dictionary of
+    boolean arrays of length B ('well_formed', 'valid', 'complete', 'extends', and 'solved', which is all of them)
+    and a list 'violation' with, for every board, None or the first violation found: a triple (kind, where, value), where where is a row, column, or box index for the
+    kinds 'row', 'column', and 'box', and a pair (row, column) for 'symbol' and 'given'.
+    '''
+    if not(isinstance(boards,np.ndarray)):
+        (boards,converted_well_formed) = boards_to_array(boards)
+        well_formed = converted_well_formed if well_formed is None else well_formed & converted_well_formed
+    (B,N,_) = boards.shape
+    well_formed = np.ones(B,dtype=bool) if well_formed is None else np.asarray(well_formed,dtype=bool)
+    flat = boards.reshape(B,N * N)
+    bad_symbols = (flat < 0) | (flat > N)
+    has_bad_symbol = bad_symbols.any(axis=1) & well_formed
+    bad_cell = bad_symbols.argmax(axis=1)
+    duplicates = [('row',) + first_duplicates(boards),
+                  ('column',) + first_duplicates(boards.transpose(0,2,1)),
+                  ('box',) + first_duplicates(box_major(boards))]
+    valid = well_formed & ~has_bad_symbol
+    for (_,has_duplicate,_,_) in duplicates:
+        valid &= ~has_duplicate
+    complete = well_formed & (flat != 0).all(axis=1)
+    if givens is None:
+        extends = well_formed.copy()
+        lost = np.zeros((B,N * N),dtype=bool)
+    else:
+        if not(isinstance(givens,np.ndarray)):
+            givens = boards_to_array([givens] if hasattr(givens,'rows') else givens,N)[0]
+        givens = np.broadcast_to(givens.reshape(-1,N * N),(B,N * N))
+        lost = (givens > 0) & (flat != givens)
+        extends = well_formed & ~lost.any(axis=1)
+    lost_cell = lost.argmax(axis=1)
+    # (Only the boards with a violation need a closer look.)
+    violation = [None] * B
+    for b in np.flatnonzero(~(valid & extends)).tolist():
+        if not(well_formed[b]):
+            violation[b] = ('shape',None,None)
+        elif has_bad_symbol[b]:
+            violation[b] = ('symbol',divmod(int(bad_cell[b]),N),int(flat[b,bad_cell[b]]))
+        else:
+            for (kind,has_duplicate,unit,value) in duplicates:
+                if has_duplicate[b]:
+                    violation[b] = (kind,int(unit[b]),int(value[b]))
+                    break
+            else:
+                violation[b] = ('given',divmod(int(lost_cell[b]),N),int(flat[b,lost_cell[b]]))
+    return {'well_formed': well_formed, 'valid': valid, 'complete': complete, 'extends': extends,
+            'solved': valid & complete & extends, 'violation': violation}
@@ -0,0 +1,61 @@
+'''
+A transposition table with a fixed memory budget, used by the tree-mode searches (tree_space=True) to avoid
+searching the same state again when it is reached along a different path (as happens constantly in the game
+of 24, where different orders of operations produce the same multiset of numbers).
+
+Entries are keyed by compact state keys (see State.state_key) and record the smallest cost at which the state
+has been reached and whether its subtree is known to be dead (fully explored without finding a solution).
+The table holds at most 'capacity' entries; when it is full, the least recently used entry is evicted, so the
+table sits between no duplicate detection at all and the unbounded visited tables of graph mode.
+'''
+from collections import OrderedDict
+
+class TranspositionTable:
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        # Maps state keys to [best cost, dead flag], in least-recently-used order:
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.evictions = 0
+
+    def lookup(self, key):
+        '''
+        Return the entry [best cost, dead] for the given key, or None. A hit makes the entry the most recently used.
+        '''
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+        return entry
+
+    def record(self, key, cost):
+        '''
+        Record that the state with the given key has been reached at the given cost.
+        '''
+        entry = self.entries.get(key)
+        if entry is None:
+            self.entries[key] = [cost, False]
+            if len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+        else:
+            self.entries.move_to_end(key)
+            if cost < entry[0]:
+                entry[0] = cost
+
+    def mark_dead(self, key, cost):
+        '''
+        Record that the subtree below the state with the given key contains no solutions.
+        '''
+        self.record(key, cost)
+        self.entries[key][1] = True
+
+    def clear(self):
+        self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
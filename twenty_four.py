@@ -1,8 +1,9 @@
 from search import *
 import itertools
+import functools
 import copy
 import re
-from pathlib import Path
+from puzzle_io import iter_lines
 
 def remove(lst,index_pair):
     '''
@@ -65,6 +66,17 @@ def sample(num_list):
     '''            
     return set(num_list) if len(num_list) < 2 else combine(sample(num_list[1:]),num_list[0])
 
+@functools.lru_cache(maxsize=100000)
+def distance_of_numbers(nums):
+    '''
+    The distance estimate of TwentyFourState.distance for the given tuple of available numbers, memoized, since the
+    same numbers (in the same order) come up over and over again during a search. 
+    '''
+    try:
+        return min([abs(24-x) for x in list(sample(list(nums)))[:TwentyFourState.MAX_SAMPLES]])
+    except:
+        return 10000
+
 def eqn_to_str(e):
     '''
     Return the printed representation of an equation: 
@@ -79,6 +91,7 @@ class TwentyFourState(State):
     @staticmethod
     def set_max_samples(m):
         TwentyFourState.MAX_SAMPLES = m
+        distance_of_numbers.cache_clear()
 
     @staticmethod
     def get_max_samples():
@@ -112,6 +125,19 @@ class TwentyFourState(State):
     def __str__(self):
         return 'Available numbers: ' + str(self.available_nums) + '. Equations: [' + ', '.join([eqn_to_str(e) for e in self.eqns]) + ']. Nested form: ' + self.nested_str()
 
+    def compute_state_key(self):
+        # Two states are the same iff they have the same multiset of available numbers, regardless of
+        # the equations that produced them: 
+        return tuple(sorted(self.available_nums))
+
+    def to_compact(self):
+        return (tuple(self.available_nums),tuple((e['left'],e['right'],e['op'],e['value']) for e in self.eqns))
+
+    @classmethod
+    def from_compact(cls,data):
+        (nums,eqns) = data
+        return cls(list(nums),[{'left':l, 'right':r, 'op':op, 'value':v} for (l,r,op,v) in eqns])
+
     @classmethod
     def from_line(cls,line_string):        
         number_strings = line_string.split()
@@ -120,17 +146,17 @@ class TwentyFourState(State):
         else:
             raise ValueError("Invalidly formatted string given as input to TwentyFourState.from_line")
 
+    @staticmethod
+    # Yield the initial games of 24 of a text file whose every line is a string that can be parsed by from_line (or, 
+    # for a CSV file, whose second field is), one at a time: 
+    def iter_file(file_name,is_csv_file=True):
+        for line in iter_lines(file_name):
+            yield TwentyFourState.from_line(line.split(",")[1] if is_csv_file else line)
+
     @staticmethod
     #Return a list of initial games of 24 built from a text file whose every line is a string that can be parsed by from_line: 
     def parse_file(file_name,is_csv_file=True):
-        lines = [l.strip() for l in Path(file_name).read_text().split("\n") if l]
-        if is_csv_file:
-            new_lines = []
-            for l in lines: 
-                toks = l.split(",")
-                new_lines.append(toks[1])
-            lines = new_lines
-        return [TwentyFourState.from_line(l) for l in lines]
+        return list(TwentyFourState.iter_file(file_name,is_csv_file))
 
     def distance(self):
         '''
@@ -142,6 +168,11 @@ class TwentyFourState(State):
         except:
             return 10000
         
+    @classmethod
+    def distance_batch(cls,states):
+        # The cache is keyed on the ordered numbers, since the sampled values (and hence the estimate) depend on the order. 
+        return [distance_of_numbers(tuple(s.available_nums)) for s in states]
+
     def is_solution(self):
         return len(self.available_nums) == 1 and self.available_nums[0] == 24
     
@@ -159,12 +190,35 @@ class TwentyFourState(State):
                children_states.append(TwentyFourState(starting_numbers=[e['value']]+remaining_nums,starting_equations=new_eqns))
        return children_states
 
-s = TwentyFourState([2, 4, 5, 10])
-solutions, iterations = s.beam_search({'beam_width':1})
-path = solutions[0].solution_path()
-
-file_name = 'puzzles_24_100.txt'
-State.solve_batch(file_name,
-                  lambda file_name: TwentyFourState.parse_file(file_name,is_csv_file=False),
-                  params={'max_iterations':4, 'beam_width':1},algorithm='beam_search')
-
+    # The reversible move protocol, used by State.dfs_in_place. A move is a tuple (i, j, eqn, a, b), where eqn combines the
+    # available numbers a and b found at the indices i < j. Moves come in the same order as the children made by expand(): 
+    def moves(self):
+        if len(self.available_nums) < 2:
+            return []
+        return [(i,j,e,self.available_nums[i],self.available_nums[j]) for ((i,j),eqns) in make_all_eqns(self.available_nums) for e in eqns]
+
+    def apply(self,move):
+        (i,j,e,_,_) = move
+        self.available_nums = [e['value']] + remove(self.available_nums,(i,j))
+        self.eqns = self.eqns + [e]
+
+    def undo(self,move):
+        (i,j,_,a,b) = move
+        nums = self.available_nums[1:]
+        nums.insert(i,a)
+        nums.insert(j,b)
+        self.available_nums = nums
+        self.eqns = self.eqns[:-1]
+
+    def snapshot(self):
+        return type(self)(self.available_nums,self.eqns)
+
+if __name__ == "__main__":
+    s = TwentyFourState([2, 4, 5, 10])
+    solutions, iterations = s.beam_search({'beam_width':1})
+    path = solutions[0].solution_path()
+
+    file_name = 'puzzles_24_100.txt'
+    State.solve_batch(file_name,
+                      lambda file_name: TwentyFourState.parse_file(file_name,is_csv_file=False),
+                      params={'max_iterations':4, 'beam_width':1},algorithm='beam_search')